@@ -1,10 +1,46 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import repeat
+import contextlib
+import copy
+import math
+import warnings
+import numpy as np
 import pandas as pd
-from modules.metrics import *
+from modules.metrics import MetricRecorder, occupancy
+from modules.summary import RunningStatistics, RunningSummary
 from modules.tools import Unique
-from modules.patient import PatientGenerator, BasicPatientGenerator
-import plotly.graph_objects as go
+from modules.beds import BedStore, StoredWard
+from modules.scheduling import DischargeCalendar, ScheduledWard
+from modules.queues import CategoryQueue
+from modules.arrivals import ArrivalSchedule, check_arrival_mode, expand_time_matrix, sample_arrivals
+from modules.scenarios import BED_PARAMETERS, expand_configurations
+from modules.patient import (PatientGenerator, BasicPatientGenerator, CATEGORIES, CATEGORY_CODES,
+                             from_patient_lists, to_patient_lists)
+from modules.ward import Hospital, Ward
+from modules.snapshot import Snapshot
+from modules.warmup import mser
+from modules.profiling import Profiler
+from modules.lockstep import MAX_CALENDAR_CELLS, LockstepRuns
+from modules import kernel
+from modules import graphs
+
+
+
+def _standard_ward(name):
+    """
+    Property for the occupied beds of one of the standard wards, kept for code written before the wards were
+    held by position
+    :param name: the name of the ward, see modules.placement.POOLS
+    :return: property
+    """
+    def get(self):
+        return self.occupied[self.hospital.index(name)]
+
+    def set(self, ward):
+        self.occupied[self.hospital.index(name)] = ward
 
+    return property(get, set)
 
 
 class BedModel:
@@ -39,8 +75,21 @@ class BedModel:
 
     """
 
-    def __init__(self, n_elective_beds, n_surgical_emergency_beds, n_medical_emergency_beds, n_escalation_beds,
-                 time_matrix, PG: PatientGenerator):
+    ENGINES = ('list', 'array', 'calendar')
+
+    # The occupied beds of the standard wards, see Hospital.standard
+    occupied_medical_emergency_beds = _standard_ward('medical emergency')
+    occupied_surgical_emergency_beds = _standard_ward('surgical emergency')
+    occupied_elective_beds = _standard_ward('Elective')
+    occupied_escalation_beds = _standard_ward('escalation')
+
+    # The time matrix rows read by arrivals() and the source the patients for each are generated as
+    ARRIVAL_SOURCES = ('Emergency Department', 'Non-ED Admission', 'Elective')
+    ARRIVAL_GENERATED_AS = ('Emergency Department', 'Elective', 'Elective')
+
+    def __init__(self, n_elective_beds=None, n_surgical_emergency_beds=None, n_medical_emergency_beds=None,
+                 n_escalation_beds=None, time_matrix=None, PG: PatientGenerator = None, engine='list',
+                 arrival_mode='fixed', arrival_dispersion=None, placement_rules=None, wards=None):
         """
 
         :param n_elective_beds:
@@ -48,23 +97,56 @@ class BedModel:
         :param n_medical_emergency_beds:
         :param n_escalation_beds:
         :param time_matrix:
+        :param engine: how the occupied beds are held, 'list' for a list of patient lists per ward, 'array'
+            for a columnar NumPy BedStore shared by the wards or 'calendar' for category counts per ward with discharges
+            scheduled on a per-hour DischargeCalendar. The array engine only runs faster than the list engine for
+            trust sized bed bases, with smaller ones the per-hour NumPy calls cost more than they save
+        :param arrival_mode: 'fixed' to use the time matrix as the number of arrivals each hour, or 'poisson' or
+            'negative_binomial' to treat it as the hourly arrival rate and draw the number of arrivals each run
+        :param arrival_dispersion: the dispersion of the negative binomial arrival mode, arrivals have variance
+            rate + rate**2 / arrival_dispersion
+        :param placement_rules: dictionary of category: the names of the wards the category is placed in, in order
+            of preference. Defaults to modules.placement.PLACEMENT_RULES for the standard wards, see
+            modules.ward.Hospital for other wards
+        :param wards: list of modules.ward.Ward to model instead of the four standard wards given by the numbers of
+            beds
         """
+        if engine not in self.ENGINES:
+            raise ValueError(f"engine must be one of {self.ENGINES}, not '{engine}'")
+        self.engine = engine
+        self.calendar = DischargeCalendar() if engine == 'calendar' else None
+
+        check_arrival_mode(arrival_mode, arrival_dispersion)
+        self.arrival_mode = arrival_mode
+        self.arrival_dispersion = arrival_dispersion
+
         # Total Beds
         self.n_elective_beds = n_elective_beds  # ? can these four use a dictionary to reduce n parameters
         self.n_surgical_emergency_beds = n_surgical_emergency_beds
         self.n_medical_emergency_beds = n_medical_emergency_beds
         self.n_escalation_beds = n_escalation_beds
 
+        # Kept so that simulate_scenarios can build the same hospital with other numbers of beds
+        self.wards = None if wards is None else tuple(wards)
+        self.placement_rules = placement_rules
+
+        if wards is not None:
+            self.hospital = Hospital(wards, rules=placement_rules)
+        elif None in (n_elective_beds, n_surgical_emergency_beds, n_medical_emergency_beds, n_escalation_beds):
+            raise ValueError("give either the number of beds of each of the four standard wards or the wards")
+        else:
+            self.hospital = Hospital.standard(n_elective_beds, n_surgical_emergency_beds, n_medical_emergency_beds,
+                                              n_escalation_beds, rules=placement_rules)
+
+        self.placement = self.hospital.placement
+        self.metrics = self.hospital.metrics
+
         # Global Variables
         self.time_matrix = time_matrix
-        self.time = []
-        self.run_name = []
 
-        # Beds occupied
-        self.occupied_elective_beds = []
-        self.occupied_surgical_emergency_beds = []
-        self.occupied_medical_emergency_beds = []
-        self.occupied_escalation_beds = []
+        # Beds occupied, one holding place per ward of the hospital
+        self.bed_store = self.__new_bed_store()
+        self.occupied = [self.__new_ward(place) for place in range(len(self.hospital.wards))]
 
         # All Patients
         # TODO: parameterise this outside of this class and pass the object
@@ -72,36 +154,78 @@ class BedModel:
         self.patient_master = [] # A master holding place for the warm-up patients so that it can be replicated each run
 
         # Holding Places
-        self.ed_queue = []  # If an emergency patient they wait here (trolley wait)
-        self.non_ed_queue = []  # If an emergency patient they wait here
-        self.Elective_queue = []  # If an Elective patient they wait here
+        self.ed_queue = self.__new_queue()  # If an emergency patient they wait here (trolley wait)
+        self.non_ed_queue = self.__new_queue()  # If an emergency patient they wait here
+        self.Elective_queue = self.__new_queue(ages=False)  # If an Elective patient they wait here
+
+        # The transient found by warm_up_to_steady_state
+        self.warm_up = None
 
         # Metrics
-        self.Elective_cancellations = []  # If a patient from the Waiting List cannot be admitted they are cancelled
-        self.record_available_beds = {'Elective': [], 'surgical emergency': [], 'medical emergency': [],
-                                      'escalation': []}
-        self.record_n_occupied_beds = {'Elective': [], 'surgical emergency': [], 'medical emergency': [],
-                                       'escalation': []}
-        self.record_n_outliers = {'Elective': [], 'surgical emergency': [], 'medical emergency': []}
-        self.record_n_escalation = []
-        self.record_n_admissions_by_hour = []
-        self.record_n_discharges_by_hour = []
-        self.record_mean_length_of_stay = []  # wondering if there is any use in recording this
-        self.record_mean_ed_queue = []
-        self.record_mean_non_ed_queue = []
-        self.record_n_trolley_waits = []
-        self.record_n_cancellations = []
+        self.reset_results()
+
+    def reset_results(self):
+        """
+        Clear the recorded results, leaving the beds and queues as they are
+        """
+        # A MetricRecorder for each call of simulate_inpatient_system
+        self.recorders = []
+        self.summary = None
+        self.precision = None
+
+    def __new_bed_store(self):
+        """
+        Create the store the array engine holds the patients of every ward in, so each hour they are counted down
+        and discharged together
+        :return: an empty BedStore for the array engine, otherwise None
+        """
+        if self.engine != 'array':
+            return None
+        return BedStore(capacity=int(self.hospital.beds.sum()), n_wards=len(self.hospital.wards))
+
+    def __new_ward(self, place):
+        """
+        Create the holding place for the patients occupying a ward
+        :param place: the position of the ward in the hospital
+        :return: an empty list, StoredWard or ScheduledWard depending on the engine
+        """
+        if self.engine == 'array':
+            return StoredWard(self.bed_store, place)
+        if self.engine == 'calendar':
+            return ScheduledWard(self.calendar)
+        return []
+
+    def __new_queue(self, ages=True):
+        """
+        Create a holding place for the patients waiting for a bed
+        :param ages: whether the time of the waiting patients counts up each hour
+        :return: an empty list for the list engine, otherwise a CategoryQueue
+        """
+        if self.engine == 'list':
+            return []
+        return CategoryQueue(ages=ages)
+
+    def __wards(self):
+        return self.occupied
+
+    def __queues(self):
+        return self.ed_queue, self.non_ed_queue, self.Elective_queue
 
     # This function acts as a warm-up, setting the starting figures in the simulation, so it does not begin with an empty system
-    def warm_up_model(self, warmup_number):
+    def warm_up_model(self, warmup_number, patients=None):
         """
 
         :param warmup_number: Number of patients to be generated at warm up
+        :param patients: the warm-up patients, if already generated (e.g. to share between bed configurations),
+            copies of these are admitted rather than generating new patients
         :return:
         """
-        if warmup_number > self.n_surgical_emergency_beds + self.n_elective_beds + self.n_medical_emergency_beds + self.n_escalation_beds:
+        if warmup_number > self.hospital.beds.sum():
             raise ValueError("The number of patients at warm-up cannot exceed the beds available")
 
+        elif patients is not None:
+            self.patient_master += copy.deepcopy(patients)
+
         else:
             patients = self.PG.patient_generator(n=warmup_number, warm=True)
             self.patient_master += patients
@@ -109,6 +233,124 @@ class BedModel:
         # Admit patients
         self.admit_patient(warm=True)
 
+    def warm_up_to_steady_state(self, start_time, max_hours=24 * 7 * 8, runs=5, batch_size=5, n_jobs=None, seed=None,
+                                warmup_number=0):
+        """
+        Warm the model up by running it forward until the occupancy reaches steady state, rather than relying on a
+        hand picked warmup_number
+
+        A pilot of max_hours is simulated from the current state (after placing warmup_number patients as in
+        warm_up_model), and the MSER truncation point of the total occupied beds, averaged across the pilot runs,
+        is taken as the length of the initial transient. The model is then run from its starting state for that
+        many hours, rounded up to whole days, so that the warm-up ends at start_time. The simulation that follows
+        only records hours from steady state, and as every run restores this warmed-up state the transient is
+        simulated once rather than in every run.
+
+        :param start_time: datetime for when the simulation after the warm-up will start
+        :param max_hours: the length of the pilot, at most half of which can be dropped as the transient
+        :param runs: the number of pilot runs averaged to detect the transient
+        :param batch_size: the number of hours averaged into each batch by MSER, the default giving MSER-5
+        :param n_jobs: the number of worker processes to run the pilot runs across
+        :param seed: seed used for the random streams of the pilot and warm-up, if None the patient generators own
+            stream is used for the warm-up
+        :param warmup_number: the number of patients to place before running forward, 0 to start from empty
+        :return: the number of hours simulated to warm up (also kept with the transient as self.warm_up)
+        """
+        if warmup_number:
+            self.warm_up_model(warmup_number=warmup_number)
+
+        pilot_start = start_time - timedelta(hours=max_hours)
+        pilot_end = start_time - timedelta(hours=1)
+        template, initial = self.__replication_template()
+
+        occupied = [self.metrics.index(metric) for metric in self.metrics if metric.startswith('Occupied')]
+        total = np.zeros(max_hours)
+        with _executor(n_jobs) as executor:
+            for _, metrics in self.__replicate(template, initial, range(runs), seed, pilot_start, pilot_end,
+                                               executor=executor):
+                total += metrics[:, occupied].sum(axis=1)
+
+        transient = mser(total / runs, batch_size=batch_size)
+        if transient == (max_hours // batch_size) // 2 * batch_size:
+            warnings.warn(f"The occupancy has not reached steady state within half of the {max_hours} hour pilot, "
+                          f"consider increasing max_hours")
+
+        hours = math.ceil(transient / 24) * 24
+        if hours:
+            if seed is not None:
+                self.PG.reseed(np.random.SeedSequence(seed))
+            self.simulate_run(run=0, start_time=start_time - timedelta(hours=hours), end_time=pilot_end)
+
+        self.warm_up = {'transient': transient, 'hours': hours}
+
+        return hours
+
+    def occupancy(self):
+        """
+        The patients in each ward by category
+        :return: (wards x categories) numpy array of counts, the wards in the order of self.hospital.wards
+        """
+        if self.bed_store is not None:
+            return self.bed_store.occupancy()
+        return occupancy(self.__wards())
+
+    def snapshot(self):
+        """
+        Take a snapshot of the patients in the wards and holding areas, e.g. after the warm-up, that can be restored
+        into this (or another) model and saved to disk
+        :return: modules.snapshot.Snapshot
+        """
+        if self.engine == 'list':
+            wards = [from_patient_lists(ward) for ward in self.__wards()]
+        else:
+            wards = [ward.to_array() for ward in self.__wards()]
+
+        if self.engine == 'list':
+            queues = [from_patient_lists(queue) for queue in self.__queues()]
+        else:
+            queues = [queue.to_array() for queue in self.__queues()]
+
+        return Snapshot.from_places(wards=wards, queues=queues,
+                                    clock=self.calendar.clock if self.calendar is not None else 0)
+
+    def restore(self, snapshot):
+        """
+        Put the patients of a snapshot back into the wards and holding areas, replacing those there now. The
+        patients are copied so the snapshot can be restored again
+        :param snapshot: modules.snapshot.Snapshot as taken by snapshot()
+        """
+        if (snapshot.n_wards, snapshot.n_queues) != (len(self.hospital.wards), 3):
+            raise ValueError(f"the snapshot has {snapshot.n_wards} wards and {snapshot.n_queues} holding areas, "
+                             f"the model has {len(self.hospital.wards)} wards and 3 holding areas")
+
+        if self.engine == 'calendar':
+            self.calendar = DischargeCalendar()
+            self.calendar.clock = snapshot.clock
+        self.bed_store = self.__new_bed_store()
+
+        wards = []
+        for place in range(snapshot.n_wards):
+            patients = snapshot.ward(place)
+            if self.engine == 'list':
+                wards.append(to_patient_lists(patients))
+            else:
+                ward = self.__new_ward(place)
+                ward.extend(patients)
+                wards.append(ward)
+
+        self.occupied = wards
+        queues = []
+        for place, ages in enumerate([True, True, False]):
+            patients = snapshot.queue(place)
+            if self.engine == 'list':
+                queues.append(to_patient_lists(patients))
+            else:
+                queue = self.__new_queue(ages=ages)
+                queue.extend(patients)
+                queues.append(queue)
+
+        self.ed_queue, self.non_ed_queue, self.Elective_queue = queues
+
     # Core Functions
 
     # All these functions are used in the running of the simulation
@@ -116,40 +358,36 @@ class BedModel:
     def discharge_patient(self):
         """
         This function should store the number of patients ready for discharge and then remove them from the system
-        :return: number of discharges to self.record_n_discharges_by_hour
+        :return: number of discharges
         """
 
         discharged = 0
 
-        if len(self.occupied_medical_emergency_beds) > 0:
+        if self.engine == 'array':
+            return self.bed_store.discharge()
 
-            discharged += len([sublist for sublist in self.occupied_medical_emergency_beds if sublist[3] == 0])
-            self.occupied_medical_emergency_beds = [sublist for sublist in self.occupied_medical_emergency_beds if sublist[3] != 0]
+        if self.engine == 'calendar':
+            return self.calendar.discharge()
 
-        if len(self.occupied_surgical_emergency_beds) > 0:
-            discharged += len([sublist for sublist in self.occupied_surgical_emergency_beds if sublist[3] == 0])
-            self.occupied_surgical_emergency_beds = [sublist for sublist in self.occupied_surgical_emergency_beds if sublist[3] != 0]
+        for index, ward in enumerate(self.__wards()):
+            if len(ward) > 0:
+                discharged += len([sublist for sublist in ward if sublist[3] == 0])
+                self.occupied[index] = [sublist for sublist in ward if sublist[3] != 0]
 
-        if len(self.occupied_elective_beds) > 0:
-            discharged += len([sublist for sublist in self.occupied_elective_beds if sublist[3] == 0])
-            self.occupied_elective_beds = [sublist for sublist in self.occupied_elective_beds if sublist[3] != 0]
-
-        if len(self.occupied_escalation_beds) > 0:
-            discharged += len([sublist for sublist in self.occupied_escalation_beds if sublist[3] == 0])
-            self.occupied_escalation_beds = [sublist for sublist in self.occupied_escalation_beds if sublist[3] != 0]
-
-        self.record_n_discharges_by_hour.append(discharged)
+        return discharged
 
     def cancel_patient(self):
         """
         This function should add any patients left in the Elective queue but where there are no beds
-        :return: updates self.Elective_cancellations and self.Elective_queue
+        :return: the number of Elective cancellations, clearing self.Elective_queue
         """
 
-        self.Elective_cancellations.append(len(self.Elective_queue))
+        cancellations = len(self.Elective_queue)
         # Clear all remaining Electives in the queue
         self.Elective_queue.clear()
 
+        return cancellations
+
     def update_los(self):
         """
         update the los parameters held in the occupied bed areas
@@ -160,26 +398,23 @@ class BedModel:
         reduce = lambda los : los - 1
         increase = lambda los : los + 1
 
-        if len(self.occupied_medical_emergency_beds)>0:
+        if self.engine == 'array':
+            self.bed_store.tick()
 
-            for patient in self.occupied_medical_emergency_beds:
-                patient[3] = reduce(patient[3])
-                patient[4] = increase(patient[4])
-
-        if len(self.occupied_surgical_emergency_beds)>0:
-            for patient in self.occupied_surgical_emergency_beds:
-                patient[3] = reduce(patient[3])
-                patient[4] = increase(patient[4])
+        elif self.engine == 'calendar':
+            # Discharges are already filed under their hour so only the clock needs to move
+            self.calendar.advance()
 
-        if len(self.occupied_elective_beds)>0:
-            for patient in self.occupied_elective_beds:
-                patient[3] = reduce(patient[3])
-                patient[4] = increase(patient[4])
+        else:
+            for ward in self.__wards():
+                for patient in ward:
+                    patient[3] = reduce(patient[3])
+                    patient[4] = increase(patient[4])
 
-        if len(self.occupied_escalation_beds)>0:
-            for patient in self.occupied_escalation_beds:
-                patient[3] = reduce(patient[3])
-                patient[4] = increase(patient[4])
+        if self.engine != 'list':
+            for queue in self.__queues():
+                queue.tick()
+            return
 
         #Update those waiting in the holding areas
         #Do not update the LOS until they are admitted
@@ -196,133 +431,81 @@ class BedModel:
 
     def admit_patient(self, warm):
         """
-        This function should admit patients from the holding areas
+        This function should admit patients from the holding areas, following the placement table
+        :param warm: whether to place the warm-up patients in patient_master, one at a time in order with the
+            escalation beds taking any that do not fit in the core bed base, rather than admit the waiting patients
         :return:
         """
+        wards = self.__wards()
 
         if warm:
-            for patient in self.patient_master:
-                # Prioritise the placement of emergency patients
-
-                if (patient[2] == 'Medical Emergency'
-                        and len(self.occupied_medical_emergency_beds) < self.n_medical_emergency_beds):
-                    self.occupied_medical_emergency_beds.append(patient)
-
-                # If this is not possible place the patients in surgical beds
-                elif (patient[2] == 'Medical Emergency'
-                      and len(self.occupied_medical_emergency_beds) >= self.n_medical_emergency_beds
-                      and len(self.occupied_surgical_emergency_beds) < self.n_surgical_emergency_beds):
-                    self.occupied_surgical_emergency_beds.append(patient)
-
-                elif (patient[2] == 'Surgical Emergency'
-                      and len(self.occupied_surgical_emergency_beds) < self.n_surgical_emergency_beds):
-                    self.occupied_surgical_emergency_beds.append(patient)
-
-                elif (patient[2] == 'Surgical Emergency'
-                      and len(self.occupied_surgical_emergency_beds) >= self.n_surgical_emergency_beds
-                      and len(self.occupied_medical_emergency_beds) < self.n_medical_emergency_beds):
-                    self.occupied_medical_emergency_beds.append(patient)
-
-                elif (patient[2] == 'Elective'
-                      and len(self.occupied_elective_beds) < self.n_elective_beds):
-                    self.occupied_elective_beds.append(patient)
-
-                elif (patient[2] == 'Elective'
-                      and len(self.occupied_elective_beds) >= self.n_elective_beds
-                      and len(self.occupied_surgical_emergency_beds) < self.n_surgical_emergency_beds):
-                    self.occupied_surgical_emergency_beds.append(patient)
-
-                elif (patient[2] == 'Elective'
-                      and len(self.occupied_elective_beds) >= self.n_elective_beds
-                      and len(self.occupied_medical_emergency_beds) < self.n_medical_emergency_beds):
-                    self.occupied_medical_emergency_beds.append(patient)
-
-                # If patient cannot fit within the core bed base then use escalation beds
-                else:
-                    self.occupied_escalation_beds.append(patient)
+            categories = np.array([CATEGORY_CODES[patient[2]] for patient in self.patient_master], dtype=np.int64)
+            pools = self.placement.place(categories, self.__free_beds(warm=True))
 
-        else:
-            category_pathways = {
-                "Medical Emergency": self.__handle_medical_emergency,
-                "Surgical Emergency": self.__handle_surgical_emergency,
-                "Elective": self.__handle_elective,
-            }
-
-            # TODO: if this logic is correct, it could be applied to the warmup section too
-            for category, pathway in category_pathways.items():
-                for queue in [self.ed_queue, self.non_ed_queue, self.Elective_queue]:
-                    patients_in_beds = []
-                    for patient_index, patient in enumerate(queue):
-                        if patient[2] == category:
-                            if pathway(patient):
-                                patients_in_beds.append(patient_index)
-
-                    # Remove the patients in beds from the queue
-                    for patient_index in patients_in_beds[::-1]:
-                        del queue[patient_index]
-
-    def __handle_medical_emergency(self, patient):
-        """
-        This method assigns the provided patient to an available bed according to the severity of the medical emergency.
-        It prioritizes assigning the patient to medical emergency beds, then surgical emergency beds, and finally escalation beds
-        if all medical and surgical emergency beds are occupied.
-        :param patient: a list containing information pertinent to the patient
-        :return bool: whether the patient could get a bed
-        """
-        patient_in_bed = True
-        if len(self.occupied_medical_emergency_beds) < self.n_medical_emergency_beds:
-            self.occupied_medical_emergency_beds.append(patient)
-        elif len(self.occupied_surgical_emergency_beds) < self.n_surgical_emergency_beds:
-            self.occupied_surgical_emergency_beds.append(patient)
-        elif len(self.occupied_escalation_beds) < self.n_escalation_beds:
-            self.occupied_escalation_beds.append(patient)
-        else:
-            patient_in_bed = False
+            for pool, ward in enumerate(wards):
+                patients = [self.patient_master[index] for index in np.flatnonzero(pools == pool)]
+                if patients:
+                    ward.extend(patients if self.engine == 'list' else from_patient_lists(patients))
+
+            return
+
+        free = self.__free_beds()
+
+        # Each category in turn takes as many beds as it can from each holding area in order
+        for category in self.placement.categories:
+            for queue in self.__queues():
+                waiting = self.__waiting(queue, category)
+                if not waiting:
+                    continue
+
+                allocation = self.placement.allocate(category, waiting, free)
+                if not allocation:
+                    continue
 
-        return patient_in_bed
+                patients = self.__take(queue, category, sum(n for _, n in allocation))
+                start = 0
+                for pool, n in allocation:
+                    wards[pool].extend(patients[start:start + n])
+                    start += n
 
-    def __handle_surgical_emergency(self, patient):
+    def __free_beds(self, warm=False):
+        return self.placement.free_beds(self.hospital.beds.tolist(), [len(ward) for ward in self.__wards()], warm=warm)
+
+    def __waiting(self, queue, category):
         """
-        This method assigns the provided patient to an available bed according to the severity of the surgical emergency.
-        It prioritizes assigning the patient to surgical emergency beds, then medical emergency beds, and finally escalation beds
-        if all medical and surgical emergency beds are occupied.
-        :param patient: a list containing information pertinent to the patient.
-        :return bool: whether the patient could get a bed
+        The number of patients of a category waiting in a holding area
+        :param queue: the holding area
+        :param category: the category code
+        :return: int
         """
-        patient_in_bed = True
-        if len(self.occupied_surgical_emergency_beds) < self.n_surgical_emergency_beds:
-            self.occupied_surgical_emergency_beds.append(patient)
-        elif len(self.occupied_medical_emergency_beds) < self.n_medical_emergency_beds:
-            self.occupied_medical_emergency_beds.append(patient)
-        elif len(self.occupied_escalation_beds) < self.n_escalation_beds:
-            self.occupied_escalation_beds.append(patient)
-        else:
-            patient_in_bed = False
-
-        return patient_in_bed
-
-    def __handle_elective(self, patient):
-        """
-        This method assigns the provided patient to an available bed, considering the priority of elective treatments.
-        It first attempts to assign the patient to elective beds. If all elective beds are occupied, it checks if there
-        are any available surgical emergency beds, followed by medical emergency beds, and finally escalation beds.
-        :param patient: a list containing information pertinent to the patient.
-        :return bool: whether the patient could get a bed
-        """
-        patient_in_bed = True
-        if len(self.occupied_elective_beds) < self.n_elective_beds:
-            self.occupied_elective_beds.append(patient)
-        # TODO: Check this logic - would the elective not just be cancelled? Since this goes down an unsorted list we could be filling non-emergency patients in emergency slots
-        elif len(self.occupied_surgical_emergency_beds) < self.n_surgical_emergency_beds:
-            self.occupied_surgical_emergency_beds.append(patient)
-        elif len(self.occupied_medical_emergency_beds) < self.n_medical_emergency_beds:
-            self.occupied_medical_emergency_beds.append(patient)
-        elif len(self.occupied_escalation_beds) < self.n_escalation_beds:
-            self.occupied_escalation_beds.append(patient)
-        else:
-            patient_in_bed = False
+        if self.engine != 'list':
+            return queue.count(category)
 
-        return patient_in_bed
+        name = CATEGORIES[category]
+        return sum(1 for patient in queue if patient[2] == name)
+
+    def __take(self, queue, category, n):
+        """
+        Remove the first n patients of a category from a holding area
+        :param queue: the holding area
+        :param category: the category code
+        :param n: the number of patients to take
+        :return: list of patient lists for the list engine, otherwise a structured array of patients
+        """
+        if self.engine != 'list':
+            return queue.take(category, n)
+
+        name = CATEGORIES[category]
+        taken = []
+        remaining = []
+        for patient in queue:
+            if patient[2] == name and len(taken) < n:
+                taken.append(patient)
+            else:
+                remaining.append(patient)
+
+        queue[:] = remaining
+        return taken
 
     def arrivals(self, hour, weekday):
         """
@@ -334,182 +517,745 @@ class BedModel:
         number_being_admitted_non_emergency_department = self.time_matrix.get('Non-ED Admission')[weekday][hour]
         number_being_admitted_n_elective = self.time_matrix.get('Elective')[weekday][hour]
 
+        if self.arrival_mode != 'fixed':
+            (number_being_admitted_emergency_department,
+             number_being_admitted_non_emergency_department,
+             number_being_admitted_n_elective) = self.__sample_arrivals([number_being_admitted_emergency_department,
+                                                                         number_being_admitted_non_emergency_department,
+                                                                         number_being_admitted_n_elective]).tolist()
+
         if number_being_admitted_emergency_department:
 
-            new = self.PG.patient_generator(n=number_being_admitted_emergency_department, source_='Emergency Department')
+            new = self.__new_patients(n=number_being_admitted_emergency_department, source_='Emergency Department')
 
             # TODO: Should this be an append or an add? (Same for below)
-            self.ed_queue += new
+            self.__enqueue(self.ed_queue, new)
 
         if number_being_admitted_non_emergency_department:
 
             # TODO: is this source correct?
-            new = self.PG.patient_generator(n=number_being_admitted_emergency_department, source_='Elective')
+            new = self.__new_patients(n=number_being_admitted_emergency_department, source_='Elective')
 
             # TODO: Should this be non_ed_queue?
-            self.ed_queue += new
+            self.__enqueue(self.ed_queue, new)
 
         if number_being_admitted_n_elective:
 
-            new = self.PG.patient_generator(n=number_being_admitted_emergency_department, source_='Elective')
+            new = self.__new_patients(n=number_being_admitted_emergency_department, source_='Elective')
 
             # TODO: Should this be Elective_queue?
-            self.ed_queue += new
+            self.__enqueue(self.ed_queue, new)
+
+    def __new_patients(self, n, source_):
+        """
+        Generate arriving patients in the form the holding areas keep them
+        :param n: the number of patients
+        :param source_: the source to generate the patients as
+        :return: list of patient lists for the list engine, otherwise a structured array of patients
+        """
+        if self.engine == 'list':
+            return self.PG.patient_generator(n=n, source_=source_)
+
+        if hasattr(self.PG, 'batch_generator'):
+            return self.PG.batch_generator(n=n, source_=source_)
+        return from_patient_lists(self.PG.patient_generator(n=n, source_=source_))
+
+    def __enqueue(self, queue, patients):
+        """
+        Add arriving patients to the back of a holding area
+        :param queue: the holding area
+        :param patients: the patients as given by __new_patients
+        """
+        if self.engine == 'list':
+            queue += patients
+        else:
+            queue.extend(patients)
+
+    def arrival_rates(self, start_time, end_time):
+        """
+        The time matrix expanded for every hour of the simulation
+        :param start_time: datetime for when the simulation starts
+        :param end_time: datetime for when the simulation ends
+        :return: (hours x sources) array of arrivals (or arrival rates), the columns following ARRIVAL_SOURCES
+        """
+        return expand_time_matrix(self.time_matrix, self.ARRIVAL_SOURCES, start_time, end_time)
+
+    def arrival_counts(self, rates):
+        """
+        The number of patients arrivals() generates for each source, drawn according to the arrival mode
+        :param rates: (hours x sources) array of arrival rates as given by arrival_rates()
+        :return: (hours x sources) array of the number of patients to generate
+        """
+        counts = self.__sample_arrivals(rates)
+
+        # As in arrivals(), each source generates the number of ED arrivals in any hour it has arrivals of its own
+        return np.where(counts > 0, counts[:, :1], 0)
+
+    def __sample_arrivals(self, rates):
+        rng = getattr(self.PG, 'rng', None)
+        return sample_arrivals(rates, mode=self.arrival_mode, rng=rng, dispersion=self.arrival_dispersion)
+
+    def scheduled_arrivals(self, schedule, step):
+        """
+        Put the patients generated up front for an hour in the holding area ready for the admit function
+        :param schedule: the ArrivalSchedule for the run
+        :param step: the number of hours since the start of the run
+        """
+        hour = schedule.hour_lists(step) if self.engine == 'list' else schedule.hour(step)
+        for new in hour:
+            # As in arrivals(), the patients from every source wait in the ED queue
+            self.__enqueue(self.ed_queue, new)
 
     # End Results
 
     # These functions are used to record the end results of the model and graphically show them
 
-    def collect_results(self):
+    def collect_results(self, datetimes=True):
         """
         This function should collect the results into a tabular format
 
+        :param datetimes: whether to label each row with its DateTime and Run Name columns. If False the rows are
+            indexed by a (Run, Hour) MultiIndex of integers instead, which is cheaper to build. The runs of each
+            call of simulate_inpatient_system are numbered on from those of the calls before it, so every
+            (Run Name, DateTime) or (Run, Hour) is unique
         :return: a dataframe of results from the simulation
         """
-        df = pd.DataFrame({
-            'DateTime': self.time if self.time else None,
-            'Run Name': self.run_name if self.run_name else None,
-
-            'Available medical emergency': self.record_available_beds['medical emergency'],
-            'Available surgical emergency': self.record_available_beds['surgical emergency'],
-            'Available Elective': self.record_available_beds['Elective'],
-            'Available escalation': self.record_available_beds['escalation'],
-
-            'Occupied medical emergency': self.record_n_occupied_beds['medical emergency'] if
-            self.record_n_occupied_beds['medical emergency'] else None,
-            'Occupied surgical emergency': self.record_n_occupied_beds['surgical emergency'] if
-            self.record_n_occupied_beds['surgical emergency'] else None,
-            'Occupied Elective': self.record_n_occupied_beds['Elective'] if self.record_n_occupied_beds[
-                'Elective'] else None,
-            'Occupied escalation': self.record_n_occupied_beds['escalation'] if self.record_n_occupied_beds[
-                'escalation'] else None,
-
-            'Medical Outliers': self.record_n_outliers['medical emergency'] if self.record_n_outliers[
-                'medical emergency'] else None,
-            'Surgical Outliers': self.record_n_outliers['surgical emergency'] if self.record_n_outliers[
-                'surgical emergency'] else None,
-            'Elective Outliers': self.record_n_outliers['Elective'] if self.record_n_outliers['Elective'] else None,
-
-            'Escalation Beds Used': self.record_n_escalation if self.record_n_escalation else None,
-            'Patients Admitted per Hour': self.record_n_admissions_by_hour if self.record_n_admissions_by_hour else None,
-            'Patients Discharged per Hour': self.record_n_discharges_by_hour if self.record_n_discharges_by_hour else None,
-            'Mean time waiting in ED': self.record_mean_ed_queue if self.record_mean_ed_queue else None,
-            'Mean time waiting in Non ED': self.record_mean_non_ed_queue if self.record_mean_non_ed_queue else None,
-            'Number of Trolley Waits (ED & Non ED)': self.record_n_trolley_waits if self.record_n_trolley_waits else None,
-            'Number of Elective Cancellations': self.record_n_cancellations if self.record_n_cancellations else None
-        })
-
-        df['Medical Bed % Occ'] = df['Occupied medical emergency'] / df['Available medical emergency']
-        df['Surgical Bed % Occ'] = df['Occupied surgical emergency'] / df['Available surgical emergency']
-        df['Elective Bed % Occ'] = df['Occupied Elective'] / df['Available Elective']
-        df['Escalation Bed % Occ'] = df['Occupied escalation'] / df['Available escalation']
-
-        return df
-
-    def graph_results(self, graph='occupied'):
-        """
-        This function should graphically show the results of the simulation
-        :return:
+        recorders = self.recorders or [MetricRecorder(runs=0, hours=0, metrics=self.metrics)]
+        frames = [recorder.to_frame() for recorder in recorders]
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+        first_runs = np.cumsum([0] + [recorder.runs for recorder in recorders[:-1]])
+        runs = np.concatenate([recorder.run_ids() + first for recorder, first in zip(recorders, first_runs)])
+
+        if datetimes:
+            df.insert(0, 'Run Name', _run_names(runs))
+            times = [recorder.datetimes() for recorder in recorders]
+            df.insert(0, 'DateTime', times[0].append(times[1:]))
+        else:
+            df.index = pd.MultiIndex.from_arrays([runs, np.concatenate([recorder.hour_offsets()
+                                                                        for recorder in recorders])],
+                                                 names=['Run', 'Hour'])
+
+        return _add_occupancy_rates(df, self.hospital)
+
+    def graph_results(self, graph='occupied', mode='fan', quantiles=(0.05, 0.5, 0.95), max_points=1000):
+        """
+        This function should graphically show the results of the simulation, see modules.graphs.graph_results
+        :param graph: the graph to show, 'occupied' for the occupied beds of each ward
+        :param mode: 'fan' for the median and quantile band of each ward across the runs, 'traces' for every run
+        :param quantiles: the (lower, middle, upper) quantiles of the fan chart
+        :param max_points: the most hours of each run drawn in trace mode
+        :return: plotly Figure
+        """
+        return graphs.graph_results(self, graph=graph, mode=mode, quantiles=quantiles, max_points=max_points)
+
+    # Main Function
+
+    # This is the core function called to run the simulation (after set up and warm up)
+
+    def simulate_inpatient_system(self, start_time, end_time, runs=100, n_jobs=None, seed=None, pregenerate=False,
+                                  sink=None, aggregate=False, quantiles=(0.05, 0.5, 0.95), confidence=0.95,
+                                  profiler=None, lockstep=False):
         """
-        data = self.collect_results()
 
-        run_names = data['Run Name'].unique()
+        :param start_time: datetime for when the simulation should start
+        :param end_time: datetime for when the simulation should end
+        :param runs: the number of runs that should be executed to collect results, default: 100 runs
+        :param n_jobs: if given, the runs are spread across this many worker processes. If None the runs are
+            executed one after another in this process. Either way each run is an independent replication starting
+            from the current (warmed-up) state, which the model is left in at the end of the last run
+        :param seed: seed used to spawn a child random stream for the patients generated in each run, so runs are
+            reproducible whatever the number of workers and bed configurations with the same seed see the same
+            patients (common random numbers). If None with n_jobs=None the patient generators own stream is used
+        :param pregenerate: whether to expand the time matrix once for the whole simulation and generate every
+            arrival of a run in one batch per source, rather than generating the arrivals hour by hour
+        :param sink: a results sink such as modules.sinks.ParquetSink. If given the metrics of each run are written
+            to it as soon as the run finishes (by the worker when n_jobs is given) instead of being held for
+            collect_results
+        :param aggregate: whether to only keep running summary statistics of each hourly metric across the runs
+            (mean, confidence interval and quantiles) rather than every hour of every run
+        :param quantiles: the quantiles of each hourly metric to estimate when aggregating
+        :param confidence: the confidence level of the confidence interval of the mean when aggregating
+        :param profiler: a modules.profiling.Profiler to time each phase of the loop with. With n_jobs the workers
+            time their runs on their own profilers, which are merged into it as each run finishes, its hooks being
+            called in this process with the hours of the run
+        :param lockstep: whether to advance all the runs together, each hour being a few array operations across
+            every run rather than a pass of the loop per run (see modules.lockstep.LockstepRuns). The arrivals are
+            generated up front as with pregenerate, and the results are the same as pregenerated runs. With n_jobs
+            the runs are split into a block per worker. The model is left in its state at the start of the runs.
+            True uses the compiled kernel of modules.kernel when numba is installed and NumPy arrays otherwise, or
+            give the backend, 'numpy' or 'numba'. Without numba, 'numba' warns and falls back to NumPy
+        :return: when aggregating, a DataFrame summarising each metric for each hour (also kept as self.summary)
+        """
+        # Check the arguments before anything is recorded, so a call that fails leaves no empty results behind
+        if lockstep:
+            backend = kernel.check_backend(None if lockstep is True else lockstep)
+            if profiler is not None:
+                raise ValueError('the phases of the simulation loop can not be profiled when the runs are in lockstep')
 
-        if graph == 'occupied':
-            fig = go.Figure()
+        arrival_rates = self.arrival_rates(start_time, end_time) if pregenerate else None
+        hours = (end_time - start_time) // timedelta(hours=1) + 1
 
-            for i in run_names:
-                fig.add_trace(go.Scatter(x=data[data['Run Name'] == i]['DateTime'],
-                                         y=data[data['Run Name'] == i]['Occupied medical emergency'],
-                                         name='Occupied Medical Emergency Beds'))
+        recorder = None
+        if sink is None and not aggregate:
+            recorder = MetricRecorder(runs=runs, hours=hours, metrics=self.metrics, start_time=start_time)
+            self.recorders.append(recorder)
 
-                fig.add_trace(go.Scatter(x=data[data['Run Name'] == i]['DateTime'],
-                                         y=data[data['Run Name'] == i]['Occupied surgical emergency'],
-                                         name='Occupied Surgical Emergency Beds'))
+        summary = None
+        if aggregate:
+            summary = RunningSummary(hours=hours, metrics=self.metrics, quantiles=quantiles, confidence=confidence)
+            self.summary = summary
 
-                fig.add_trace(go.Scatter(x=data[data['Run Name'] == i]['DateTime'],
-                                         y=data[data['Run Name'] == i]['Occupied Elective'],
-                                         name='Occupied Elective Beds'))
+        if lockstep:
+            self.__simulate_lockstep(start_time, end_time, runs, n_jobs=n_jobs, seed=seed, recorder=recorder,
+                                     summary=summary, sink=sink, backend=backend)
+            return summary.to_frame(start_time) if aggregate else None
 
-                fig.add_trace(go.Scatter(x=data[data['Run Name'] == i]['DateTime'],
-                                         y=data[data['Run Name'] == i]['Occupied escalation'],
-                                         name='Occupied Escalation Beds'))
+        if n_jobs is None:
+            seeds = np.random.SeedSequence(seed).spawn(runs) if seed is not None else repeat(None, runs)
+            initial = self.snapshot()
 
-            fig.update_layout(margin=dict(t=10, l=10, r=10, b=10), template='seaborn')
+            for i, run_seed in enumerate(seeds):
 
-            return fig
+                # TODO remove this  when the patient generator has been split to the module
+                self.unique = Unique()
 
-    # Main Function
+                # Every run starts from the beds and queues as they were at the start of the simulation
+                self.restore(initial)
 
-    # This is the core function called to run the simulation (after set up and warm up)
+                if run_seed is not None:
+                    self.PG.reseed(run_seed)
 
-    def simulate_inpatient_system(self, start_time, end_time, runs=100):
+                metrics = self.simulate_run(run=i, start_time=start_time, end_time=end_time,
+                                            arrival_rates=arrival_rates,
+                                            out=None if recorder is None else recorder.run(i), profiler=profiler)
+                self.__store_run(i, metrics, start_time, recorder=recorder, summary=summary, sink=sink)
+
+            return summary.to_frame(start_time) if aggregate else None
+
+        template, initial = self.__replication_template()
+
+        # The workers write to the sink themselves
+        with _executor(n_jobs) as executor:
+            for run, metrics in self.__replicate(template, initial, range(runs), seed, start_time, end_time,
+                                                 arrival_rates=arrival_rates, sink=sink, executor=executor,
+                                                 chunksize=max(1, runs // (n_jobs * 4)), profiler=profiler):
+                self.__store_run(run, metrics, start_time, recorder=recorder, summary=summary)
+
+        return summary.to_frame(start_time) if aggregate else None
+
+    def simulate_to_precision(self, start_time, end_time, target='Escalation Beds Used', statistic='max',
+                              relative_half_width=0.05, confidence=0.95, min_runs=10, max_runs=1000, n_jobs=None,
+                              seed=None, pregenerate=False, sink=None, aggregate=False, quantiles=(0.05, 0.5, 0.95)):
         """
+        Keep running independent replications until the confidence interval of a target statistic is narrow enough
+
+        Each run is reduced to a single value (e.g. the peak number of escalation beds used, or the mean medical
+        occupancy) and replications are added until the half width of the confidence interval of the mean of that
+        value is within relative_half_width of the mean, or max_runs is reached. The replications are the same
+        as simulate_inpatient_system(n_jobs=..., seed=...) would give, so the runs used do not depend on n_jobs.
 
         :param start_time: datetime for when the simulation should start
         :param end_time: datetime for when the simulation should end
-        :param runs: the number of runs that should be executed to collect results, default: 100 runs
-        :return:
+        :param target: the hourly metric to judge precision on, one of self.metrics
+        :param statistic: how each run's hourly values are reduced to one value, 'mean', 'max' or 'min'
+        :param relative_half_width: the target half width of the confidence interval as a fraction of the mean
+        :param confidence: the confidence level of the confidence interval, which uses Student's t distribution
+            when scipy is installed and is otherwise a normal approximation, too narrow for small numbers of runs
+        :param min_runs: the fewest runs to use before checking the precision. Without scipy use 30 or more
+        :param max_runs: the most runs to use if the precision is not reached
+        :param n_jobs: the number of worker processes to run replications across, if None the replications are
+            executed one at a time in this process
+        :param seed: seed used to spawn a child random stream for the patients generated in each run
+        :param pregenerate: whether to generate every arrival of a run in one batch per source
+        :param sink: a results sink to write the metrics of each run to instead of holding them for collect_results
+        :param aggregate: whether to only keep running summary statistics of each hourly metric, see
+            simulate_inpatient_system
+        :param quantiles: the quantiles of each hourly metric to estimate when aggregating
+        :return: dictionary of the number of runs used, the mean and confidence interval half width of the target
+            statistic and whether the precision was reached (also kept as self.precision)
+        """
+        if target not in self.metrics:
+            raise ValueError(f"target must be one of {self.metrics}, not '{target}'")
+        if statistic not in ('mean', 'max', 'min'):
+            raise ValueError(f"statistic must be 'mean', 'max' or 'min', not '{statistic}'")
+
+        arrival_rates = self.arrival_rates(start_time, end_time) if pregenerate else None
+        hours = (end_time - start_time) // timedelta(hours=1) + 1
+        column = self.metrics.index(target)
+        reduce = getattr(np, statistic)
+
+        summary = None
+        if aggregate:
+            summary = RunningSummary(hours=hours, metrics=self.metrics, quantiles=quantiles, confidence=confidence)
+            self.summary = summary
+
+        # Unless the runs are going to a sink or summary they are kept until the number used is known
+        kept = [] if sink is None and not aggregate else None
+
+        template, initial = self.__replication_template()
+        statistics = RunningStatistics()
+        converged = False
+        batch_size = n_jobs or 1
+
+        with _executor(n_jobs) as executor:
+            while not converged and statistics.n < max_runs:
+                batch = range(statistics.n, min(statistics.n + batch_size, max_runs))
+
+                for run, metrics in self.__replicate(template, initial, batch, seed, start_time, end_time,
+                                                     arrival_rates=arrival_rates, executor=executor):
+                    self.__store_run(run, metrics, start_time, summary=summary, sink=sink)
+                    if kept is not None:
+                        kept.append(metrics)
+
+                    statistics.add(reduce(metrics[:, column]))
+                    half_width = statistics.half_width(confidence)
+                    converged = (statistics.n >= max(min_runs, 2)
+                                 and half_width <= relative_half_width * abs(statistics.mean))
+
+                    # Stop at the first run that reaches the precision, whatever the size of the batch
+                    if converged:
+                        break
+
+        if kept is not None:
+            recorder = MetricRecorder(runs=len(kept), hours=hours, metrics=self.metrics, start_time=start_time)
+            self.recorders.append(recorder)
+            for run, metrics in enumerate(kept):
+                self.__store_run(run, metrics, start_time, recorder=recorder)
+
+        self.precision = {'runs': statistics.n,
+                          'mean': float(statistics.mean),
+                          'half_width': float(statistics.half_width(confidence)),
+                          'converged': bool(converged)}
+
+        return self.precision
+
+    def simulate_scenarios(self, configurations, start_time, end_time, warmup_number, runs=100, n_jobs=None,
+                           seed=None, aggregate=False, quantiles=(0.05, 0.5, 0.95), confidence=0.95):
+        """
+        Simulate several bed configurations on common random numbers
+
+        Every configuration is warmed up with the same warm-up patients and run i of every configuration sees the
+        same arrivals, generated once per run from child i of the seed, so the differences between configurations
+        come from the beds rather than the random streams. Each run is an independent replication starting from the
+        warmed-up configuration, with the arrivals generated up front as in simulate_inpatient_system(pregenerate=True).
+        The engine, time matrix, patient generator and arrival mode are taken from this model, whose own beds and
+        results are left unchanged; the warm-up patients are drawn from its patient generator's current stream.
+
+        :param configurations: a list of dictionaries of bed parameter (e.g. 'n_medical_emergency_beds'): number of
+            beds, or a dictionary of bed parameter: list of numbers of beds to try every combination of, see
+            modules.scenarios.bed_grid. For a model built from its wards the bed parameters are the ward names. Any
+            bed numbers not given are taken from this model
+        :param start_time: datetime for when the simulation should start
+        :param end_time: datetime for when the simulation should end
+        :param warmup_number: Number of patients to be generated at warm up
+        :param runs: the number of runs of each configuration
+        :param n_jobs: the number of worker processes to spread the runs and configurations across
+        :param seed: seed used to spawn a child random stream for the patients generated in each run
+        :param aggregate: whether to only keep running summary statistics of each hourly metric across the runs of
+            each configuration, see simulate_inpatient_system
+        :param quantiles: the quantiles of each hourly metric to estimate when aggregating
+        :param confidence: the confidence level of the confidence interval of the mean when aggregating
+        :return: DataFrame of the results (or the summary when aggregating) of every configuration, keyed by the
+            Scenario number and the bed numbers of the configuration
+        """
+        if self.wards is None:
+            defaults = {parameter: getattr(self, parameter) for parameter in BED_PARAMETERS}
+        else:
+            defaults = {ward.name: ward.beds for ward in self.hospital.wards}
+        configurations = expand_configurations(configurations, defaults)
+
+        warm_patients = self.PG.patient_generator(n=warmup_number, warm=True)
+
+        # The configurations share a copy of the patient generator, reseeded for each run
+        PG = copy.deepcopy(self.PG)
+        models = []
+        for configuration in configurations:
+            if self.wards is None:
+                beds = configuration
+            else:
+                beds = {'wards': [Ward(ward.name, configuration[ward.name], ward.category, ward.label)
+                                  for ward in self.hospital.wards]}
+            model = type(self)(**beds, time_matrix=self.time_matrix, PG=PG, engine=self.engine,
+                               arrival_mode=self.arrival_mode, arrival_dispersion=self.arrival_dispersion,
+                               placement_rules=self.placement_rules)
+            model.warm_up_model(warmup_number=warmup_number, patients=warm_patients)
+            models.append(model)
+        initial = [model.snapshot() for model in models]
+
+        arrival_rates = self.arrival_rates(start_time, end_time)
+        hours = len(arrival_rates)
+
+        # Each task simulates one run of a block of configurations, generating the arrivals once for the block.
+        # The configurations are only split up when there are too few runs to keep the workers busy
+        workers = n_jobs or 1
+        blocks = np.array_split(np.arange(len(models)), min(len(models), -(-4 * workers // runs)))
+        tasks = [(run, block) for run in range(runs) for block in blocks]
+
+        if aggregate:
+            results = [RunningSummary(hours=hours, metrics=self.metrics, quantiles=quantiles, confidence=confidence)
+                       for _ in models]
+        else:
+            results = [MetricRecorder(runs=runs, hours=hours, metrics=self.metrics, start_time=start_time)
+                       for _ in models]
+
+        seeds = _run_seeds(seed, range(runs))
+        arguments = ([[models[scenario] for scenario in block] for _, block in tasks],
+                     [[initial[scenario] for scenario in block] for _, block in tasks],
+                     [run for run, _ in tasks],
+                     [seeds[run] for run, _ in tasks],
+                     repeat(start_time), repeat(end_time), repeat(arrival_rates))
+
+        with _executor(n_jobs) as executor:
+            if executor is None:
+                simulated = map(_simulate_scenarios, *arguments)
+            else:
+                simulated = executor.map(_simulate_scenarios, *arguments,
+                                         chunksize=max(1, len(tasks) // (workers * 4)))
+
+            for (run, block), block_metrics in zip(tasks, simulated):
+                for scenario, metrics in zip(block, block_metrics):
+                    if aggregate:
+                        results[scenario].add_run(metrics)
+                    else:
+                        results[scenario].run(run)[:] = metrics
+
+        frames = []
+        for scenario, (configuration, result) in enumerate(zip(configurations, results)):
+            if aggregate:
+                df = result.to_frame(start_time)
+            else:
+                df = result.to_frame()
+                df.insert(0, 'Run Name', _run_names(result.run_ids()))
+                df.insert(0, 'DateTime', result.datetimes())
+                _add_occupancy_rates(df, self.hospital)
+
+            for position, (parameter, beds) in enumerate(configuration.items()):
+                df.insert(position, parameter, beds)
+            df.insert(0, 'Scenario', scenario)
+            frames.append(df)
+
+        return pd.concat(frames, ignore_index=True)
+
+    def __simulate_lockstep(self, start_time, end_time, runs, n_jobs=None, seed=None, recorder=None, summary=None,
+                            sink=None, backend='numpy'):
+        """
+        Simulate the runs in blocks that are each advanced in lockstep, see simulate_inpatient_system
+        :param start_time: datetime for when the runs should start
+        :param end_time: datetime for when the runs should end
+        :param runs: the number of runs
+        :param n_jobs: the number of worker processes to spread the blocks across
+        :param seed: the seed the random stream of every run is spawned from
+        :param recorder: the MetricRecorder of the simulation
+        :param summary: the RunningSummary of the simulation
+        :param sink: the results sink to write the runs to
+        :param backend: 'numpy' to advance each block with LockstepRuns or 'numba' for the compiled kernel
+        """
+        arrival_rates = self.arrival_rates(start_time, end_time)
+        initial = self.snapshot()
+
+        # Without a seed the runs draw from the patient generator's own stream one after another, as serial runs do
+        seeds = [None] * runs if seed is None and n_jobs is None else _run_seeds(seed, range(runs))
+
+        # Enough blocks to keep the workers busy and the discharge calendar of each block in bounds
+        cells = len(arrival_rates) * len(self.hospital.beds) * len(CATEGORIES)
+        n_blocks = max(n_jobs or 1, -(-runs * cells // MAX_CALENDAR_CELLS))
+        blocks = [block.tolist() for block in np.array_split(np.arange(runs), min(runs, n_blocks))]
+
+        model = self if n_jobs is None else self.__replication_template()[0]
+        arguments = (repeat(model), repeat(initial), [[seeds[run] for run in block] for block in blocks],
+                     repeat(arrival_rates), repeat(backend))
+
+        with _executor(n_jobs) as executor:
+            if executor is None:
+                simulated = map(_simulate_lockstep, *arguments)
+            else:
+                simulated = executor.map(_simulate_lockstep, *arguments)
+
+            for block, metrics in zip(blocks, simulated):
+                for run, run_metrics in zip(block, metrics):
+                    self.__store_run(run, run_metrics, start_time, recorder=recorder, summary=summary, sink=sink)
+
+    def __replication_template(self):
+        """
+        A copy of the model, without its results, for the independent replications to run on and a snapshot of the
+        state each replication starts from
+        :return: (BedModel, Snapshot)
+        """
+        template = copy.deepcopy(self)
+        template.reset_results()
+        return template, self.snapshot()
+
+    def __replicate(self, template, initial, runs, seed, start_time, end_time, arrival_rates=None, sink=None, executor=None,
+                    chunksize=1, profiler=None):
+        """
+        Simulate independent replications of the template, each with its own child of the seed's random stream
+        :param template: the model the replications run on, see __replication_template
+        :param initial: the snapshot of the state every replication starts from
+        :param runs: range of the numbers of the runs to simulate
+        :param seed: the seed the random stream of every run is spawned from
+        :param start_time: datetime for when the runs should start
+        :param end_time: datetime for when the runs should end
+        :param arrival_rates: the arrivals for every hour of the runs if they are to be generated up front
+        :param sink: a results sink for the workers to write each run to
+        :param executor: a ProcessPoolExecutor to run the replications on, if None they run in this process
+        :param chunksize: the number of replications sent to a worker at a time
+        :param profiler: a Profiler the timings of each replication are merged into
+        :return: iterator of (run, metrics) in run order
+        """
+        arguments = (repeat(template), repeat(initial), runs, _run_seeds(seed, runs), repeat(start_time), repeat(end_time),
+                     repeat(arrival_rates), repeat(sink), repeat(profiler is not None),
+                     repeat(profiler is not None and bool(profiler.hooks)))
+
+        if executor is None:
+            results = map(_simulate_replication, *arguments)
+        else:
+            results = executor.map(_simulate_replication, *arguments, chunksize=chunksize)
+
+        for run, (metrics, profile) in zip(runs, results):
+            if profile is not None:
+                profiler.merge(profile)
+            yield run, metrics
+
+    def __store_run(self, run, metrics, start_time, recorder=None, summary=None, sink=None):
+        """
+        Keep the metrics of a finished run in the recorder for collect_results, the running summary and/or a sink
+        :param run: the number of the run
+        :param metrics: (hours x metrics) array of the hourly metrics of the run
+        :param start_time: datetime for when the run started
+        :param recorder: the MetricRecorder of the simulation, None if every run is not being kept
+        :param summary: the RunningSummary of the simulation, None if not aggregating
+        :param sink: the results sink to write the run to
+        """
+        if sink is not None:
+            sink.write_run(run, metrics, self.metrics, start_time)
+
+        if summary is not None:
+            summary.add_run(metrics)
+
+        if recorder is None:
+            return
+
+        run_metrics = recorder.run(run)
+        if not np.shares_memory(run_metrics, metrics):
+            run_metrics[:] = metrics
+
+    def simulate_run(self, run, start_time, end_time, arrival_rates=None, out=None, schedule=None, profiler=None):
+        """
+        Run the model hour by hour from start_time to end_time, recording the results against the run
+        :param run: the number of the run
+        :param start_time: datetime for when the run should start
+        :param end_time: datetime for when the run should end
+        :param arrival_rates: the arrivals for every hour of the run as given by arrival_rates(), if given the
+            arrivals are all generated at the start of the run rather than each hour
+        :param out: (hours x metrics) array to write the hourly metrics into, such as MetricRecorder.run()
+        :param schedule: an ArrivalSchedule already generated for the run to take the arrivals from, such as one
+            shared between bed configurations
+        :param profiler: a modules.profiling.Profiler to time each phase of the hour with
+        :return: (hours x metrics) array of the hourly metrics, the columns following self.metrics
         """
+        if out is None:
+            out = MetricRecorder(runs=1, hours=(end_time - start_time) // timedelta(hours=1) + 1,
+                                 metrics=self.metrics).run(0)
+
+        if schedule is None and arrival_rates is not None:
+            schedule = ArrivalSchedule(self.arrival_counts(arrival_rates), self.ARRIVAL_GENERATED_AS, self.PG)
 
-        for i in range(runs):
+        update_los, discharge_patient = self.update_los, self.discharge_patient
+        arrivals, scheduled_arrivals = self.arrivals, self.scheduled_arrivals
+        admit_patient, cancel_patient, hourly_metrics = self.admit_patient, self.cancel_patient, self.__hourly_metrics
 
-            # TODO remove this  when the patient generator has been split to the module
-            self.unique = Unique()
+        # The phases are only wrapped in timers when profiling, otherwise the loop calls the methods directly
+        if profiler is not None:
+            update_los = profiler.timed(run, 'update_los', update_los)
+            discharge_patient = profiler.timed(run, 'discharge', discharge_patient)
+            arrivals = profiler.timed(run, 'arrivals', arrivals)
+            scheduled_arrivals = profiler.timed(run, 'arrivals', scheduled_arrivals)
+            admit_patient = profiler.timed(run, 'admit', admit_patient)
+            cancel_patient = profiler.timed(run, 'cancel', cancel_patient)
+            hourly_metrics = profiler.timed(run, 'metrics', hourly_metrics)
 
-            current_time = start_time
+        current_time = start_time
+        step = 0
 
-            while current_time <= end_time:
+        while current_time <= end_time:
 
-                self.time.append(current_time)
-                self.run_name.append('Run_' + str(i))
+            # Update all the LOSs ready for calculations
+            update_los()
 
-                # Update all the LOSs ready for calculations
-                self.update_los()
+            # Discharge any patients that have reached the end of their LOS
+            discharged = discharge_patient()
+            occupied_before = sum(len(ward) for ward in self.__wards())
+            if profiler is not None:
+                waiting_before = sum(len(queue) for queue in self.__queues())
 
-                # Discharge any patients that have reached the end of their LOS
-                self.discharge_patient()
+            # Calculate the new arrivals
+            if schedule is None:
+                arrivals(hour=current_time.hour,
+                         weekday=current_time.strftime('%A'))
+            else:
+                scheduled_arrivals(schedule, step)
 
-                # Calculate the new arrivals
-                self.arrivals(hour=current_time.hour,
-                              weekday=current_time.strftime('%A'))
+            if profiler is not None:
+                arrived = sum(len(queue) for queue in self.__queues()) - waiting_before
 
-                # Admit those patients
-                self.admit_patient(warm=False)
+            # Admit those patients
+            admit_patient(warm=False)
+            admitted = sum(len(ward) for ward in self.__wards()) - occupied_before
+            cancelled = cancel_patient()
 
-                # Begin Recording
+            # Begin Recording
+            out[step] = hourly_metrics(discharged=discharged, admitted=admitted, cancelled=cancelled)
 
-                record_occupied_beds(record_n_occupied_beds = self.record_n_occupied_beds,
-                                     occupied_elective_beds=self.occupied_elective_beds,
-                                     occupied_surgical_emergency_beds = self.occupied_surgical_emergency_beds,
-                                     occupied_medical_emergency_beds = self.occupied_medical_emergency_beds,
-                                     occupied_escalation_beds=self.occupied_escalation_beds)
+            if profiler is not None:
+                profiler.end_hour(run, step, {'discharge': discharged, 'arrivals': arrived, 'admit': admitted,
+                                              'cancel': cancelled})
 
-                calculate_available_beds(record_available_beds=self.record_available_beds,
-                                         n_elective_beds=self.n_elective_beds,
-                                         n_surgical_emergency_beds=self.n_surgical_emergency_beds,
-                                         n_medical_emergency_beds=self.n_medical_emergency_beds,
-                                         n_escalation_beds=self.n_escalation_beds,
-                                         occupied_elective_beds=self.occupied_elective_beds,
-                                         occupied_surgical_emergency_beds=self.occupied_surgical_emergency_beds,
-                                         occupied_medical_emergency_beds=self.occupied_medical_emergency_beds,
-                                         occupied_escalation_beds=self.occupied_escalation_beds)
+            current_time += timedelta(hours=1)
+            step += 1
 
+        return out
+
+    def __hourly_metrics(self, discharged, admitted, cancelled):
+        """
+        The metrics recorded at the end of each hour
+        :param discharged: the number of patients discharged in the hour
+        :param admitted: the number of patients admitted in the hour
+        :param cancelled: the number of Elective patients cancelled in the hour
+        :return: numpy array of metrics in the order of self.metrics
+        """
+        return self.hospital.hourly_metrics(self.occupancy(),
+                                            admitted=admitted,
+                                            discharged=discharged,
+                                            waiting=len(self.ed_queue) + len(self.non_ed_queue),
+                                            cancelled=cancelled)
+
+
+def _add_occupancy_rates(df, hospital):
+    """
+    Add the percentage occupancy of each ward to a DataFrame of results
+    :param df: DataFrame with the available and occupied metrics
+    :param hospital: the modules.ward.Hospital the results are for
+    :return: the DataFrame
+    """
+    for ward in hospital.wards:
+        df[ward.label + ' Bed % Occ'] = df['Occupied ' + ward.name] / df['Available ' + ward.name]
+
+    return df
+
+
+def _run_names(runs):
+    """
+    The Run Name of each row of the results, as a categorical so each name is only held once
+    :param runs: integer numpy array of the run of each row
+    :return: pandas Categorical of 'Run_<run>'
+    """
+    return pd.Categorical.from_codes(runs, categories=['Run_' + str(run) for run in range(runs.max(initial=-1) + 1)])
 
-                self.cancel_patient()
 
-                calculate_outliers(occupied_medical_emergency_beds=self.occupied_medical_emergency_beds,
-                                   occupied_surgical_emergency_beds=self.occupied_surgical_emergency_beds,
-                                   occupied_elective_beds=self.occupied_elective_beds,
-                                   record_n_outliers=self.record_n_outliers)
+def _run_seeds(seed, runs):
+    """
+    The seed of the random stream of each run
+    :param seed: the seed the random stream of every run is spawned from
+    :param runs: iterable of the numbers of the runs
+    :return: list of numpy SeedSequences
+    """
+    # Equivalent to SeedSequence(seed).spawn(...)[run] but without needing to know how many runs there will be
+    root = np.random.SeedSequence(seed)
+    return [np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (run,)) for run in runs]
+
+
+def _executor(n_jobs):
+    """
+    The pool of worker processes replications run on
+    :param n_jobs: the number of worker processes, with 1 (or None) the replications run in this process
+    :return: context manager giving a ProcessPoolExecutor, or None to run in this process
+    """
+    if n_jobs is None or n_jobs == 1:
+        return contextlib.nullcontext()
+
+    return ProcessPoolExecutor(max_workers=n_jobs)
+
+
+def _simulate_replication(model, initial, run, seed, start_time, end_time, arrival_rates=None, sink=None,
+                          profile=False, keep_hours=False):
+    """
+    Simulate a single independent replication of a model, used by BedModel.simulate_inpatient_system to
+    spread runs across worker processes
+    :param model: the BedModel to run the replication on, its beds and queues are replaced by the initial state
+    :param initial: Snapshot of the (warmed-up) state to start the run from
+    :param run: the number of the run
+    :param seed: numpy SeedSequence giving the random stream for the patients generated in the run
+    :param start_time: datetime for when the run should start
+    :param end_time: datetime for when the run should end
+    :param arrival_rates: the arrivals for every hour of the run if they are to be generated up front
+    :param sink: if given the metrics of the run are written to this results sink by the worker
+    :param profile: whether to time the run on a new Profiler
+    :param keep_hours: whether the Profiler keeps the timings of every hour for the hooks of the caller's profiler,
+        which are not sent to the workers as they may not pickle
+    :return: ((hours x metrics) array of the hourly metrics of the run, the Profiler of the run or None)
+    """
+    model.restore(initial)
+    model.PG.reseed(seed)
+    profiler = Profiler(keep_hours=keep_hours) if profile else None
+    metrics = model.simulate_run(run=run, start_time=start_time, end_time=end_time, arrival_rates=arrival_rates,
+                                 profiler=profiler)
+
+    if sink is not None:
+        sink.write_run(run, metrics, model.metrics, start_time)
+
+    return metrics, profiler
+
+
+def _simulate_lockstep(model, initial, seeds, arrival_rates, backend='numpy'):
+    """
+    Simulate a block of independent runs of a model together, used by BedModel.simulate_inpatient_system(lockstep=True)
+    :param model: the BedModel whose hospital, placement rules and patient generator the runs use
+    :param initial: Snapshot of the (warmed-up) state every run starts from
+    :param seeds: numpy SeedSequence giving the random stream for the patients of each run, None to draw the runs
+        one after another from the patient generators own stream
+    :param arrival_rates: the arrival rates for every hour of the runs
+    :param backend: 'numpy' to advance the runs together with LockstepRuns, or 'numba' to simulate them one after
+        another with the compiled kernel
+    :return: (runs x hours x metrics) array of the hourly metrics of each run
+    """
+    schedules = []
+    for seed in seeds:
+        if seed is not None:
+            model.PG.reseed(seed)
+        schedules.append(ArrivalSchedule(model.arrival_counts(arrival_rates), model.ARRIVAL_GENERATED_AS, model.PG))
+
+    if backend == 'numba':
+        return kernel.simulate_runs(model.hospital, model.placement, initial, schedules)
+
+    return LockstepRuns(model.hospital, model.placement, initial, schedules).simulate()
+
+
+def _simulate_scenarios(models, initial, run, seed, start_time, end_time, arrival_rates):
+    """
+    Simulate a single replication of several bed configurations on the same arrivals, used by
+    BedModel.simulate_scenarios to spread the work across worker processes
+    :param models: the BedModels of the configurations, sharing one patient generator. Their beds and queues are
+        replaced by the initial state
+    :param initial: list of Snapshots of the (warmed-up) state to start each model from
+    :param run: the number of the run
+    :param seed: numpy SeedSequence giving the random stream for the patients generated in the run
+    :param start_time: datetime for when the run should start
+    :param end_time: datetime for when the run should end
+    :param arrival_rates: the arrivals (or arrival rates) for every hour of the run
+    :return: list of (hours x metrics) arrays of the hourly metrics of the run, one per model
+    """
+    for model, snapshot in zip(models, initial):
+        model.restore(snapshot)
 
-                calculate_escalation(occupied_escalation_beds=self.occupied_escalation_beds,
-                                     record_n_escalation=self.record_n_escalation)
+    PG = models[0].PG
+    PG.reseed(seed)
+    schedule = ArrivalSchedule(models[0].arrival_counts(arrival_rates), BedModel.ARRIVAL_GENERATED_AS, PG)
 
+    return [model.simulate_run(run=run, start_time=start_time, end_time=end_time, schedule=schedule)
+            for model in models]
 
-                current_time += timedelta(hours=1)
 
- 
 if __name__ == '__main__':
     warmup_n = 574
 
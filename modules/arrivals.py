@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from .patient import to_patient_lists
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+ARRIVAL_MODES = ('fixed', 'poisson', 'negative_binomial')
+
+
+def check_arrival_mode(mode, dispersion=None):
+    """
+    Check the arrival mode and its parameters are valid
+    :param mode: one of ARRIVAL_MODES
+    :param dispersion: the dispersion of the negative binomial mode
+    """
+    if mode not in ARRIVAL_MODES:
+        raise ValueError(f"arrival mode must be one of {ARRIVAL_MODES}, not '{mode}'")
+
+    if mode == 'negative_binomial' and (dispersion is None or dispersion <= 0):
+        raise ValueError('the negative binomial arrival mode needs a positive dispersion')
+
+
+def sample_arrivals(rates, mode='fixed', rng=None, dispersion=None):
+    """
+    Draw the number of arrivals from the hourly arrival rates
+    :param rates: array of hourly arrival rates, such as the output of expand_time_matrix
+    :param mode: 'fixed' to use the rates as the number of arrivals, 'poisson' to draw Poisson counts or
+        'negative_binomial' to draw overdispersed counts with variance rate + rate**2 / dispersion
+    :param rng: numpy Generator to draw from, if None the global numpy random state is used
+    :param dispersion: the size parameter of the negative binomial, smaller values give more variable arrivals
+    :return: integer array of arrivals the same shape as rates
+    """
+    check_arrival_mode(mode, dispersion)
+    rng = np.random if rng is None else rng
+    rates = np.asarray(rates)
+
+    if mode == 'poisson':
+        return rng.poisson(rates)
+
+    if mode == 'negative_binomial':
+        return rng.negative_binomial(dispersion, dispersion / (dispersion + rates))
+
+    return rates.astype(np.int64)
+
+
+def expand_time_matrix(time_matrix, sources, start_time, end_time):
+    """
+    Expand the weekday by hour time matrix into the arrivals for every hour of the simulation
+    :param time_matrix: dictionary of source: weekday: list of 24 hourly arrivals
+    :param sources: the sources (keys of the time matrix) to expand, in column order
+    :param start_time: datetime for when the simulation starts
+    :param end_time: datetime for when the simulation ends, inclusive
+    :return: (hours x sources) array of arrivals
+    """
+    hours = pd.date_range(start_time, end_time, freq='h')
+    week = np.array([[time_matrix[source][weekday] for weekday in WEEKDAYS] for source in sources])
+
+    return week[:, hours.weekday, hours.hour].T
+
+
+class ArrivalSchedule:
+    """
+    Every arrival for a run generated up front, one batch per source, and handed out an hour at a time
+    """
+
+    def __init__(self, counts, sources, PG):
+        """
+
+        :param counts: (hours x sources) array of the number of patients to generate each hour
+        :param sources: the source passed to the patient generator for each column of counts
+        :param PG: the patient generator, it must provide batch_generator
+        """
+        self.sources = sources
+        self.offsets = np.zeros((len(counts) + 1, len(sources)), dtype=np.int64)
+        np.cumsum(counts, axis=0, out=self.offsets[1:])
+
+        self.patients = [PG.batch_generator(n=int(self.offsets[-1, column]), source_=source)
+                         for column, source in enumerate(sources)]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def hour(self, step):
+        """
+        The patients arriving in an hour of the run
+        :param step: the number of hours since the start of the run
+        :return: list of structured arrays of patients, one per source
+        """
+        return [patients[start:end] for patients, start, end in zip(self.patients,
+                                                                    self.offsets[step],
+                                                                    self.offsets[step + 1])]
+
+    def hour_lists(self, step):
+        """
+        The patients arriving in an hour of the run as patient lists
+        :param step: the number of hours since the start of the run
+        :return: list of lists of patient lists, one per source
+        """
+        return [to_patient_lists(patients) for patients in self.hour(step)]
@@ -0,0 +1,229 @@
+import numpy as np
+
+from .patient import SOURCES, CATEGORIES, SOURCE_CODES, CATEGORY_CODES, PATIENT_DTYPE
+
+
+class BedStore:
+    """
+    Columnar store for the patients occupying the beds of one or more wards
+
+    Patients are held across parallel NumPy arrays rather than as a list of
+    [id, source, category, los, time] lists, so the hourly LOS countdown, discharges and
+    category counts are a single vectorised operation for every ward in the store.
+    Source and category are held as small integer codes (see SOURCES and CATEGORIES), and each
+    patient's ward as its position. Each ward keeps its patients in the order they were admitted.
+    """
+
+    def __init__(self, capacity=0, n_wards=1):
+        """
+
+        :param capacity: the number of beds to preallocate, the store grows beyond this if required
+        :param n_wards: the number of wards the patients are held for
+        """
+        size = max(int(capacity), 1)
+        self.ids = np.empty(size, dtype=np.int64)
+        self.source = np.empty(size, dtype=np.int8)
+        self.category = np.empty(size, dtype=np.int8)
+        self.los = np.empty(size, dtype=np.int32)
+        self.time = np.empty(size, dtype=np.int32)
+        self.ward = np.empty(size, dtype=np.int16)
+        self.n = 0
+        # The number of patients in each ward
+        self.sizes = [0] * n_wards
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __reserve(self, n):
+        """
+        Grow the underlying arrays so that at least n patients can be held
+        :param n: the number of patients that need to fit
+        """
+        size = len(self.ids)
+        if n <= size:
+            return
+
+        while size < n:
+            size *= 2
+
+        for column in ('ids', 'source', 'category', 'los', 'time', 'ward'):
+            old = getattr(self, column)
+            new = np.empty(size, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, column, new)
+
+    def append(self, patient, ward=0):
+        """
+        Add a single patient to a ward
+        :param patient: a list of [id, source, category, los, time] as made by the patient generator
+        :param ward: the position of the ward
+        """
+        self.__reserve(self.n + 1)
+        self.ids[self.n] = patient[0]
+        self.source[self.n] = SOURCE_CODES[patient[1]]
+        self.category[self.n] = CATEGORY_CODES[patient[2]]
+        self.los[self.n] = patient[3]
+        self.time[self.n] = patient[4]
+        self.ward[self.n] = ward
+        self.n += 1
+        self.sizes[ward] += 1
+
+    def extend(self, patients, ward=0):
+        """
+        Add a batch of patients to a ward
+        :param patients: structured array with PATIENT_DTYPE as made by the batch generator
+        :param ward: the position of the ward
+        """
+        start, end = self.n, self.n + len(patients)
+        self.__reserve(end)
+        self.ids[start:end] = patients['id']
+        self.source[start:end] = patients['source']
+        self.category[start:end] = patients['category']
+        self.los[start:end] = patients['los']
+        self.time[start:end] = patients['time']
+        self.ward[start:end] = ward
+        self.n = end
+        self.sizes[ward] += len(patients)
+
+    def tick(self):
+        """
+        Move the wards on by an hour, counting down the LOS and counting up the time of every patient
+        """
+        self.los[:self.n] -= 1
+        self.time[:self.n] += 1
+
+    def discharge(self):
+        """
+        Remove every patient who has reached the end of their LOS
+        :return: the number of patients discharged
+        """
+        keep = self.los[:self.n] != 0
+        remaining = int(np.count_nonzero(keep))
+        discharged = self.n - remaining
+
+        if discharged:
+            leaving = np.bincount(self.ward[:self.n][~keep], minlength=len(self.sizes))
+            self.sizes = [size - int(count) for size, count in zip(self.sizes, leaving)]
+            for column in (self.ids, self.source, self.category, self.los, self.time, self.ward):
+                column[:remaining] = column[:self.n][keep]
+            self.n = remaining
+
+        return discharged
+
+    def category_counts(self, ward=None):
+        """
+        Count the patients by category
+        :param ward: the position of the ward to count, if None every patient in the store is counted
+        :return: an array of counts indexed by the CATEGORIES codes
+        """
+        return np.bincount(self.category[self.__rows(ward)], minlength=len(CATEGORIES))
+
+    def occupancy(self):
+        """
+        Count the patients in each ward by category
+        :return: (wards x categories) numpy array of counts
+        """
+        cells = self.ward[:self.n].astype(np.int64) * len(CATEGORIES) + self.category[:self.n]
+        return np.bincount(cells, minlength=len(self.sizes) * len(CATEGORIES)).reshape(len(self.sizes),
+                                                                                       len(CATEGORIES))
+
+    def to_list(self, ward=None):
+        """
+        Convert the patients back to the list of patient lists used by the list engine
+        :param ward: the position of the ward to convert, if None every patient in the store is converted
+        :return: list of [id, source, category, los, time]
+        """
+        rows = self.__rows(ward)
+        return [[patient_id, SOURCES[source], CATEGORIES[category], los, time]
+                for patient_id, source, category, los, time in zip(self.ids[rows].tolist(),
+                                                                    self.source[rows].tolist(),
+                                                                    self.category[rows].tolist(),
+                                                                    self.los[rows].tolist(),
+                                                                    self.time[rows].tolist())]
+
+    def to_array(self, ward=None):
+        """
+        Copy the patients to a structured array
+        :param ward: the position of the ward to copy, if None every patient in the store is copied
+        :return: structured array with PATIENT_DTYPE
+        """
+        rows = self.__rows(ward)
+        ids = self.ids[rows]
+        patients = np.empty(len(ids), dtype=PATIENT_DTYPE)
+        patients['id'] = ids
+        patients['source'] = self.source[rows]
+        patients['category'] = self.category[rows]
+        patients['los'] = self.los[rows]
+        patients['time'] = self.time[rows]
+
+        return patients
+
+    def __rows(self, ward):
+        """
+        The rows of the patients in a ward
+        :param ward: the position of the ward, if None every row in use
+        :return: a slice or array of the rows
+        """
+        if ward is None:
+            return slice(0, self.n)
+
+        return np.flatnonzero(self.ward[:self.n] == ward)
+
+
+class StoredWard:
+    """
+    A ward whose patients are held in a BedStore shared by every ward in the hospital
+    """
+
+    def __init__(self, store, ward):
+        """
+
+        :param store: the BedStore shared by every ward in the hospital
+        :param ward: the position of this ward in the store
+        """
+        self.store = store
+        self.ward = ward
+
+    def __len__(self):
+        return self.store.sizes[self.ward]
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def append(self, patient):
+        """
+        Add a single patient to the ward
+        :param patient: a list of [id, source, category, los, time] as made by the patient generator
+        """
+        self.store.append(patient, self.ward)
+
+    def extend(self, patients):
+        """
+        Add a batch of patients to the ward
+        :param patients: structured array with PATIENT_DTYPE as made by the batch generator
+        """
+        self.store.extend(patients, self.ward)
+
+    def category_counts(self):
+        """
+        Count the patients in the ward by category
+        :return: an array of counts indexed by the CATEGORIES codes
+        """
+        return self.store.category_counts(self.ward)
+
+    def to_list(self):
+        """
+        Convert the ward back to the list of patient lists used by the list engine
+        :return: list of [id, source, category, los, time]
+        """
+        return self.store.to_list(self.ward)
+
+    def to_array(self):
+        """
+        Copy the patients in the ward to a structured array
+        :return: structured array with PATIENT_DTYPE
+        """
+        return self.store.to_array(self.ward)
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import stats
+except ImportError:  # scipy is only needed for the distributional tests
+    stats = None
+
+# The columns of collect_results that identify an hour of a run rather than being results
+KEY_COLUMNS = ('DateTime', 'Run Name')
+
+
+def _require_scipy():
+    if stats is None:
+        raise ImportError('scipy is required for the distributional tests of engine equivalence, '
+                          'install it with "pip install scipy"')
+
+
+def simulate_engine(build, engine, start_time, end_time, warmup_number, runs=20, seed=0, warmup_seed=None,
+                    **options):
+    """
+    Warm up and simulate a model on an engine from a fixed seed
+    :param build: callable taking the name of an engine and returning a BedModel that has not been warmed up
+    :param engine: the engine to simulate, see BedModel
+    :param start_time: datetime for when the simulation should start
+    :param end_time: datetime for when the simulation should end
+    :param warmup_number: the number of patients to warm the model up with
+    :param runs: the number of runs
+    :param seed: the seed of the random stream of every run
+    :param warmup_seed: the seed of the warm-up patients, defaults to seed. Keep it the same when comparing
+        simulations with different seeds, so that they start from the same warmed-up state
+    :param options: other arguments of simulate_inpatient_system, e.g. n_jobs or pregenerate
+    :return: DataFrame of the results as given by collect_results
+    """
+    model = build(engine)
+    model.PG.reseed(seed if warmup_seed is None else warmup_seed)
+    model.warm_up_model(warmup_number=warmup_number)
+    model.simulate_inpatient_system(start_time=start_time, end_time=end_time, runs=runs, seed=seed, **options)
+    return model.collect_results()
+
+
+def exact_differences(reference, candidate):
+    """
+    The results that are not identical between two simulations of the same seeded inputs
+    :param reference: DataFrame of results from collect_results
+    :param candidate: DataFrame of results from collect_results
+    :return: list of the columns that differ, every column if the simulations do not cover the same hours and runs
+    """
+    if list(reference.columns) != list(candidate.columns) or len(reference) != len(candidate):
+        return sorted(set(reference.columns) | set(candidate.columns))
+
+    keys = list(KEY_COLUMNS)
+    if not reference[keys].equals(candidate[keys]):
+        return list(reference.columns)
+
+    # Occupancy rates are NaN for wards without beds, which count as equal
+    return [column for column in reference.columns.drop(keys)
+            if not np.array_equal(reference[column].to_numpy(), candidate[column].to_numpy(), equal_nan=True)]
+
+
+def run_statistics(results, metrics=None, statistics=('mean', 'max')):
+    """
+    Reduce each run to statistics of its hourly metrics, giving independent observations to compare, as the
+    hours within a run are not
+    :param results: DataFrame of results from collect_results
+    :param metrics: the metrics to reduce, defaults to the occupied beds of each ward and the escalation beds used
+    :param statistics: the pandas aggregations to reduce each metric with
+    :return: DataFrame with a row per run and a (metric, statistic) column
+    """
+    if metrics is None:
+        metrics = [column for column in results.columns if column.startswith('Occupied ')] + ['Escalation Beds Used']
+
+    return results.groupby('Run Name', sort=False)[list(metrics)].agg(list(statistics))
+
+
+def distribution_tests(reference, candidate, metrics=None, statistics=('mean', 'max'), alpha=0.01):
+    """
+    Test whether two simulations give the same distribution of results, when their random streams are used in a
+    different order so the results can not match exactly
+
+    The statistics of each run are compared with a two sample Kolmogorov-Smirnov test and Welch's t-test.
+
+    :param reference: DataFrame of results from collect_results
+    :param candidate: DataFrame of results from collect_results
+    :param metrics: the metrics to compare, see run_statistics
+    :param statistics: the statistics of each run to compare
+    :param alpha: the significance level, a metric is equivalent if neither test rejects at this level
+    :return: DataFrame with a row per metric and statistic
+    """
+    _require_scipy()
+
+    reference = run_statistics(reference, metrics, statistics)
+    candidate = run_statistics(candidate, metrics, statistics)
+
+    rows = []
+    for metric, statistic in reference.columns:
+        x = reference[(metric, statistic)].to_numpy(dtype=float)
+        y = candidate[(metric, statistic)].to_numpy(dtype=float)
+
+        ks = stats.ks_2samp(x, y)
+        if np.ptp(x) == 0 and np.ptp(y) == 0:
+            # The t-test is undefined without variation, the samples are the same if their values are
+            t_statistic, t_pvalue = 0.0, float(x[0] == y[0])
+        else:
+            t_statistic, t_pvalue = stats.ttest_ind(x, y, equal_var=False)
+
+        rows.append((metric, statistic, x.mean(), y.mean(), ks.statistic, ks.pvalue, t_statistic, t_pvalue))
+
+    df = pd.DataFrame(rows, columns=['Metric', 'Statistic', 'Reference Mean', 'Candidate Mean', 'KS Statistic',
+                                     'KS p-value', 't Statistic', 't p-value'])
+    df['Equivalent'] = (df['KS p-value'] >= alpha) & (df['t p-value'] >= alpha)
+
+    return df
+
+
+def compare_engines(build, start_time, end_time, warmup_number, engines=('array', 'calendar'), reference='list',
+                    runs=20, seed=0, warmup_seed=None, reference_options=None, **options):
+    """
+    Simulate the reference engine and each candidate engine on the same seeded inputs and compare their results
+    exactly
+    :param build: callable taking the name of an engine and returning a BedModel that has not been warmed up
+    :param start_time: datetime for when the simulation should start
+    :param end_time: datetime for when the simulation should end
+    :param warmup_number: the number of patients to warm the models up with
+    :param engines: the candidate engines
+    :param reference: the engine the candidates should reproduce, the original list engine by default
+    :param runs: the number of runs
+    :param seed: the seed of the random stream of every run
+    :param warmup_seed: the seed of the warm-up patients of every engine, defaults to seed
+    :param reference_options: arguments of simulate_inpatient_system for the reference only
+    :param options: arguments of simulate_inpatient_system for the candidates, and the reference unless
+        reference_options are given
+    :return: tuple of (the reference results, dictionary of engine: (results, list of the columns that differ))
+    """
+    expected = simulate_engine(build, reference, start_time, end_time, warmup_number, runs, seed, warmup_seed,
+                               **(options if reference_options is None else reference_options))
+
+    compared = {}
+    for engine in engines:
+        results = simulate_engine(build, engine, start_time, end_time, warmup_number, runs, seed, warmup_seed,
+                                  **options)
+        compared[engine] = (results, exact_differences(expected, results))
+
+    return expected, compared
@@ -1,35 +1,84 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objs as go
+from plotly.colors import DEFAULT_PLOTLY_COLORS
 
+GRAPH_MODES = ('fan', 'traces')
 
-def graph_results(df, graph='occupied'):
+
+def graph_results(df, graph='occupied', mode='fan', quantiles=(0.05, 0.5, 0.95), max_points=1000):
     """
     This function should graphically show the results of the simulation
-    :return:
+    :param df: the BedModel to show the results of, or a DataFrame of its results as given by collect_results
+    :param graph: the graph to show, 'occupied' for the occupied beds of each ward
+    :param mode: 'fan' to show the median and a band between the lower and upper quantiles across the runs for
+        each ward, or 'traces' to show every run
+    :param quantiles: the (lower, middle, upper) quantiles of the fan chart
+    :param max_points: the most hours of each run drawn in trace mode, longer runs are thinned to every nth hour
+    :return: plotly Figure
     """
-    data = df.collect_results()
+    if mode not in GRAPH_MODES:
+        raise ValueError(f"graph mode must be one of {GRAPH_MODES}, not '{mode}'")
 
-    run_names = data['Run Name'].unique()
+    data = df if isinstance(df, pd.DataFrame) else df.collect_results()
 
     if graph == 'occupied':
+        columns = [column for column in data.columns if column.startswith('Occupied ')]
+        times, values = run_arrays(data, columns)
+
         fig = go.Figure()
+        for i, column in enumerate(columns):
+            name = column.title() + ' Beds'
+            colour = DEFAULT_PLOTLY_COLORS[i % len(DEFAULT_PLOTLY_COLORS)]
 
-        for i in run_names:
-            fig.add_trace(go.Scatter(x=data[data['Run Name'] == i]['DateTime'],
-                                     y=data[data['Run Name'] == i]['Occupied medical emergency'],
-                                     name='Occupied Medical Emergency Beds'))
+            if mode == 'fan':
+                for trace in _fan_traces(times, values[:, :, i], name, colour, quantiles):
+                    fig.add_trace(trace)
+            else:
+                fig.add_trace(_run_traces(times, values[:, :, i], name, colour, max_points))
 
-            fig.add_trace(go.Scatter(x=data[data['Run Name'] == i]['DateTime'],
-                                     y=data[data['Run Name'] == i]['Occupied surgical emergency'],
-                                     name='Occupied Surgical Emergency Beds'))
+        fig.update_layout(margin=dict(t=10, l=10, r=10, b=10), template='seaborn')
 
-            fig.add_trace(go.Scatter(x=data[data['Run Name'] == i]['DateTime'],
-                                     y=data[data['Run Name'] == i]['Occupied Elective'],
-                                     name='Occupied Elective Beds'))
+        return fig
 
-            fig.add_trace(go.Scatter(x=data[data['Run Name'] == i]['DateTime'],
-                                     y=data[data['Run Name'] == i]['Occupied escalation'],
-                                     name='Occupied Escalation Beds'))
 
-        fig.update_layout(margin=dict(t=10, l=10, r=10, b=10), template='seaborn')
+def run_arrays(data, columns):
+    """
+    Split the results into an array per run in one pass, rather than filtering the DataFrame for every run
+    :param data: DataFrame of results as given by BedModel.collect_results
+    :param columns: the metrics to take
+    :return: tuple of (the hours, array of DateTime), (runs x hours x columns) float array, NaN for the hours a run
+        does not cover
+    """
+    runs, _ = pd.factorize(data['Run Name'])
+    hours, times = pd.factorize(data['DateTime'], sort=True)
 
-        return fig
+    values = np.full((runs.max(initial=-1) + 1, len(times), len(columns)), np.nan)
+    values[runs, hours] = data[columns].to_numpy(dtype=float)
+
+    return np.asarray(times), values
+
+
+def _fan_traces(times, values, name, colour, quantiles):
+    lower, middle, upper = np.nanquantile(values, quantiles, axis=0) if len(values) else np.full((3, 0), np.nan)
+    fill = colour.replace('rgb(', 'rgba(').replace(')', ', 0.2)')
+
+    return [go.Scatter(x=times, y=upper, mode='lines', line=dict(width=0), legendgroup=name, showlegend=False,
+                       hoverinfo='skip'),
+            go.Scatter(x=times, y=lower, mode='lines', line=dict(width=0), fill='tonexty', fillcolor=fill,
+                       legendgroup=name, name=f'{name} P{quantiles[0] * 100:g}-P{quantiles[2] * 100:g}'),
+            go.Scatter(x=times, y=middle, mode='lines', line=dict(color=colour), legendgroup=name,
+                       name=f'{name} P{quantiles[1] * 100:g}')]
+
+
+def _run_traces(times, values, name, colour, max_points):
+    # Every run goes in a single WebGL trace, with a gap after each run to break the line
+    step = max(1, -(-len(times) // max_points))
+    times, values = times[::step], values[:, ::step]
+
+    runs = len(values)
+    x = np.tile(np.append(times, times[-1:] if len(times) else times), runs)
+    y = np.column_stack([values, np.full(runs, np.nan)]).ravel()
+
+    return go.Scattergl(x=x, y=y, mode='lines', line=dict(color=colour, width=1), opacity=0.5, name=name,
+                        connectgaps=False)
@@ -0,0 +1,254 @@
+import warnings
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # numba is only needed for the compiled kernels
+    numba = None
+
+from .lockstep import arrival_order
+from .patient import CATEGORIES
+
+# The ways of simulating runs in lockstep, modules.lockstep.LockstepRuns or the compiled simulate_kernel
+BACKENDS = ('numpy', 'numba')
+
+
+def jit(function):
+    """
+    Compile a kernel with numba when it is installed, otherwise leave it as plain Python
+    :param function: the kernel, written over integer arrays
+    :return: the compiled kernel, or the function itself without numba
+    """
+    if numba is None:
+        return function
+
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+def check_backend(backend=None):
+    """
+    The backend to simulate runs in lockstep with, falling back to NumPy with a warning when numba is asked for but
+    not installed
+    :param backend: one of BACKENDS, or None for numba when it is installed and numpy otherwise
+    :return: the backend
+    """
+    if backend is None:
+        return 'numpy' if numba is None else 'numba'
+
+    if backend not in BACKENDS:
+        raise ValueError(f"lockstep backend must be one of {BACKENDS}, not '{backend}'")
+
+    if backend == 'numba' and numba is None:
+        warnings.warn('numba is not installed, the runs are simulated with NumPy instead. Install it with '
+                      '"pip install numba" for the compiled kernels')
+        return 'numpy'
+
+    return backend
+
+
+def rule_array(placement):
+    """
+    The placement rules as an array the kernels can read
+    :param placement: modules.placement.PlacementTable
+    :return: (categories x longest rule) array of pool indices, padded with -1
+    """
+    rules = np.full((len(CATEGORIES), max([len(rule) for rule in placement.rules] + [1])), -1, dtype=np.int64)
+    for category, rule in enumerate(placement.rules):
+        rules[category, :len(rule)] = rule
+
+    return rules
+
+
+def simulate_runs(hospital, placement, initial, schedules):
+    """
+    Simulate independent runs one after another with the compiled kernel, giving the same results as
+    modules.lockstep.LockstepRuns
+    :param hospital: the modules.ward.Hospital being simulated
+    :param placement: the modules.placement.PlacementTable patients are admitted by
+    :param initial: the Snapshot every run starts from
+    :param schedules: the ArrivalSchedule of each run, all covering the same hours. Every patient arriving
+        joins the first holding area, the ED queue
+    :return: (runs x hours x metrics) array of the hourly metrics, the columns following hospital.metrics
+    """
+    runs, n_categories = len(schedules), len(CATEGORIES)
+    hours = len(schedules[0]) if schedules else 0
+
+    # The patients waiting at the start of every run, by (queue, category)
+    queue_los, queue_offsets = [], [0]
+    for queue in range(initial.n_queues):
+        patients = initial.queue(queue)
+        for category in range(n_categories):
+            queue_los.append(patients['los'][patients['category'] == category])
+            queue_offsets.append(queue_offsets[-1] + len(queue_los[-1]))
+
+    # The patients arriving in each run by category, and how many of them have arrived by the end of each hour
+    arrival_los, arrival_offsets = [], [0]
+    arrived = np.zeros((runs, hours + 1, n_categories), dtype=np.int64)
+    for run, schedule in enumerate(schedules):
+        patients, arrival_hours = arrival_order(schedule)
+        for category in range(n_categories):
+            of_category = patients['category'] == category
+            arrival_los.append(patients['los'][of_category])
+            arrival_offsets.append(arrival_offsets[-1] + len(arrival_los[-1]))
+            arrived[run, 1:, category] = np.cumsum(np.bincount(arrival_hours[of_category], minlength=hours))
+
+    out = np.zeros((runs, hours, len(hospital.metrics)), dtype=np.int32)
+    simulate_kernel(out, hospital.beds, hospital.overflow, hospital.outlier_categories, hospital.outlier_wards,
+                    rule_array(placement), np.array(placement.categories, dtype=np.int64),
+                    initial.wards['place'].astype(np.int64), initial.wards['category'].astype(np.int64),
+                    initial.wards['los'].astype(np.int64), initial.n_queues, _flat(queue_los),
+                    np.array(queue_offsets, dtype=np.int64), _flat(arrival_los),
+                    np.array(arrival_offsets, dtype=np.int64), arrived)
+
+    return out
+
+
+def _flat(arrays):
+    return np.concatenate(arrays).astype(np.int64) if arrays else np.zeros(0, dtype=np.int64)
+
+
+@jit
+def simulate_kernel(out, beds, overflow, outlier_categories, outlier_wards, rules, order, ward_place, ward_category,
+                    ward_los, n_queues, queue_los, queue_offsets, arrival_los, arrival_offsets, arrived):
+    """
+    The whole simulation loop of each run over integer arrays, placing, discharging and counting patients exactly
+    as BedModel does
+    :param out: (runs x hours x metrics) array the hourly metrics are written into
+    :param beds: the number of beds in each ward
+    :param overflow: whether each ward is an overflow ward, such as escalation
+    :param outlier_categories: the categories with a home ward, as Hospital.outlier_categories
+    :param outlier_wards: whether each ward holds outliers of each of those categories, as Hospital.outlier_wards
+    :param rules: the placement rules as given by rule_array
+    :param order: the category codes in the order they are admitted
+    :param ward_place: the ward of each patient in a bed at the start of the runs
+    :param ward_category: the category code of each patient in a bed at the start of the runs
+    :param ward_los: the remaining LOS of each patient in a bed at the start of the runs
+    :param n_queues: the number of holding areas, the ED queue, the non-ED queue and the Elective queue
+    :param queue_los: the LOS of the patients waiting at the start of the runs, by (queue, category)
+    :param queue_offsets: the start of each (queue, category) in queue_los, followed by the total
+    :param arrival_los: the LOS of the patients arriving in the ED queue, by (run, category)
+    :param arrival_offsets: the start of each (run, category) in arrival_los, followed by the total
+    :param arrived: (runs x hours + 1 x categories) array of the patients that have arrived by the end of each hour
+    """
+    runs, hours = out.shape[0], out.shape[1]
+    n_wards, n_categories = len(beds), arrived.shape[2]
+
+    for run in range(runs):
+        occupancy = np.zeros((n_wards, n_categories), dtype=np.int64)
+        # The discharges due each hour, those due after the last hour never happen within the run
+        discharges = np.zeros((hours + 1, n_wards, n_categories), dtype=np.int64)
+        for patient in range(len(ward_place)):
+            occupancy[ward_place[patient], ward_category[patient]] += 1
+            if ward_los[patient] >= 1:
+                discharges[min(ward_los[patient] - 1, hours), ward_place[patient], ward_category[patient]] += 1
+
+        head = np.zeros((n_queues, n_categories), dtype=np.int64)
+        tail = np.zeros((n_queues, n_categories), dtype=np.int64)
+        for queue in range(n_queues):
+            for category in range(n_categories):
+                index = queue * n_categories + category
+                tail[queue, category] = queue_offsets[index + 1] - queue_offsets[index]
+        waiting_at_start = tail[0].copy()
+
+        free = np.zeros(n_wards, dtype=np.int64)
+
+        for step in range(hours):
+            discharged = 0
+            for ward in range(n_wards):
+                for category in range(n_categories):
+                    discharged += discharges[step, ward, category]
+                    occupancy[ward, category] -= discharges[step, ward, category]
+            occupied_before = occupancy.sum()
+
+            for category in range(n_categories):
+                tail[0, category] = waiting_at_start[category] + arrived[run, step + 1, category]
+
+            for ward in range(n_wards):
+                free[ward] = max(beds[ward] - occupancy[ward].sum(), 0)
+
+            # Each category in turn takes as many beds as it can from each holding area in order
+            for category in order:
+                for queue in range(n_queues):
+                    n = tail[queue, category] - head[queue, category]
+                    for pool in rules[category]:
+                        if pool < 0 or n == 0:
+                            break
+
+                        taken = min(n, free[pool])
+                        for position in range(head[queue, category], head[queue, category] + taken):
+                            index = queue * n_categories + category
+                            if position < queue_offsets[index + 1] - queue_offsets[index]:
+                                los = queue_los[queue_offsets[index] + position]
+                            else:
+                                index = run * n_categories + category
+                                los = arrival_los[arrival_offsets[index] + position - waiting_at_start[category]]
+
+                            # Patients are discharged when their LOS has counted down to 0, never if it starts at 0
+                            if los >= 1:
+                                discharges[min(step + los, hours), pool, category] += 1
+
+                        occupancy[pool, category] += taken
+                        free[pool] -= taken
+                        head[queue, category] += taken
+                        n -= taken
+
+            admitted = occupancy.sum() - occupied_before
+
+            cancelled = 0
+            if n_queues > 2:
+                for category in range(n_categories):
+                    cancelled += tail[2, category] - head[2, category]
+                    head[2, category] = tail[2, category]
+
+            waiting = 0
+            for queue in range(min(n_queues, 2)):
+                for category in range(n_categories):
+                    waiting += tail[queue, category] - head[queue, category]
+
+            write_metrics(out[run, step], occupancy, beds, overflow, outlier_categories, outlier_wards, admitted,
+                          discharged, waiting, cancelled)
+
+
+@jit
+def write_metrics(metrics, occupancy, beds, overflow, outlier_categories, outlier_wards, admitted, discharged, waiting,
+                  cancelled):
+    """
+    The metrics of an hour in the order of Hospital.hourly_metrics, worked out the same way
+    :param metrics: array of the metrics of the hour to write into
+    :param occupancy: (wards x categories) array of the patients in each ward by category
+    :param beds: the number of beds in each ward
+    :param overflow: whether each ward is an overflow ward, such as escalation
+    :param outlier_categories: the categories with a home ward, as Hospital.outlier_categories
+    :param outlier_wards: whether each ward holds outliers of each of those categories, as Hospital.outlier_wards
+    :param admitted: the number of patients admitted in the hour
+    :param discharged: the number of patients discharged in the hour
+    :param waiting: the number of patients waiting for a bed (trolley waits)
+    :param cancelled: the number of Elective patients cancelled in the hour
+    """
+    n_wards = len(beds)
+    used = 0
+    for ward in range(n_wards):
+        occupied = occupancy[ward].sum()
+        available = beds[ward] - occupied
+        # A full escalation ward is recorded as having every bed available, as in Hospital.hourly_metrics
+        if overflow[ward] and available == 0:
+            available = beds[ward]
+        metrics[ward] = available
+        metrics[n_wards + ward] = occupied
+        if overflow[ward]:
+            used += occupied
+
+    for k in range(len(outlier_categories)):
+        outliers = 0
+        for ward in range(n_wards):
+            if outlier_wards[ward, k]:
+                outliers += occupancy[ward, outlier_categories[k]]
+        metrics[2 * n_wards + k] = outliers
+
+    totals = 2 * n_wards + len(outlier_categories)
+    metrics[totals] = used
+    metrics[totals + 1] = admitted
+    metrics[totals + 2] = discharged
+    metrics[totals + 3] = waiting
+    metrics[totals + 4] = cancelled
@@ -0,0 +1,220 @@
+import numpy as np
+
+from .patient import CATEGORIES
+
+# Most cells of the (runs x hours x wards x categories) discharge calendar simulated in one block of runs
+MAX_CALENDAR_CELLS = 1 << 24
+
+
+class LockstepRuns:
+    """
+    Independent runs of a hospital advanced an hour at a time together, each step a handful of array operations
+    across every run rather than a pass of the simulation loop per run
+
+    Only the numbers of patients matter to the hourly metrics, so each run is held as counts: the patients of each
+    category in each ward, the discharges due in each ward for every hour of the runs, and how far each run has got
+    through the patients waiting in each holding area. The waiting patients of a run are known up front, from its
+    arrivals, so admitting the first n patients of a category only needs their lengths of stay to file their
+    discharges. Patients are placed, discharged and counted exactly as BedModel does for a single run.
+    """
+
+    def __init__(self, hospital, placement, initial, schedules):
+        """
+
+        :param hospital: the modules.ward.Hospital being simulated
+        :param placement: the modules.placement.PlacementTable patients are admitted by
+        :param initial: the Snapshot every run starts from
+        :param schedules: the ArrivalSchedule of each run, all covering the same hours. Every patient arriving
+            joins the first holding area, the ED queue
+        """
+        self.hospital = hospital
+        self.placement = placement
+        self.runs = len(schedules)
+        self.hours = len(schedules[0]) if schedules else 0
+
+        shape = (self.runs, len(hospital.beds), len(CATEGORIES))
+        self.occupancy = np.zeros(shape, dtype=np.int64)
+        np.add.at(self.occupancy, (slice(None), initial.wards['place'], initial.wards['category']), 1)
+
+        # The discharges due each hour, those due after the last hour never happen within the runs
+        self.discharges = np.zeros((self.runs, self.hours + 1) + shape[1:], dtype=np.int32)
+        los = initial.wards['los'].astype(np.int64)
+        # Patients already in a bed are discharged in the hour their LOS counts down to 0
+        due = np.where(los >= 1, np.minimum(los - 1, self.hours), self.hours)
+        np.add.at(self.discharges, (slice(None), due, initial.wards['place'], initial.wards['category']), 1)
+
+        # The patients of each (queue, category) in the order they wait, one block per run
+        queues = [initial.queue(queue) for queue in range(initial.n_queues)]
+        self.queues = [[_Waiting(patients[patients['category'] == category], self.runs)
+                        for category in range(len(CATEGORIES))] for patients in queues]
+        arrivals = [arrival_order(schedule) for schedule in schedules]
+        for category, waiting in enumerate(self.queues[0]):
+            waiting.add_arrivals(arrivals, category, self.hours)
+
+    def simulate(self, out=None):
+        """
+        Run every run from the first hour to the last
+        :param out: (runs x hours x metrics) array to write the hourly metrics into
+        :return: (runs x hours x metrics) array of the hourly metrics, the columns following hospital.metrics
+        """
+        if out is None:
+            out = np.zeros((self.runs, self.hours, len(self.hospital.metrics)), dtype=np.int32)
+
+        for step in range(self.hours):
+            out[:, step] = self.step(step)
+
+        return out
+
+    def step(self, step):
+        """
+        Simulate an hour of every run
+        :param step: the number of hours since the start of the runs
+        :return: (runs x metrics) array of the metrics of the hour
+        """
+        occupancy = self.occupancy
+
+        due = self.discharges[:, step]
+        occupancy -= due
+        discharged = due.sum(axis=(1, 2))
+        occupied_before = occupancy.sum(axis=(1, 2))
+
+        for waiting in self.queues[0]:
+            waiting.arrive(step)
+
+        free = np.maximum(self.hospital.beds - occupancy.sum(axis=2), 0)
+
+        # Each category in turn takes as many beds as it can from each holding area in order
+        for category in self.placement.categories:
+            rule = self.placement.rules[category]
+            for queue in self.queues:
+                waiting = queue[category]
+                n = waiting.waiting()
+                if not rule or not n.any():
+                    continue
+
+                taken = np.empty((self.runs, len(rule)), dtype=np.int64)
+                remaining = n
+                for position, pool in enumerate(rule):
+                    taken[:, position] = np.minimum(remaining, free[:, pool])
+                    remaining = remaining - taken[:, position]
+                    free[:, pool] -= taken[:, position]
+                    occupancy[:, pool, category] += taken[:, position]
+
+                self.__file_discharges(waiting, category, rule, taken, step)
+
+        admitted = occupancy.sum(axis=(1, 2)) - occupied_before
+        cancelled = sum(waiting.clear() for waiting in self.queues[2]) if len(self.queues) > 2 else 0
+        trolley_waits = sum(waiting.waiting() for queue in self.queues[:2] for waiting in queue)
+
+        return self.hospital.hourly_metrics(occupancy, admitted=admitted, discharged=discharged,
+                                            waiting=trolley_waits, cancelled=cancelled)
+
+    def __file_discharges(self, waiting, category, rule, taken, step):
+        """
+        Take the admitted patients off the front of a holding area and file their discharges
+        :param waiting: the _Waiting patients of the category
+        :param category: the category code
+        :param rule: the pools of the category in order
+        :param taken: (runs x pools of the rule) array of the number of patients each pool takes
+        :param step: the number of hours since the start of the runs
+        """
+        n = taken.sum(axis=1)
+        if not n.any():
+            return
+
+        runs, within, los = waiting.take(n)
+
+        # The admitted patients of a run fill the pools of the rule in order
+        bounds = np.cumsum(taken, axis=1)[runs, :-1]
+        pools = np.asarray(rule)[(within[:, None] >= bounds).sum(axis=1)]
+
+        # Patients are discharged when their LOS has counted down to 0, never if it starts at 0
+        due = np.where(los >= 1, np.minimum(step + los, self.hours), self.hours)
+        np.add.at(self.discharges, (runs, due, pools, category), 1)
+
+
+def arrival_order(schedule):
+    """
+    The patients of a run in the order they join the queue, the sources of each hour one after another
+    :param schedule: the ArrivalSchedule of the run
+    :return: (structured array of patients, the hour each arrives in)
+    """
+    hours = np.concatenate([np.repeat(np.arange(len(schedule)), np.diff(schedule.offsets[:, column]))
+                            for column in range(len(schedule.sources))])
+    order = np.argsort(hours, kind='stable')
+    return np.concatenate(schedule.patients)[order], hours[order]
+
+
+class _Waiting:
+    """
+    The patients of a category in a holding area of every run, in the order they wait
+    """
+
+    def __init__(self, initial, runs):
+        """
+
+        :param initial: structured array of the patients waiting at the start of every run
+        :param runs: the number of runs
+        """
+        self.runs = runs
+        self.los = np.tile(initial['los'].astype(np.int64), runs)
+        self.offsets = np.arange(runs + 1, dtype=np.int64) * len(initial)
+        self.arrivals = None
+        self.head = np.zeros(runs, dtype=np.int64)
+        self.tail = np.full(runs, len(initial), dtype=np.int64)
+
+    def add_arrivals(self, arrivals, category, hours):
+        """
+        Add the patients of the category arriving in each run, after those waiting at the start
+        :param arrivals: (patients, hour each arrives in) of each run, in the order they join the queue
+        :param category: the category code
+        :param hours: the number of hours of the runs
+        """
+        los = []
+        self.arrivals = np.zeros((self.runs, hours + 1), dtype=np.int64)
+        for run, (patients, arrival_hours) in enumerate(arrivals):
+            of_category = patients['category'] == category
+            los.append(self.los[self.offsets[run]:self.offsets[run + 1]])
+            los.append(patients['los'][of_category].astype(np.int64))
+            self.arrivals[run, 1:] = np.cumsum(np.bincount(arrival_hours[of_category], minlength=hours))
+
+        self.arrivals += self.tail[:, None]
+        self.offsets = np.concatenate([[0], np.cumsum(self.arrivals[:, -1])])
+        self.los = np.concatenate(los) if los else self.los
+
+    def arrive(self, step):
+        """
+        Let the patients arriving in an hour join the queue
+        :param step: the number of hours since the start of the runs
+        """
+        if self.arrivals is not None:
+            self.tail = self.arrivals[:, step + 1]
+
+    def waiting(self):
+        """
+        :return: the number of patients waiting in each run
+        """
+        return self.tail - self.head
+
+    def take(self, n):
+        """
+        Remove the first patients waiting in each run
+        :param n: the number of patients to take from each run
+        :return: (the run, position among those taken from the run and LOS) of each patient taken
+        """
+        total = n.sum()
+        runs = np.repeat(np.arange(self.runs), n)
+        within = np.arange(total) - np.repeat(np.cumsum(n) - n, n)
+        taken = self.los[np.repeat(self.offsets[:-1] + self.head, n) + within]
+
+        self.head = self.head + n
+        return runs, within, taken
+
+    def clear(self):
+        """
+        Remove every patient waiting
+        :return: the number of patients removed from each run
+        """
+        cleared = self.waiting()
+        self.head = self.tail.copy()
+        return cleared
@@ -0,0 +1,184 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed to read Parquet extracts
+    pq = None
+
+from .patient import CATEGORIES, CATEGORY_CODES, SOURCES, SOURCE_CODES
+
+# Bump when the way the tables are fitted changes, so tables cached by older versions are refitted
+TABLE_VERSION = 2
+
+
+class EmpiricalLOS:
+    """
+    Length of stay distributions taken from historical episodes, one per (source, category)
+
+    Each group is held as its distinct lengths of stay (in whole hours) and their cumulative probabilities. The
+    tables of every group are laid end to end with group g's cumulative probabilities shifted to (g, g + 1], so the
+    lengths of stay of a batch of patients from any mix of groups are drawn with a single searchsorted.
+    """
+
+    def __init__(self, sources, categories, offsets, values, cdf):
+        """
+
+        :param sources: the source code of each group
+        :param categories: the category code of each group
+        :param offsets: the start of each group's table in values and cdf, followed by the total length
+        :param values: the lengths of stay of every group, in hours
+        :param cdf: the cumulative probability of each length of stay within its group
+        """
+        self.sources = np.asarray(sources, dtype=np.int8)
+        self.categories = np.asarray(categories, dtype=np.int8)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.int32)
+        self.cdf = np.asarray(cdf, dtype=float)
+
+        self.groups = np.full((len(SOURCES), len(CATEGORIES)), -1, dtype=np.int64)
+        self.groups[self.sources, self.categories] = np.arange(len(self.sources))
+        self.keys = np.repeat(np.arange(len(self.sources)), np.diff(self.offsets)) + self.cdf
+
+    @classmethod
+    def from_counts(cls, counts):
+        """
+        Build the tables from the number of episodes of each length of stay
+        :param counts: Series of counts indexed by (source code, category code, length of stay in hours)
+        :return: EmpiricalLOS
+        """
+        counts = counts[counts > 0].sort_index()
+        groups = counts.groupby(level=[0, 1], sort=True)
+
+        cdf = groups.cumsum() / groups.transform('sum')
+        sizes = groups.size()
+
+        return cls(sources=sizes.index.get_level_values(0), categories=sizes.index.get_level_values(1),
+                   offsets=np.concatenate([[0], np.cumsum(sizes.to_numpy())]),
+                   values=counts.index.get_level_values(2), cdf=cdf.to_numpy())
+
+    def has(self, source, category):
+        """
+        Whether there are lengths of stay for a group
+        :param source: the source code
+        :param category: the category code
+        :return: bool
+        """
+        return bool(self.groups[source, category] >= 0)
+
+    def sample(self, sources, categories, rng=None):
+        """
+        Draw a length of stay for each patient from their group's distribution
+        :param sources: numpy array of the source code of each patient
+        :param categories: numpy array of the category code of each patient
+        :param rng: numpy Generator to draw from, if None the global numpy random state is used
+        :return: numpy array of lengths of stay in hours
+        """
+        rng = np.random if rng is None else rng
+        groups = self.groups[sources, categories]
+        if (groups < 0).any():
+            raise ValueError('there are no lengths of stay for some of the patients (source, category)')
+
+        # Within a group the first key above g + u is the length of stay with cumulative probability above u
+        positions = np.searchsorted(self.keys, groups + rng.random(len(groups)), side='right')
+        return self.values[np.minimum(positions, len(self.values) - 1)]
+
+    def save(self, path):
+        """
+        Save the tables to a .npz file
+        :param path: the file to write
+        """
+        np.savez(path, version=TABLE_VERSION, sources=self.sources, categories=self.categories,
+                 offsets=self.offsets, values=self.values, cdf=self.cdf)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load tables saved with save
+        :param path: the .npz file
+        :return: EmpiricalLOS
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['sources'], data['categories'], data['offsets'], data['values'], data['cdf'])
+
+
+def fit_empirical_los(path, cache_dir=None, source_column='source', category_column='category', los_column='los',
+                      scale=1, chunksize=1_000_000):
+    """
+    Build the length of stay tables of each (source, category) from an extract of historical episodes
+
+    The extract is read in chunks, so only the counts of each length of stay are held in memory. If a cache
+    directory is given the tables are saved there under a hash of the extract and these settings, and are
+    loaded from it instead of being refitted while the extract is unchanged.
+
+    :param path: a CSV or Parquet file with a row per episode
+    :param cache_dir: the directory to cache the tables in, None to always fit them
+    :param source_column: the column of the admission source, one of modules.patient.SOURCES
+    :param category_column: the column of the patient category, one of modules.patient.CATEGORIES
+    :param los_column: the column of the length of stay
+    :param scale: the number of hours in a unit of the length of stay column, e.g. 24 for days
+    :param chunksize: the number of rows read at a time
+    :return: EmpiricalLOS
+    """
+    cache_path = None
+    if cache_dir is not None:
+        digest = _digest(path, (TABLE_VERSION, source_column, category_column, los_column, scale))
+        cache_path = os.path.join(cache_dir, f'los-{digest}.npz')
+        if os.path.exists(cache_path):
+            return EmpiricalLOS.load(cache_path)
+
+    counts = None
+    for chunk in _read_chunks(path, [source_column, category_column, los_column], chunksize):
+        unknown = (set(chunk[source_column].unique()) - set(SOURCES)) | (set(chunk[category_column].unique())
+                                                                         - set(CATEGORIES))
+        if unknown:
+            raise ValueError(f"unknown sources or categories in the extract {sorted(map(str, unknown))}")
+
+        los = chunk[los_column].to_numpy(dtype=float)
+        if not np.isfinite(los).all() or (los < 0).any():
+            raise ValueError(f"the {los_column} column of the extract has missing, infinite or negative lengths of "
+                             f"stay")
+
+        # Whole hours, as the lengths of stay drawn from the lognormal distributions are. Stays under an hour are
+        # counted as an hour, as a patient with a length of stay of 0 is never discharged
+        codes = pd.DataFrame({'source': chunk[source_column].map(SOURCE_CODES),
+                              'category': chunk[category_column].map(CATEGORY_CODES),
+                              'los': np.maximum(np.floor(los * scale), 1).astype(np.int64)})
+        chunk_counts = codes.groupby(['source', 'category', 'los']).size()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+
+    if counts is None:
+        raise ValueError(f"the extract {path} has no episodes")
+
+    table = EmpiricalLOS.from_counts(counts)
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a hidden file first so that a partly written cache is never loaded
+        temporary_path = os.path.join(cache_dir, f'.los-{digest}.tmp.npz')
+        table.save(temporary_path)
+        os.replace(temporary_path, cache_path)
+
+    return table
+
+
+def _read_chunks(path, columns, chunksize):
+    if str(path).endswith('.parquet'):
+        if pq is None:
+            raise ImportError('pyarrow is required to read Parquet extracts, install it with "pip install pyarrow"')
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+def _digest(path, settings):
+    digest = hashlib.sha256(repr(settings).encode())
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()[:16]
@@ -1,136 +1,144 @@
+import numpy as np
 import pandas as pd
 
+from .patient import CATEGORIES
+from .placement import POOLS
 
-def record_occupied_beds(record_n_occupied_beds, occupied_elective_beds, occupied_surgical_emergency_beds,
-                         occupied_medical_emergency_beds, occupied_escalation_beds):
-    """
-
-    :param record_n_occupied_beds:
-    :param occupied_elective_beds:
-    :param occupied_surgical_emergency_beds:
-    :param occupied_medical_emergency_beds:
-    :param occupied_escalation_beds:
-    :return:
-    """
+# The metrics recorded for the hospital as a whole, after those of its wards
+HOSPITAL_METRICS = ('Patients Admitted per Hour', 'Patients Discharged per Hour',
+                    'Number of Trolley Waits (ED & Non ED)', 'Number of Elective Cancellations')
 
-    record_n_occupied_beds['Elective'].append(len(occupied_elective_beds))
-    record_n_occupied_beds['surgical emergency'].append(len(occupied_surgical_emergency_beds))
-    record_n_occupied_beds['medical emergency'].append(len(occupied_medical_emergency_beds))
-    record_n_occupied_beds['escalation'].append(len(occupied_escalation_beds))
 
-
-def calculate_outliers(occupied_medical_emergency_beds, occupied_surgical_emergency_beds, occupied_elective_beds,
-                       record_n_outliers):
+def ward_metrics(names, categories):
     """
-
-    :param occupied_medical_emergency_beds:
-    :param occupied_surgical_emergency_beds:
-    :param occupied_elective_beds:
-    :param record_n_outliers:
-    :return:
+    The metrics recorded each hour for a hospital made of wards, in the column order of the results: the available
+    then occupied beds of each ward, the outliers of each category that has a home ward, the beds used in wards
+    without a home category and then HOSPITAL_METRICS
+    :param names: the name of each ward
+    :param categories: the category each ward is for, None for wards such as escalation that take any patient
+    :return: tuple of metric names
     """
+    outlier_categories = list(dict.fromkeys(category for category in categories if category is not None))
 
-    elective_outliers = 0
-    medical_outliers = 0
-    surgical_outliers = 0
-
-    for outlier in occupied_medical_emergency_beds:
-        if outlier[2] == 'Elective':
-            elective_outliers += 1
-        elif outlier[2] == 'Surgical Emergency':
-            surgical_outliers += 1
+    return tuple(['Available ' + name for name in names]
+                 + ['Occupied ' + name for name in names]
+                 + [category.split()[0] + ' Outliers' for category in outlier_categories]
+                 + ['Escalation Beds Used']
+                 + list(HOSPITAL_METRICS))
 
-    for outlier in occupied_surgical_emergency_beds:
-        if outlier[2] == 'Elective':
-            elective_outliers += 1
-        elif outlier[2] == 'Medical Emergency':
-            medical_outliers += 1
 
-    for outlier in occupied_elective_beds:
-        if outlier[2] == 'Medical Emergency':
-            medical_outliers += 1
-        elif outlier[2] == 'Surgical Emergency':
-            surgical_outliers += 1
+# The metrics BedModel records each hour for its standard wards
+METRICS = ward_metrics(POOLS, ('Medical Emergency', 'Surgical Emergency', 'Elective', None))
 
-    record_n_outliers['Elective'].append(elective_outliers)
-    record_n_outliers['surgical emergency'].append(surgical_outliers)
-    record_n_outliers['medical emergency'].append(medical_outliers)
 
+class MetricRecorder:
+    """
+    Preallocated (runs x hours x metrics) array of the hourly metrics of a simulation
 
-def calculate_escalation(occupied_escalation_beds, record_n_escalation):
+    Each hour of a run is written into its place by index rather than appended to lists, and the results
+    are turned into a DataFrame at the end without copying. The run and hour of each row follow from its
+    position, so their labels and datetimes are only built when they are asked for.
     """
 
-    :param occupied_escalation_beds:
-    :param record_n_escalation:
-    :return:
+    def __init__(self, runs, hours, metrics=METRICS, dtype=np.int32, start_time=None):
+        """
+
+        :param runs: the number of runs being recorded
+        :param hours: the number of hours in each run
+        :param metrics: the names of the metrics recorded each hour
+        :param dtype: the numpy dtype the metrics are held as
+        :param start_time: datetime for when the runs start, needed for datetimes()
+        """
+        self.metrics = tuple(metrics)
+        self.data = np.zeros((runs, hours, len(self.metrics)), dtype=dtype)
+        self.start_time = start_time
+
+    @property
+    def runs(self):
+        return self.data.shape[0]
+
+    @property
+    def hours(self):
+        return self.data.shape[1]
+
+    def run(self, run):
+        """
+        The (hours x metrics) block of a single run, a view that the run can be written into directly
+        :param run: the index of the run
+        :return: numpy array
+        """
+        return self.data[run]
+
+    def record(self, run, hour, values):
+        """
+        Write the metrics of an hour
+        :param run: the index of the run
+        :param hour: the number of hours since the start of the run
+        :param values: the value of each metric, in the order of metrics
+        """
+        self.data[run, hour] = values
+
+    def to_frame(self):
+        """
+        The recorded metrics as a DataFrame with a row per run and hour, sharing memory with the recorder
+        :return: DataFrame with a column per metric
+        """
+        return pd.DataFrame(self.data.reshape(-1, len(self.metrics)), columns=list(self.metrics), copy=False)
+
+    def run_ids(self):
+        """
+        The run of each row of to_frame()
+        :return: integer numpy array
+        """
+        return np.repeat(np.arange(self.runs), self.hours)
+
+    def hour_offsets(self):
+        """
+        The number of hours since the start of the run of each row of to_frame()
+        :return: integer numpy array
+        """
+        return np.tile(np.arange(self.hours), self.runs)
+
+    def datetimes(self):
+        """
+        The datetime of each row of to_frame(), worked out from the start time and in its timezone if it has one
+        :return: pandas DatetimeIndex
+        """
+        if not self.hours:
+            return pd.DatetimeIndex([])
+
+        return pd.date_range(self.start_time, periods=self.hours, freq='h')[self.hour_offsets()]
+
+
+def count_categories(occupied_beds):
+    """
+    Count the patients in a ward by category
+    :param occupied_beds: a list of patient lists, or a ward that can count its own categories such as a BedStore
+    :return: dictionary of category: number of patients
     """
-    if occupied_escalation_beds:
-        record_n_escalation.append(len(occupied_escalation_beds))
-    else:
-        occupied_escalation_beds = []
+    return dict(zip(CATEGORIES, [int(count) for count in category_counts(occupied_beds)]))
 
 
-def calculate_available_beds(record_available_beds, n_elective_beds, n_surgical_emergency_beds,
-                             n_medical_emergency_beds, n_escalation_beds, occupied_elective_beds,
-                             occupied_surgical_emergency_beds, occupied_medical_emergency_beds,
-                             occupied_escalation_beds):
+def category_counts(occupied_beds):
     """
-
-    :param record_available_beds:
-    :param n_elective_beds:
-    :param n_surgical_emergency_beds:
-    :param n_medical_emergency_beds:
-    :param n_escalation_beds:
-    :param occupied_elective_beds:
-    :param occupied_surgical_emergency_beds:
-    :param occupied_medical_emergency_beds:
-    :param occupied_escalation_beds:
-    :return:
+    Count the patients in a ward by category
+    :param occupied_beds: a list of patient lists, or a ward that can count its own categories such as a BedStore
+    :return: list of counts indexed by the CATEGORIES codes
     """
-    record_available_beds['Elective'].append(n_elective_beds-len(occupied_elective_beds))
-    record_available_beds['surgical emergency'].append(n_surgical_emergency_beds-len(occupied_surgical_emergency_beds))
-    record_available_beds['medical emergency'].append(n_medical_emergency_beds-len(occupied_medical_emergency_beds))
-    record_available_beds['escalation'].append(n_escalation_beds-len(occupied_escalation_beds)
-                                               if n_escalation_beds-len(occupied_escalation_beds)
-                                               else n_escalation_beds)
+    if hasattr(occupied_beds, 'category_counts'):
+        return occupied_beds.category_counts()
+
+    counts = dict.fromkeys(CATEGORIES, 0)
+    for patient in occupied_beds:
+        counts[patient[2]] += 1
+
+    return list(counts.values())
 
 
-def collect_results(self):
+def occupancy(wards):
     """
-    This function should collect the results into a tabular format
-    # TODO this function needs converting to a func within this .py file
-    :return: a dataframe of results from the simulation
+    The patients in each ward by category
+    :param wards: the occupied beds of each ward, as taken by category_counts
+    :return: (wards x categories) numpy array of counts
     """
-    df = pd.DataFrame({
-        'DateTime': self.time if self.time else None,
-        'Run Name': self.run_name if self.run_name else None,
-
-        'Available medical emergency': self.record_available_beds['medical emergency'],
-        'Available surgical emergency': self.record_available_beds['surgical emergency'],
-        'Available Elective': self.record_available_beds['Elective'],
-        'Available escalation': self.record_available_beds['escalation'],
-
-        'Occupied medical emergency': self.record_n_occupied_beds['medical emergency'],
-        'Occupied surgical emergency': self.record_n_occupied_beds['surgical emergency'],
-        'Occupied Elective': self.record_n_occupied_beds['Elective'],
-        'Occupied escalation': self.record_n_occupied_beds['escalation'],
-
-        'Medical Outliers': self.record_n_outliers['medical emergency'],
-        'Surgical Outliers': self.record_n_outliers['surgical emergency'],
-        'Elective Outliers': self.record_n_outliers['Elective'],
-
-        'Escalation Beds Used': self.record_n_escalation,
-        'Patients Admitted per Hour': self.record_n_admissions_by_hour,
-        'Patients Discharged per Hour': self.record_n_discharges_by_hour,
-        'Mean time waiting in ED': self.record_mean_ed_queue,
-        'Mean time waiting in Non ED': self.record_mean_non_ed_queue,
-        'Number of Trolley Waits (ED & Non ED)': self.record_n_trolley_waits,
-        'Number of Elective Cancellations': self.record_n_cancellations
-    })
-
-    df['Medical Bed % Occ'] = df['Occupied medical emergency'] / df['Available medical emergency']
-    df['Surgical Bed % Occ'] = df['Occupied surgical emergency'] / df['Available surgical emergency']
-    df['Elective Bed % Occ'] = df['Occupied Elective'] / df['Available Elective']
-    df['Escalation Bed % Occ'] = df['Occupied escalation'] / df['Available escalation']
-
-    return df
+    return np.array([category_counts(ward) for ward in wards], dtype=np.int64).reshape(len(wards), len(CATEGORIES))
@@ -3,21 +3,87 @@ from typing import Protocol
 
 from .tools import Unique
 
+# Fixed vocabularies used to hold the source and category of a patient as small integer codes
+SOURCES = ('Emergency Department', 'Non-ED Admission', 'Elective', 'Waiting List')
+CATEGORIES = ('Elective', 'Surgical Emergency', 'Medical Emergency')
+
+SOURCE_CODES = {source: code for code, source in enumerate(SOURCES)}
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+
+# A batch of patients as a structured array, one field per entry of the [id, source, category, los, time] list
+PATIENT_DTYPE = np.dtype([('id', np.int64), ('source', np.int8), ('category', np.int8), ('los', np.int32),
+                          ('time', np.int32)])
+
+
+def to_patient_lists(patients):
+    """
+    Convert a structured array of patients to the [id, source, category, los, time] lists used by BedModel
+    :param patients: structured array with PATIENT_DTYPE
+    :return: list of patient lists
+    """
+    return [[patient_id, SOURCES[source], CATEGORIES[category], los, time]
+            for patient_id, source, category, los, time in zip(patients['id'].tolist(),
+                                                                patients['source'].tolist(),
+                                                                patients['category'].tolist(),
+                                                                patients['los'].tolist(),
+                                                                patients['time'].tolist())]
+
+
+def from_patient_lists(patients):
+    """
+    Convert the [id, source, category, los, time] lists used by BedModel to a structured array of patients
+    :param patients: list of patient lists
+    :return: structured array with PATIENT_DTYPE
+    """
+    array = np.zeros(len(patients), dtype=PATIENT_DTYPE)
+    if patients:
+        ids, sources, categories, los, time = zip(*patients)
+        array['id'] = ids
+        array['source'] = [SOURCE_CODES[source] for source in sources]
+        array['category'] = [CATEGORY_CODES[category] for category in categories]
+        array['los'] = los
+        array['time'] = time
+
+    return array
+
 
 class PatientGenerator(Protocol):
     def patient_generator(self) -> None:
         pass
 
+    def reseed(self, rng) -> None:
+        pass
+
 
 class BasicPatientGenerator:
-    def __init__(self, source_probability, category_probability, los_distributions):
+    def __init__(self, source_probability, category_probability, los_distributions, rng=None, los_sampler=None):
+        """
+
+        :param source_probability:
+        :param category_probability:
+        :param los_distributions:
+        :param rng: a numpy Generator, SeedSequence or int seed for the random stream the patients are drawn
+            from. If None the global numpy random state is used
+        :param los_sampler: a sampler of empirical lengths of stay such as modules.los.EmpiricalLOS to draw the LOS
+            from instead of the lognormal los_distributions, which can then be None
+        """
 
         self.source_probability = source_probability
         self.category_probability = category_probability
         self.los_distributions = los_distributions
+        self.los_sampler = los_sampler
 
         self.unique = Unique()
         self.probabilities = self.__calculate_probabilities()
+        self.__lookup_tables = {}
+        self.reseed(rng)
+
+    def reseed(self, rng):
+        """
+        Set the random stream the patients are drawn from
+        :param rng: a numpy Generator, SeedSequence or int seed. If None the global numpy random state is used
+        """
+        self.rng = None if rng is None else np.random.default_rng(rng)
 
     def __calculate_probabilities(self):
 
@@ -38,28 +104,76 @@ class BasicPatientGenerator:
         :param n: Number of patients to generate
         :return: patients to patient_master
         """
-        keys = list(self.probabilities.keys())
-        probs = list(self.probabilities.values())
+        return to_patient_lists(self.batch_generator(n=n, warm=warm, source_=source_))
 
-        if not warm:
-            if not source_:
-                raise Exception('A source has not been specified for the patient to be generated')
-            keys, probs = zip(*self.category_probability[source_].items())
-            keys = [(source_, category) for category in keys]
+    def batch_generator(self, n, warm=False, source_=None):
+        """
+        Create stochastic patients as a single structured array, drawing the LOS of every patient with one call
+        :param source_: the type of patient to generate
+        :param warm: whether to generate from warmup
+        :param n: Number of patients to generate
+        :return: structured array of patients with PATIENT_DTYPE
+        """
+        rng = np.random if self.rng is None else self.rng
+
+        if not warm and not source_:
+            raise Exception('A source has not been specified for the patient to be generated')
+
+        table = self.__lookup_table(None if warm else source_)
+        choices = rng.choice(len(table['probability']), p=table['probability'], size=n)
 
-        choices = np.random.choice([*range(len(keys))], p=probs, size=n)
+        patients = np.zeros(n, dtype=PATIENT_DTYPE)
+        patients['id'] = self.unique.next_block(n)
+        patients['source'] = table['source'][choices]
+        patients['category'] = table['category'][choices]
+        if self.los_sampler is None:
+            patients['los'] = rng.lognormal(table['mu'][choices], table['sigma'][choices])
+        else:
+            patients['los'] = self.los_sampler.sample(patients['source'], patients['category'], rng)
 
-        patients_info = []
-        for choice in choices:
-            source, category = keys[choice]
+        return patients
 
+    def __lookup_table(self, source_):
+        """
+        Arrays of the (source, category) groups a patient can be drawn from, their probability and LOS
+        distribution, built once per source
+        :param source_: the source being generated, None for the warm-up
+        :return: dictionary of field: numpy array indexed by group
+        """
+        if source_ in self.__lookup_tables:
+            return self.__lookup_tables[source_]
+
+        if source_ is None:
+            keys = list(self.probabilities.keys())
+            probs = list(self.probabilities.values())
+        else:
+            categories, probs = zip(*self.category_probability[source_].items())
+            keys = [(source_, category) for category in categories]
+
+        groups = []
+        for source, category in keys:
             # TODO: this is a bit of a hack that we should have a think about...
             if source == "Waiting List":
                 source = "Elective"
                 category = "Elective"
-
-            los = int(np.random.lognormal(*self.los_distributions[source][category]))
-
-            patients_info.append([self.unique.next_counter(), source, category, los, 0])
-
-        return patients_info
+            groups.append((source, category))
+
+        # Groups that can never be drawn do not need a LOS distribution
+        if self.los_sampler is None:
+            mu, sigma = zip(*[self.los_distributions[source][category] if probability else (0, 0)
+                              for (source, category), probability in zip(groups, probs)])
+        else:
+            missing = [group for group, probability in zip(groups, probs)
+                       if probability and not self.los_sampler.has(SOURCE_CODES[group[0]], CATEGORY_CODES[group[1]])]
+            if missing:
+                raise ValueError(f"the LOS sampler has no lengths of stay for {missing}")
+            mu = sigma = (0,) * len(groups)
+
+        table = {'probability': np.array(probs, dtype=float),
+                 'source': np.array([SOURCE_CODES[source] for source, _ in groups], dtype=np.int8),
+                 'category': np.array([CATEGORY_CODES[category] for _, category in groups], dtype=np.int8),
+                 'mu': np.array(mu, dtype=float),
+                 'sigma': np.array(sigma, dtype=float)}
+        self.__lookup_tables[source_] = table
+
+        return table
@@ -0,0 +1,115 @@
+import numpy as np
+
+from .patient import CATEGORIES, CATEGORY_CODES
+
+# The ward pools of BedModel, in the order of its wards
+POOLS = ('medical emergency', 'surgical emergency', 'Elective', 'escalation')
+
+# The pools each category of patient is placed in, in order of preference
+PLACEMENT_RULES = {
+    'Medical Emergency': ('medical emergency', 'surgical emergency', 'escalation'),
+    'Surgical Emergency': ('surgical emergency', 'medical emergency', 'escalation'),
+    'Elective': ('Elective', 'surgical emergency', 'medical emergency', 'escalation'),
+}
+
+# Standing in for a pool without a limit on its beds
+UNLIMITED = int(np.iinfo(np.int64).max // 2)
+
+
+class PlacementTable:
+    """
+    Declarative bed placement, each category of patient takes a bed in the first pool on its rule with one free
+
+    As pools only fill up while patients are being placed, how many patients of a category go to each pool is
+    worked out from the free beds alone, so placing a batch costs O(pools) rather than O(patients).
+    """
+
+    def __init__(self, pools=POOLS, rules=None, overflow='escalation'):
+        """
+
+        :param pools: the names of the ward pools, in the order their free beds are given
+        :param rules: dictionary of category: ordered pool names, the categories are admitted in this order.
+            Defaults to PLACEMENT_RULES
+        :param overflow: the pool patients are placed in without a limit during the warm-up, None to respect the
+            number of beds of every pool
+        """
+        rules = PLACEMENT_RULES if rules is None else rules
+
+        unknown = {pool for rule in rules.values() for pool in rule} - set(pools)
+        if unknown:
+            raise ValueError(f"placement rules refer to unknown ward pools {sorted(unknown)}")
+
+        self.pools = tuple(pools)
+        self.categories = [CATEGORY_CODES[category] for category in rules]
+        self.overflow = None if overflow is None else self.pools.index(overflow)
+
+        # Rule of each category code as pool indices, a category without a rule is never placed
+        self.rules = [tuple(self.pools.index(pool) for pool in rules.get(category, ())) for category in CATEGORIES]
+
+    def free_beds(self, beds, occupied, warm=False):
+        """
+        The number of free beds in each pool
+        :param beds: the number of beds in each pool
+        :param occupied: the number of occupied beds in each pool
+        :param warm: whether placing the warm-up, when the overflow pool has no limit
+        :return: list of free beds per pool
+        """
+        # Plain ints as this is worked out every hour for only a handful of pools
+        free = [max(n - m, 0) for n, m in zip(beds, occupied)]
+        if warm and self.overflow is not None:
+            free[self.overflow] = UNLIMITED
+
+        return free
+
+    def allocate(self, category, n, free):
+        """
+        How many of n patients of a category each pool takes, filling the pools in rule order
+        :param category: the category code
+        :param n: the number of patients waiting
+        :param free: list of free beds per pool, reduced by the beds taken
+        :return: list of (pool, number of patients) in rule order, the patients beyond their total stay waiting
+        """
+        allocation = []
+        for pool in self.rules[category]:
+            if not n:
+                break
+
+            taken = min(n, free[pool])
+            if taken:
+                allocation.append((pool, taken))
+                free[pool] -= taken
+                n -= taken
+
+        return allocation
+
+    def place(self, categories, free):
+        """
+        The pool of each patient in a sequence when they are placed one at a time in order, e.g. at warm-up
+
+        Until a pool fills every patient of a category goes to the same pool, so the sequence is placed in
+        segments ending where a pool runs out of beds, at most one segment per pool.
+
+        :param categories: numpy array of the category code of each patient, in the order they are placed
+        :param free: list of free beds per pool
+        :return: numpy array of the pool index of each patient, -1 for those who do not get a bed
+        """
+        categories = np.asarray(categories)
+        free = np.array(free, dtype=np.int64)
+        pools = np.full(len(categories), -1, dtype=np.int64)
+        start = 0
+        while start < len(categories):
+            current = np.array([next((pool for pool in rule if free[pool] > 0), -1) for rule in self.rules])
+            target = current[categories[start:]]
+
+            stop = len(target)
+            for pool in np.unique(target[target >= 0]).tolist():
+                arrivals = np.flatnonzero(target == pool)
+                if len(arrivals) > free[pool]:
+                    stop = min(stop, int(arrivals[free[pool]]))
+
+            segment = target[:stop]
+            pools[start:start + stop] = segment
+            free -= np.bincount(segment[segment >= 0], minlength=len(free))
+            start += stop
+
+        return pools
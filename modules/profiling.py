@@ -0,0 +1,107 @@
+from time import perf_counter
+
+import pandas as pd
+
+# The phases of each hour of the simulation loop, in the order they run
+PHASES = ('update_los', 'discharge', 'arrivals', 'admit', 'cancel', 'metrics')
+
+
+class Profiler:
+    """
+    Opt-in per-phase timing of the simulation loop, passed to BedModel.simulate_inpatient_system
+
+    Each phase is wrapped in a timer only when a profiler is given, so the loop runs the plain methods and pays
+    nothing when profiling is off. The wall-clock time, calls and patients of each phase are totalled per run.
+    """
+
+    def __init__(self, hooks=(), keep_hours=False):
+        """
+
+        :param hooks: callables called at the end of every hour with (run, step, seconds, patients), where seconds
+            and patients are dictionaries of phase: value for that hour
+        :param keep_hours: whether to keep the timings of every hour, so that a worker process can send them back
+            for the hooks of the profiler it is merged into
+        """
+        self.hooks = list(hooks)
+        self.totals = {}
+        self.hour = dict.fromkeys(PHASES, 0.0)
+        self.hours = [] if keep_hours else None
+
+    def timed(self, run, phase, function):
+        """
+        Wrap a phase of the loop so that every call is timed
+        :param run: the number of the run
+        :param phase: one of PHASES
+        :param function: the method the phase calls
+        :return: the wrapped function
+        """
+        totals = self.__totals(run, phase)
+        hour = self.hour
+
+        def call(*args, **kwargs):
+            start = perf_counter()
+            result = function(*args, **kwargs)
+            seconds = perf_counter() - start
+            totals[0] += 1
+            totals[1] += seconds
+            hour[phase] = seconds
+            return result
+
+        return call
+
+    def end_hour(self, run, step, patients):
+        """
+        Record the patients handled by each phase in an hour and call the hooks
+        :param run: the number of the run
+        :param step: the number of hours since the start of the run
+        :param patients: dictionary of phase: number of patients
+        """
+        for phase, n in patients.items():
+            self.__totals(run, phase)[2] += n
+
+        if self.hours is not None:
+            self.hours.append((run, step, dict(self.hour), patients))
+
+        for hook in self.hooks:
+            hook(run, step, dict(self.hour), patients)
+
+    def merge(self, other):
+        """
+        Add the totals of another profiler, e.g. one used by a worker process, and call the hooks with the hours it
+        kept
+        :param other: Profiler
+        """
+        for key, (calls, seconds, patients) in other.totals.items():
+            totals = self.totals.setdefault(key, [0, 0.0, 0])
+            totals[0] += calls
+            totals[1] += seconds
+            totals[2] += patients
+
+        for hour in other.hours or ():
+            for hook in self.hooks:
+                hook(*hour)
+
+    def report(self, by_run=False):
+        """
+        The time spent in each phase
+        :param by_run: whether to give a row per run and phase rather than per phase
+        :return: DataFrame of the calls, patients, seconds and mean milliseconds per call of each phase, and its
+            share of the total time
+        """
+        df = pd.DataFrame([(run, phase, calls, patients, seconds)
+                           for (run, phase), (calls, seconds, patients) in self.totals.items()],
+                          columns=['Run', 'Phase', 'Calls', 'Patients', 'Seconds'])
+        df['Phase'] = pd.Categorical(df['Phase'], categories=PHASES, ordered=True)
+
+        keys = ['Run', 'Phase'] if by_run else ['Phase']
+        df = (df.groupby(keys, observed=True)[['Calls', 'Patients', 'Seconds']].sum()
+              .reset_index().sort_values(keys, ignore_index=True))
+
+        df['Mean ms'] = 1000 * df['Seconds'] / df['Calls']
+        total = df.groupby('Run')['Seconds'].transform('sum') if by_run else df['Seconds'].sum()
+        df['Share'] = df['Seconds'] / total
+
+        return df
+
+    def __totals(self, run, phase):
+        return self.totals.setdefault((run, phase), [0, 0.0, 0])
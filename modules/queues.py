@@ -0,0 +1,106 @@
+from collections import deque
+
+import numpy as np
+
+from .patient import CATEGORIES, PATIENT_DTYPE
+
+
+class CategoryQueue:
+    """
+    A holding area split into a FIFO queue per category, so admission only looks at the patients of the
+    category being admitted and takes them off the front in one go
+
+    Patients are held as the structured arrays they arrive in. Their time is only brought up to date when they
+    leave the queue, from the number of hours the queue has moved on since they joined it.
+    """
+
+    def __init__(self, ages=True):
+        """
+
+        :param ages: whether the time of the waiting patients counts up each hour
+        """
+        self.ages = ages
+        self.clock = 0
+        self.chunks = [deque() for _ in CATEGORIES]
+        self.counts = [0] * len(CATEGORIES)
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def count(self, category):
+        """
+        The number of patients of a category waiting
+        :param category: the category code
+        :return: int
+        """
+        return self.counts[category]
+
+    def extend(self, patients):
+        """
+        Add a batch of patients to the back of the queue
+        :param patients: structured array with PATIENT_DTYPE
+        """
+        if not len(patients):
+            return
+
+        categories = patients['category']
+        present = set(categories.tolist())
+        for category in present:
+            chunk = patients if len(present) == 1 else patients[categories == category]
+            self.chunks[category].append((chunk, self.clock))
+            self.counts[category] += len(chunk)
+
+    def take(self, category, n):
+        """
+        Remove the first n patients of a category from the queue
+        :param category: the category code
+        :param n: the number of patients to take, at most count(category)
+        :return: structured array with PATIENT_DTYPE
+        """
+        taken = []
+        needed = n
+        chunks = self.chunks[category]
+        while needed:
+            chunk, joined = chunks.popleft()
+            if len(chunk) > needed:
+                chunks.appendleft((chunk[needed:], joined))
+                chunk = chunk[:needed]
+
+            taken.append(self.__aged(chunk, joined))
+            needed -= len(chunk)
+
+        self.counts[category] -= n
+
+        if len(taken) == 1:
+            return taken[0]
+        return np.concatenate(taken) if taken else np.empty(0, dtype=PATIENT_DTYPE)
+
+    def tick(self):
+        """
+        Move the queue on by an hour
+        """
+        if self.ages:
+            self.clock += 1
+
+    def clear(self):
+        """
+        Remove every patient from the queue
+        """
+        self.chunks = [deque() for _ in CATEGORIES]
+        self.counts = [0] * len(CATEGORIES)
+
+    def to_array(self):
+        """
+        Copy the waiting patients to a structured array, category by category in the order they joined
+        :return: structured array with PATIENT_DTYPE
+        """
+        patients = [self.__aged(chunk, joined) for chunks in self.chunks for chunk, joined in chunks]
+        return np.concatenate(patients) if patients else np.empty(0, dtype=PATIENT_DTYPE)
+
+    def __aged(self, chunk, joined):
+        if joined == self.clock:
+            return chunk
+
+        chunk = chunk.copy()
+        chunk['time'] += self.clock - joined
+        return chunk
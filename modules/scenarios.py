@@ -0,0 +1,47 @@
+from itertools import product
+
+# The BedModel arguments a scenario of the standard wards can vary, other wards are varied by name
+BED_PARAMETERS = ('n_elective_beds', 'n_surgical_emergency_beds', 'n_medical_emergency_beds', 'n_escalation_beds')
+
+
+def bed_grid(**beds):
+    """
+    Every combination of the given bed numbers, e.g. bed_grid(n_medical_emergency_beds=[400, 450], n_escalation_beds=[10, 20])
+    :param beds: bed parameter: a number of beds or a list of the numbers of beds to try
+    :return: list of dictionaries of bed parameter: number of beds
+    """
+    check_bed_parameters(beds)
+    return _grid(beds)
+
+
+def expand_configurations(configurations, defaults):
+    """
+    The complete bed numbers of each configuration to simulate
+    :param configurations: a list of dictionaries of bed parameter: number of beds, or a single dictionary of bed
+        parameter: list of numbers of beds to be expanded as bed_grid does
+    :param defaults: dictionary of bed parameter: number of beds for any parameter a configuration does not give,
+        the parameters being BED_PARAMETERS for the standard wards or the ward names for other wards
+    :return: list of dictionaries giving every bed parameter
+    """
+    if isinstance(configurations, dict):
+        check_bed_parameters(configurations, defaults)
+        configurations = _grid(configurations)
+
+    expanded = []
+    for configuration in configurations:
+        check_bed_parameters(configuration, defaults)
+        expanded.append({parameter: configuration.get(parameter, beds) for parameter, beds in defaults.items()})
+
+    return expanded
+
+
+def check_bed_parameters(beds, parameters=BED_PARAMETERS):
+    unknown = set(beds) - set(parameters)
+    if unknown:
+        raise ValueError(f"configurations can only set {tuple(parameters)}, not {sorted(unknown)}")
+
+
+def _grid(beds):
+    values = [value if isinstance(value, (list, tuple, range)) else [value] for value in beds.values()]
+
+    return [dict(zip(beds, combination)) for combination in product(*values)]
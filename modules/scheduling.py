@@ -0,0 +1,120 @@
+import numpy as np
+
+from .patient import CATEGORIES, CATEGORY_CODES, PATIENT_DTYPE
+
+
+class DischargeCalendar:
+    """
+    Bucketed calendar of discharges keyed by the absolute hour they are due
+
+    Patients are filed under their discharge hour when they are admitted, so each hour only the patients
+    due that hour are touched rather than counting down the LOS of every occupied bed.
+    """
+
+    def __init__(self):
+        self.clock = 0
+        self.buckets = {}
+
+    def schedule(self, ward, category, los):
+        """
+        File a patient under the hour they are due to be discharged
+        :param ward: the ScheduledWard the patient has been admitted to
+        :param category: the category code of the patient
+        :param los: the patients remaining LOS in hours
+        """
+        # A patient with no LOS left has already passed their discharge hour and stays in the bed, as with
+        # the countdown used by the list engine
+        if los > 0:
+            self.buckets.setdefault(self.clock + los, []).append((ward, category))
+
+    def advance(self):
+        """
+        Move the calendar on by an hour
+        """
+        self.clock += 1
+
+    def discharge(self):
+        """
+        Release every patient due to be discharged this hour
+        :return: the number of patients discharged
+        """
+        due = self.buckets.pop(self.clock, ())
+        for ward, category in due:
+            ward.release(category)
+
+        return len(due)
+
+
+class ScheduledWard:
+    """
+    A ward that only holds counts of the patients in it by category, with their discharges held on a
+    shared DischargeCalendar
+    """
+
+    def __init__(self, calendar):
+        """
+
+        :param calendar: the DischargeCalendar shared by every ward in the hospital
+        """
+        self.calendar = calendar
+        self.counts = [0] * len(CATEGORIES)
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def append(self, patient):
+        """
+        Admit a single patient to the ward and schedule their discharge
+        :param patient: a list of [id, source, category, los, time] as made by the patient generator
+        """
+        category = CATEGORY_CODES[patient[2]]
+        self.counts[category] += 1
+        self.n += 1
+        self.calendar.schedule(self, category, patient[3])
+
+    def extend(self, patients):
+        """
+        Admit a batch of patients to the ward and schedule their discharges
+        :param patients: structured array with PATIENT_DTYPE
+        """
+        for category, los in zip(patients['category'].tolist(), patients['los'].tolist()):
+            self.counts[category] += 1
+            self.calendar.schedule(self, category, los)
+
+        self.n += len(patients)
+
+    def release(self, category):
+        """
+        Discharge a single patient from the ward
+        :param category: the category code of the patient
+        """
+        self.counts[category] -= 1
+        self.n -= 1
+
+    def category_counts(self):
+        """
+        Count the patients in the ward by category
+        :return: a list of counts indexed by the CATEGORIES codes
+        """
+        return list(self.counts)
+
+    def to_array(self):
+        """
+        The patients in the ward as a structured array. Only the category and remaining LOS of each patient are
+        held, so the id, source and time are left as 0, and patients that will never be discharged have a LOS of 0
+        :return: structured array with PATIENT_DTYPE
+        """
+        scheduled = [(category, hour - self.calendar.clock)
+                     for hour, due in self.calendar.buckets.items()
+                     for ward, category in due if ward is self]
+
+        patients = np.zeros(self.n, dtype=PATIENT_DTYPE)
+        if scheduled:
+            patients['category'][:len(scheduled)], patients['los'][:len(scheduled)] = zip(*scheduled)
+
+        unscheduled = np.array(self.counts) - np.bincount(patients['category'][:len(scheduled)],
+                                                          minlength=len(CATEGORIES))
+        patients['category'][len(scheduled):] = np.repeat(np.arange(len(CATEGORIES)), unscheduled)
+
+        return patients
@@ -0,0 +1,133 @@
+import os
+import shutil
+from typing import Protocol
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed to stream results to disk
+    pa = None
+
+FORMATS = {'parquet': 'parquet', 'ipc': 'arrow'}
+
+
+class ResultsSink(Protocol):
+    def write_run(self, run, metrics, columns, start_time) -> None:
+        pass
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError('pyarrow is required to stream results to Parquet or Arrow IPC files, '
+                          'install it with "pip install pyarrow"')
+
+
+class ArrowSink:
+    """
+    Results sink writing the metrics of each run to its own file as soon as the run finishes
+
+    The files are laid out as a hive partitioned dataset, <path>/run=<run>/part-0.parquet (or .arrow), so they
+    can be read while a simulation is still running and each run is only read when it is needed.
+    """
+
+    def __init__(self, path, format='parquet', overwrite=False):
+        """
+
+        :param path: the directory to write the dataset to
+        :param format: 'parquet' or 'ipc' (Arrow IPC / Feather v2)
+        :param overwrite: whether to clear out the directory if it already has files in it. Otherwise such a
+            directory is refused, as the runs written would be read back mixed with those already there
+        """
+        _require_pyarrow()
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {tuple(FORMATS)}, not '{format}'")
+
+        if os.path.isdir(path) and os.listdir(path):
+            if not overwrite:
+                raise FileExistsError(f"the results directory {path} is not empty, pass overwrite=True to clear it")
+            shutil.rmtree(path)
+
+        self.path = path
+        self.format = format
+
+    def write_run(self, run, metrics, columns, start_time):
+        """
+        Write the metrics of a single run
+        :param run: the number of the run
+        :param metrics: (hours x metrics) array of the hourly metrics of the run
+        :param columns: the name of each metric
+        :param start_time: datetime for when the run started
+        """
+        hours = np.arange(len(metrics), dtype=np.int32)
+        arrays = {'Hour': hours,
+                  'DateTime': pd.date_range(start_time, periods=len(metrics), freq='h')}
+        arrays.update({column: metrics[:, i] for i, column in enumerate(columns)})
+        table = pa.table(arrays)
+
+        directory = os.path.join(self.path, f'run={run}')
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, f'part-0.{FORMATS[self.format]}')
+
+        # Write to a hidden file first so that readers never see a partly written run
+        temporary_path = os.path.join(directory, '.part-0.tmp')
+        if self.format == 'parquet':
+            pq.write_table(table, temporary_path)
+        else:
+            feather.write_feather(table, temporary_path, compression='uncompressed')
+        os.replace(temporary_path, file_path)
+
+
+class ParquetSink(ArrowSink):
+    """
+    Results sink writing each run to a partitioned Parquet dataset, see ArrowSink
+    """
+
+    def __init__(self, path, overwrite=False):
+        super().__init__(path, format='parquet', overwrite=overwrite)
+
+
+class IPCSink(ArrowSink):
+    """
+    Results sink writing each run to a partitioned Arrow IPC dataset, see ArrowSink
+    """
+
+    def __init__(self, path, overwrite=False):
+        super().__init__(path, format='ipc', overwrite=overwrite)
+
+
+def open_results(path, format='parquet'):
+    """
+    Open results written by an ArrowSink lazily, nothing is read until the dataset is scanned
+    :param path: the directory the results were written to
+    :param format: 'parquet' or 'ipc'
+    :return: pyarrow Dataset with a 'run' column from the partitioning
+    """
+    _require_pyarrow()
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of {tuple(FORMATS)}, not '{format}'")
+
+    return ds.dataset(path, format=format, partitioning='hive')
+
+
+def read_results(path, format='parquet', runs=None, columns=None):
+    """
+    Read results written by an ArrowSink into a DataFrame, only reading the runs and columns asked for
+    :param path: the directory the results were written to
+    :param format: 'parquet' or 'ipc'
+    :param runs: the run numbers to read, if None every run written so far is read
+    :param columns: the columns to read, if None every column is read
+    :return: DataFrame with a row per run and hour
+    """
+    dataset = open_results(path, format=format)
+    run_filter = None if runs is None else ds.field('run').isin(list(runs))
+    df = dataset.to_table(columns=columns, filter=run_filter).to_pandas()
+
+    if 'run' in df.columns:
+        df = df.sort_values(['run', 'Hour'] if 'Hour' in df.columns else ['run'], ignore_index=True)
+
+    return df
@@ -0,0 +1,98 @@
+import numpy as np
+
+from .patient import PATIENT_DTYPE
+
+# The patients of a snapshot with the ward (or queue) they are in
+SNAPSHOT_DTYPE = np.dtype(PATIENT_DTYPE.descr + [('place', np.int8)])
+
+
+class Snapshot:
+    """
+    The state of the wards and holding areas of a BedModel at a point in time, held as compact arrays
+
+    Taken once after the warm-up, a snapshot can be restored into a model before every run so that each run starts
+    from the same initial condition, without replaying the admissions, and saved to disk to reuse across jobs.
+    """
+
+    def __init__(self, wards, queues, n_wards, n_queues, clock=0):
+        """
+
+        :param wards: structured array with SNAPSHOT_DTYPE of the patients in beds, place giving the ward
+        :param queues: structured array with SNAPSHOT_DTYPE of the patients waiting, place giving the queue
+        :param n_wards: the number of wards
+        :param n_queues: the number of queues
+        :param clock: the number of hours the model had been run for when the snapshot was taken
+        """
+        self.wards = wards
+        self.queues = queues
+        self.n_wards = n_wards
+        self.n_queues = n_queues
+        self.clock = clock
+
+    @classmethod
+    def from_places(cls, wards, queues, clock=0):
+        """
+        Take a snapshot of the patients in each ward and queue
+        :param wards: list of structured arrays with PATIENT_DTYPE, one per ward
+        :param queues: list of structured arrays with PATIENT_DTYPE, one per queue
+        :param clock: the number of hours the model had been run for
+        :return: Snapshot
+        """
+        return cls(_stack(wards), _stack(queues), n_wards=len(wards), n_queues=len(queues), clock=clock)
+
+    def ward(self, place):
+        """
+        The patients in a ward
+        :param place: the number of the ward
+        :return: structured array with PATIENT_DTYPE
+        """
+        return _unstack(self.wards, place)
+
+    def queue(self, place):
+        """
+        The patients waiting in a queue
+        :param place: the number of the queue
+        :return: structured array with PATIENT_DTYPE
+        """
+        return _unstack(self.queues, place)
+
+    def save(self, path):
+        """
+        Save the snapshot to a .npz file
+        :param path: the file to write
+        """
+        np.savez(path, wards=self.wards, queues=self.queues,
+                 shape=np.array([self.n_wards, self.n_queues, self.clock], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a snapshot saved with save
+        :param path: the .npz file to read
+        :return: Snapshot
+        """
+        with np.load(path, allow_pickle=False) as data:
+            n_wards, n_queues, clock = data['shape'].tolist()
+            return cls(data['wards'], data['queues'], n_wards=n_wards, n_queues=n_queues, clock=clock)
+
+
+def _stack(places):
+    stacked = np.empty(sum(len(patients) for patients in places), dtype=SNAPSHOT_DTYPE)
+    start = 0
+    for place, patients in enumerate(places):
+        end = start + len(patients)
+        for field in PATIENT_DTYPE.names:
+            stacked[field][start:end] = patients[field]
+        stacked['place'][start:end] = place
+        start = end
+
+    return stacked
+
+
+def _unstack(stacked, place):
+    rows = stacked[stacked['place'] == place]
+    patients = np.empty(len(rows), dtype=PATIENT_DTYPE)
+    for field in PATIENT_DTYPE.names:
+        patients[field] = rows[field]
+
+    return patients
@@ -0,0 +1,205 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import stats
+except ImportError:  # scipy is only needed for the Student's t confidence intervals
+    stats = None
+
+
+def critical_value(confidence, runs=None):
+    """
+    The two sided critical value of the confidence interval of a mean, from Student's t distribution when scipy is
+    installed and the normal distribution otherwise
+    :param confidence: the confidence level, e.g. 0.95
+    :param runs: the number of observations the mean is of, if None (or without scipy) the normal distribution is
+        used, which gives too narrow an interval for a few tens of observations or fewer
+    :return: float
+    """
+    if stats is None or runs is None or runs < 2:
+        return NormalDist().inv_cdf((1 + confidence) / 2)
+
+    return float(stats.t.ppf((1 + confidence) / 2, runs - 1))
+
+
+class RunningStatistics:
+    """
+    Welford running mean and variance of an array of values, updated one observation (run) at a time
+    """
+
+    def __init__(self, shape=()):
+        """
+
+        :param shape: the shape of each observation
+        """
+        self.n = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def add(self, values):
+        """
+        Add an observation
+        :param values: array with the shape of the observations
+        """
+        self.n += 1
+        delta = values - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (values - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else np.full_like(self.mean, np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def half_width(self, confidence=0.95):
+        """
+        Half the width of the confidence interval of the mean, see critical_value
+        :param confidence: the confidence level of the interval
+        :return: array with the shape of the observations
+        """
+        return critical_value(confidence, self.n) * self.std / np.sqrt(max(self.n, 1))
+
+
+class P2Quantile:
+    """
+    Streaming estimate of a quantile of an array of values using the P-squared algorithm (Jain & Chlamtac, 1985)
+
+    Every element of the array keeps five markers, so memory does not grow with the number of observations.
+    """
+
+    def __init__(self, p, shape=()):
+        """
+
+        :param p: the quantile to estimate, between 0 and 1
+        :param shape: the shape of each observation
+        """
+        self.p = p
+        self.n = 0
+        self.heights = np.zeros((5,) + tuple(shape))
+        self.positions = np.tile(np.arange(5.0).reshape((5,) + (1,) * len(shape)), (1,) + tuple(shape))
+        self.desired = np.array([0, 2 * p, 4 * p, 2 + 2 * p, 4]).reshape((5,) + (1,) * len(shape)) * np.ones(shape)
+        self.increments = np.array([0, p / 2, p, (1 + p) / 2, 1]).reshape((5,) + (1,) * len(shape))
+
+    def add(self, values):
+        """
+        Add an observation
+        :param values: array with the shape of the observations
+        """
+        values = np.asarray(values, dtype=float)
+
+        if self.n < 5:
+            self.heights[self.n] = values
+            self.n += 1
+            if self.n == 5:
+                self.heights.sort(axis=0)
+            return
+
+        self.n += 1
+        q, n = self.heights, self.positions
+
+        # Find the cell the observation falls in, stretching the outer markers if it lies outside them
+        np.minimum(q[0], values, out=q[0])
+        np.maximum(q[4], values, out=q[4])
+        cell = (values >= q[1]).astype(int) + (values >= q[2]) + (values >= q[3])
+
+        for i in range(1, 5):
+            n[i] += cell < i
+        self.desired += self.increments
+
+        # Adjust the middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            move = ((d >= 1) & (n[i + 1] - n[i] > 1)) | ((d <= -1) & (n[i - 1] - n[i] < -1))
+            if not move.any():
+                continue
+
+            step = np.sign(d)
+            parabolic = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+            neighbour = np.where(step > 0, q[i + 1], q[i - 1])
+            neighbour_position = np.where(step > 0, n[i + 1], n[i - 1])
+            linear = q[i] + step * (neighbour - q[i]) / (neighbour_position - n[i])
+
+            adjusted = np.where((q[i - 1] < parabolic) & (parabolic < q[i + 1]), parabolic, linear)
+            q[i] = np.where(move, adjusted, q[i])
+            n[i] = np.where(move, n[i] + step, n[i])
+
+    @property
+    def value(self):
+        """
+        The current estimate of the quantile, exact while there are five or fewer observations
+        :return: array with the shape of the observations
+        """
+        if self.n == 0:
+            return np.full(self.heights.shape[1:], np.nan)
+        if self.n <= 5:
+            return np.quantile(self.heights[:self.n], self.p, axis=0)
+        return self.heights[2].copy()
+
+
+class RunningSummary:
+    """
+    Summary statistics of the hourly metrics across runs, kept up to date as each run finishes
+
+    Memory is O(hours x metrics) however many runs are added.
+    """
+
+    def __init__(self, hours, metrics, quantiles=(0.05, 0.5, 0.95), confidence=0.95):
+        """
+
+        :param hours: the number of hours in each run
+        :param metrics: the names of the metrics recorded each hour
+        :param quantiles: the quantiles of each metric to estimate for each hour
+        :param confidence: the confidence level of the confidence interval of the mean
+        """
+        self.metrics = tuple(metrics)
+        self.confidence = confidence
+        shape = (hours, len(self.metrics))
+        self.statistics = RunningStatistics(shape)
+        self.quantiles = [P2Quantile(p, shape) for p in quantiles]
+
+    @property
+    def runs(self):
+        return self.statistics.n
+
+    def add_run(self, metrics):
+        """
+        Add the metrics of a finished run
+        :param metrics: (hours x metrics) array of the hourly metrics of the run
+        """
+        self.statistics.add(metrics)
+        for quantile in self.quantiles:
+            quantile.add(metrics)
+
+    def to_frame(self, start_time=None):
+        """
+        The summary as a tidy DataFrame with a row per hour and metric
+        :param start_time: datetime for when the runs started, if given a DateTime column is added
+        :return: DataFrame
+        """
+        hours, n_metrics = self.statistics.mean.shape
+        mean = self.statistics.mean
+        half_width = self.statistics.half_width(self.confidence)
+
+        columns = {'Hour': np.repeat(np.arange(hours), n_metrics),
+                   'Metric': pd.Categorical(np.tile(self.metrics, hours), categories=self.metrics),
+                   'Runs': self.runs,
+                   'Mean': mean.ravel(),
+                   'Std': self.statistics.std.ravel(),
+                   'CI Lower': (mean - half_width).ravel(),
+                   'CI Upper': (mean + half_width).ravel()}
+        for quantile in self.quantiles:
+            columns[f'P{quantile.p * 100:g}'] = quantile.value.ravel()
+
+        df = pd.DataFrame(columns)
+        if start_time is not None:
+            df.insert(1, 'DateTime', pd.Timestamp(start_time) + pd.to_timedelta(df['Hour'], unit='h'))
+
+        return df
@@ -0,0 +1,71 @@
+"""
+Benchmarks of the model, run with pytest-benchmark and saved as JSON to track performance across changes:
+
+    pytest modules/tests/benchmarks --benchmark-json=benchmarks.json
+
+Each full-run benchmark records the patient-hours it simulated in extra_info, along with the patient-hours per
+second when timings were taken.
+"""
+import pytest
+
+from ..conftest import WEEKDAYS
+
+# The patient_generator fixture of modules/tests/conftest.py is reseeded with this before each benchmark
+SEED = 42
+
+ENGINES = ['list', 'array', 'calendar']
+
+# Hourly arrivals from each source, the trust scale profile being the one in main.py
+HOURLY = {
+    'small': [0, 1, 1, 0, 1, 2, 2, 1, 1, 0, 1, 2, 1, 0, 1, 1, 2, 1, 0, 1, 1, 0, 0, 1],
+    'medium': [0, 1, 2, 2, 1, 2, 4, 2, 3, 2, 4, 2, 2, 2, 1, 0, 2, 2, 3, 4, 4, 3, 0, 0],
+    'trust': [1, 2, 4, 5, 2, 5, 8, 5, 6, 5, 8, 5, 4, 5, 2, 1, 4, 5, 6, 9, 8, 7, 0, 1],
+}
+
+# Beds, warm-up patients, days simulated and runs of each scale
+SCALES = {
+    'small': dict(beds=dict(n_elective_beds=8, n_surgical_emergency_beds=20, n_medical_emergency_beds=40,
+                            n_escalation_beds=5),
+                  warmup_number=50, days=7, runs=5),
+    'medium': dict(beds=dict(n_elective_beds=20, n_surgical_emergency_beds=60, n_medical_emergency_beds=200,
+                             n_escalation_beds=10),
+                   warmup_number=250, days=14, runs=5),
+    'trust': dict(beds=dict(n_elective_beds=40, n_surgical_emergency_beds=120, n_medical_emergency_beds=450,
+                            n_escalation_beds=20),
+                  warmup_number=574, days=30, runs=10),
+}
+
+
+def time_matrix(scale):
+    return {source: {day: HOURLY[scale] for day in WEEKDAYS}
+            for source in ['Emergency Department', 'Non-ED Admission', 'Elective']}
+
+
+@pytest.fixture
+def scale_model(patient_generator, build_model):
+    def build(scale, engine, warm=True):
+        """
+        A model of a scale with the patient generator reseeded, built outside the timed code
+        :param scale: one of SCALES
+        :param engine: one of ENGINES
+        :param warm: whether to warm up the model
+        :return: BedModel
+        """
+        patient_generator.reseed(SEED)
+        model = build_model(engine, time_matrix=time_matrix(scale), **SCALES[scale]['beds'])
+        if warm:
+            model.warm_up_model(warmup_number=SCALES[scale]['warmup_number'])
+        return model
+
+    return build
+
+
+def record_throughput(benchmark, patient_hours):
+    """
+    Add the patient-hours simulated by the benchmarked code, and their rate, to the JSON of a benchmark
+    :param benchmark: the pytest-benchmark fixture, after the benchmark has run
+    :param patient_hours: the occupied bed hours simulated by one call of the benchmarked code
+    """
+    benchmark.extra_info['patient_hours'] = int(patient_hours)
+    if benchmark.stats is not None:
+        benchmark.extra_info['patient_hours_per_second'] = float(patient_hours / benchmark.stats.stats.mean)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from ...kernel import numba
+from .conftest import ENGINES, SCALES, SEED, record_throughput
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.mark.parametrize('n', [1, 10, 100, 1000])
+def test_patient_generator(benchmark, patient_generator, n):
+    benchmark.extra_info['patients'] = n
+    patient_generator.reseed(SEED)
+    patients = benchmark(patient_generator.patient_generator, n, source_='Emergency Department')
+    assert len(patients) == n
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_warm_up_model(benchmark, scale_model, engine):
+    def setup():
+        return (scale_model('trust', engine, warm=False),), {}
+
+    def warm_up(model):
+        model.warm_up_model(warmup_number=SCALES['trust']['warmup_number'])
+        return model
+
+    model = benchmark.pedantic(warm_up, setup=setup, rounds=5)
+    assert sum(len(ward) for ward in model.occupied) > 0
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_admission_hour(benchmark, scale_model, engine):
+    def setup():
+        model = scale_model('trust', engine)
+        for hour in range(6, 12):
+            model.arrivals(hour=hour, weekday='Monday')
+        return (model,), {}
+
+    def hour(model):
+        model.update_los()
+        discharged = model.discharge_patient()
+        model.admit_patient(warm=False)
+        return discharged
+
+    benchmark.pedantic(hour, setup=setup, rounds=20)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_hourly_metrics(benchmark, scale_model, engine):
+    model = scale_model('trust', engine)
+
+    def metrics():
+        return model.hospital.hourly_metrics(model.occupancy(), admitted=0, discharged=0, waiting=0, cancelled=0)
+
+    assert len(benchmark(metrics)) == len(model.metrics)
+
+
+@pytest.mark.parametrize('engine', ENGINES + ['lockstep', 'lockstep-numba'])
+@pytest.mark.parametrize('scale', list(SCALES))
+def test_simulate_inpatient_system(benchmark, scale_model, scale, engine):
+    if engine == 'lockstep-numba' and numba is None:
+        pytest.skip('numba is not installed')
+
+    lockstep = {'lockstep': 'numpy', 'lockstep-numba': 'numba'}.get(engine, False)
+    days, runs = SCALES[scale]['days'], SCALES[scale]['runs']
+    benchmark.extra_info.update(days=days, runs=runs, **SCALES[scale]['beds'])
+
+    def setup():
+        return (scale_model(scale, 'calendar' if lockstep else engine),), {}
+
+    def simulate(model):
+        model.simulate_inpatient_system(start_time=START, end_time=START + timedelta(days=days), runs=runs,
+                                        seed=SEED, lockstep=lockstep)
+        return model
+
+    model = benchmark.pedantic(simulate, setup=setup, rounds=3)
+
+    recorder = model.recorders[-1]
+    occupied = [recorder.metrics.index(metric) for metric in recorder.metrics if metric.startswith('Occupied ')]
+    record_throughput(benchmark, recorder.data[:, :, occupied].sum())
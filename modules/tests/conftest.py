@@ -0,0 +1,50 @@
+import pytest
+
+from main import BedModel
+from ..patient import BasicPatientGenerator
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# The beds of the hospital the tests model, unless they give their own
+BEDS = dict(n_elective_beds=8, n_surgical_emergency_beds=20, n_medical_emergency_beds=40, n_escalation_beds=5)
+
+
+@pytest.fixture
+def patient_generator():
+    source_prob = {"Emergency Department": 0.8, "Non-ED Admission": 0.14, "Waiting List": 0.06}
+
+    category_prob = {"Emergency Department": {'Elective': 0, 'Surgical Emergency': 0.2, 'Medical Emergency': 0.8},
+                     "Non-ED Admission": {'Elective': 0, 'Surgical Emergency': 0.4, 'Medical Emergency': 0.6},
+                     "Elective": {"Elective": 1}
+                     }
+
+    los_distributions = {
+        'Emergency Department': {'Elective': (1, 0.5), 'Surgical Emergency': (2, 0.7), 'Medical Emergency': (3, 1)},
+        'Non-ED Admission': {'Elective': (1.5, 0.6), 'Surgical Emergency': (2.5, 0.8), 'Medical Emergency': (3.5, 1.2)},
+        'Elective': {'Elective': (2, 0.7)}
+    }
+    return BasicPatientGenerator(source_prob, category_prob, los_distributions)
+
+
+@pytest.fixture
+def time_matrix():
+    hourly = [0, 1, 1, 0, 1, 2, 2, 1, 1, 0, 1, 2, 1, 0, 1, 1, 2, 1, 0, 1, 1, 0, 0, 1]
+    return {source: {day: hourly for day in WEEKDAYS}
+            for source in ['Emergency Department', 'Non-ED Admission', 'Elective']}
+
+
+@pytest.fixture
+def build_model(patient_generator, time_matrix):
+    def build(engine='list', **kwargs):
+        """
+        A BedModel of the test hospital, drawing its patients from the patient_generator fixture
+        :param engine: one of BedModel.ENGINES
+        :param kwargs: settings of the model, replacing the BEDS and time_matrix fixture. Giving wards replaces
+            every one of the BEDS
+        :return: BedModel
+        """
+        settings = dict(time_matrix=time_matrix) if 'wards' in kwargs else dict(BEDS, time_matrix=time_matrix)
+        settings.update(kwargs)
+        return BedModel(PG=patient_generator, engine=engine, **settings)
+
+    return build
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from ...arrivals import ArrivalSchedule, expand_time_matrix, sample_arrivals, WEEKDAYS
+from ...patient import BasicPatientGenerator
+
+
+@pytest.fixture
+def time_matrix():
+    return {'Emergency Department': {day: [day_number * 24 + hour for hour in range(24)]
+                                     for day_number, day in enumerate(WEEKDAYS)},
+            'Elective': {day: [1] * 12 + [0] * 12 for day in WEEKDAYS}}
+
+
+def test_expand_time_matrix_matches_hourly_lookup(time_matrix):
+    start_time = datetime(2024, 1, 3, 20)
+    end_time = datetime(2024, 1, 10, 5)
+    counts = expand_time_matrix(time_matrix, ['Emergency Department', 'Elective'], start_time, end_time)
+
+    expected = []
+    current_time = start_time
+    while current_time <= end_time:
+        weekday = current_time.strftime('%A')
+        expected.append([time_matrix['Emergency Department'][weekday][current_time.hour],
+                         time_matrix['Elective'][weekday][current_time.hour]])
+        current_time += timedelta(hours=1)
+
+    assert np.array_equal(counts, expected)
+
+
+def test_arrival_schedule_hands_out_each_hour():
+    PG = BasicPatientGenerator({'Emergency Department': 1},
+                               {'Emergency Department': {'Surgical Emergency': 0.5, 'Medical Emergency': 0.5}},
+                               {'Emergency Department': {'Surgical Emergency': (2, 0.7), 'Medical Emergency': (3, 1)}},
+                               rng=5)
+    counts = np.array([[2], [0], [3]])
+    schedule = ArrivalSchedule(counts, ['Emergency Department'], PG)
+
+    assert len(schedule) == 3
+    assert [len(schedule.hour(step)[0]) for step in range(3)] == [2, 0, 3]
+    ids = np.concatenate([schedule.hour(step)[0]['id'] for step in range(3)])
+    assert len(np.unique(ids)) == 5
+    assert len(schedule.hour_lists(2)[0]) == 3
+
+
+def test_sample_arrivals_modes():
+    rates = np.full((20000, 2), [0.0, 4.0])
+    rng = np.random.default_rng(1)
+
+    assert np.array_equal(sample_arrivals(rates), rates)
+
+    poisson = sample_arrivals(rates, mode='poisson', rng=rng)
+    assert np.all(poisson[:, 0] == 0)
+    assert poisson[:, 1].mean() == pytest.approx(4, rel=0.05)
+    assert poisson[:, 1].var() == pytest.approx(4, rel=0.1)
+
+    # variance of rate + rate ** 2 / dispersion
+    overdispersed = sample_arrivals(rates, mode='negative_binomial', rng=rng, dispersion=2)
+    assert np.all(overdispersed[:, 0] == 0)
+    assert overdispersed[:, 1].mean() == pytest.approx(4, rel=0.05)
+    assert overdispersed[:, 1].var() == pytest.approx(12, rel=0.1)
+
+
+def test_sample_arrivals_checks_mode():
+    with pytest.raises(ValueError):
+        sample_arrivals([1, 2], mode='binomial')
+    with pytest.raises(ValueError):
+        sample_arrivals([1, 2], mode='negative_binomial')
@@ -0,0 +1,76 @@
+import numpy as np
+
+from ...beds import BedStore, StoredWard
+from ...patient import CATEGORY_CODES, PATIENT_DTYPE
+
+
+def test_bed_store_append_and_grow():
+    store = BedStore(capacity=1)
+    store.append([100000, 'Emergency Department', 'Medical Emergency', 3, 0])
+    store.append([100001, 'Elective', 'Elective', 1, 0])
+
+    assert len(store) == 2
+    assert store.to_list() == [[100000, 'Emergency Department', 'Medical Emergency', 3, 0],
+                               [100001, 'Elective', 'Elective', 1, 0]]
+
+
+def test_bed_store_tick_and_discharge():
+    store = BedStore(capacity=3)
+    store.append([100000, 'Emergency Department', 'Medical Emergency', 2, 0])
+    store.append([100001, 'Elective', 'Elective', 1, 0])
+    store.append([100002, 'Non-ED Admission', 'Surgical Emergency', 0, 0])
+
+    store.tick()
+    assert store.discharge() == 1
+    assert [patient[0] for patient in store] == [100000, 100002]
+    assert store.to_list()[0][3:] == [1, 1]
+
+    # a patient who starts with a LOS of 0 has already passed zero and is never discharged
+    store.tick()
+    assert store.discharge() == 1
+    assert store.to_list() == [[100002, 'Non-ED Admission', 'Surgical Emergency', -2, 2]]
+
+
+def test_bed_store_category_counts():
+    store = BedStore()
+    for category in ['Medical Emergency', 'Medical Emergency', 'Elective']:
+        store.append([0, 'Emergency Department', category, 1, 0])
+
+    counts = store.category_counts()
+    assert counts[CATEGORY_CODES['Medical Emergency']] == 2
+    assert counts[CATEGORY_CODES['Elective']] == 1
+    assert np.sum(counts) == 3
+
+
+def test_bed_store_extend_with_batch():
+    patients = np.zeros(3, dtype=PATIENT_DTYPE)
+    patients['id'] = [1, 2, 3]
+    patients['category'] = CATEGORY_CODES['Surgical Emergency']
+    patients['los'] = [1, 2, 3]
+
+    store = BedStore(capacity=2)
+    store.append([0, 'Elective', 'Elective', 5, 0])
+    store.extend(patients)
+
+    assert len(store) == 4
+    assert [patient[0] for patient in store] == [0, 1, 2, 3]
+    assert store.category_counts()[CATEGORY_CODES['Surgical Emergency']] == 3
+
+
+def test_stored_wards_share_a_store():
+    store = BedStore(capacity=1, n_wards=3)
+    wards = [StoredWard(store, place) for place in range(3)]
+    wards[2].append([100000, 'Emergency Department', 'Medical Emergency', 1, 0])
+    wards[0].append([100001, 'Elective', 'Elective', 2, 0])
+    wards[2].append([100002, 'Non-ED Admission', 'Surgical Emergency', 3, 0])
+
+    assert [len(ward) for ward in wards] == [1, 0, 2]
+    assert [patient[0] for patient in wards[2]] == [100000, 100002]
+    assert store.occupancy().tolist() == [[1, 0, 0], [0, 0, 0], [0, 1, 1]]
+    assert len(wards[1].to_array()) == 0
+
+    store.tick()
+    assert store.discharge() == 1
+    assert [len(ward) for ward in wards] == [1, 0, 1]
+    assert wards[2].to_list() == [[100002, 'Non-ED Admission', 'Surgical Emergency', 2, 1]]
+    assert wards[2].category_counts()[CATEGORY_CODES['Surgical Emergency']] == 1
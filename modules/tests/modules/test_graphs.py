@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ...graphs import graph_results, run_arrays
+
+
+def results(runs=3, hours=48):
+    times = pd.date_range('2024-01-01', periods=hours, freq='h')
+    return pd.DataFrame({'DateTime': np.tile(times, runs),
+                         'Run Name': np.repeat([f'Run_{run}' for run in range(runs)], hours),
+                         'Occupied Ward A': np.tile(np.arange(hours), runs) + np.repeat(np.arange(runs), hours),
+                         'Occupied Ward B': 1,
+                         'Patients Admitted per Hour': 2})
+
+
+def test_run_arrays_groups_the_results_once():
+    times, values = run_arrays(results(), ['Occupied Ward A', 'Occupied Ward B'])
+
+    assert values.shape == (3, 48, 2)
+    assert times[0] == np.datetime64('2024-01-01')
+    assert values[2, 5, 0] == 7
+    assert (values[:, :, 1] == 1).all()
+
+
+def test_fan_chart_has_a_median_and_band_per_ward():
+    fig = graph_results(results(runs=20))
+
+    assert len(fig.data) == 2 * 3
+    median = next(trace for trace in fig.data if trace.name == 'Occupied Ward A Beds P50')
+    np.testing.assert_allclose(median.y, np.arange(48) + 9.5)
+
+
+def test_traces_are_one_webgl_trace_per_ward_and_thinned():
+    fig = graph_results(results(runs=5, hours=100), mode='traces', max_points=10)
+
+    assert [trace.name for trace in fig.data] == ['Occupied Ward A Beds', 'Occupied Ward B Beds']
+    assert all(trace.type == 'scattergl' for trace in fig.data)
+    assert len(fig.data[0].y) == 5 * (10 + 1)
+
+    with pytest.raises(ValueError):
+        graph_results(results(), mode='svg')
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from ... import kernel
+from ...arrivals import ArrivalSchedule
+from ...kernel import check_backend, numba, simulate_runs, write_metrics
+from ...lockstep import LockstepRuns
+from ...patient import PATIENT_DTYPE
+from ...snapshot import Snapshot
+from ...ward import Hospital, Ward
+
+SOURCES = ['Emergency Department', 'Non-ED Admission', 'Elective']
+
+
+def patients(rng, n):
+    return np.array([(100000 + i, rng.integers(3), rng.integers(3), rng.integers(0, 12), 0) for i in range(n)],
+                    dtype=PATIENT_DTYPE)
+
+
+def custom_hospital():
+    return Hospital([Ward('Ward A', 4, 'Medical Emergency'), Ward('Ward B', 2, 'Medical Emergency'),
+                     Ward('Theatres', 3, 'Surgical Emergency'), Ward('Virtual', 2), Ward('Discharge lounge', 1)])
+
+
+@pytest.mark.parametrize('hospital', [Hospital.standard(2, 3, 6, 1), Hospital.standard(8, 20, 40, 5),
+                                      custom_hospital()])
+def test_simulate_runs_matches_lockstep_runs(patient_generator, hospital):
+    rng = np.random.default_rng(3)
+    wards = [patients(rng, min(n, 4)) for n in hospital.beds]
+    for place, ward in enumerate(wards):
+        ward['category'] = rng.choice([category for category, rule in enumerate(hospital.placement.rules)
+                                       if place in rule], size=len(ward))
+    initial = Snapshot.from_places(wards, [patients(rng, 3), patients(rng, 2), patients(rng, 2)])
+
+    patient_generator.reseed(11)
+    schedules = [ArrivalSchedule(rng.integers(0, 4, size=(48, 3)), SOURCES, patient_generator) for _ in range(4)]
+
+    expected = LockstepRuns(hospital, hospital.placement, initial, schedules).simulate()
+    assert np.array_equal(simulate_runs(hospital, hospital.placement, initial, schedules), expected)
+
+
+def test_write_metrics_matches_hourly_metrics():
+    rng = np.random.default_rng(5)
+    hospital = custom_hospital()
+    for full in [False, True] * 10:
+        occupancy = rng.integers(0, 2, size=(len(hospital.beds), 3))
+        if full:
+            # Full escalation wards are recorded as having every bed available
+            occupancy[hospital.overflow] = 0
+            occupancy[hospital.overflow, 2] = hospital.beds[hospital.overflow]
+        expected = hospital.hourly_metrics(occupancy, admitted=3, discharged=1, waiting=7, cancelled=2)
+
+        metrics = np.zeros(len(hospital.metrics), dtype=np.int32)
+        write_metrics(metrics, occupancy, hospital.beds, hospital.overflow, hospital.outlier_categories,
+                      hospital.outlier_wards, 3, 1, 7, 2)
+        assert metrics.tolist() == expected.tolist()
+
+
+def test_check_backend(monkeypatch):
+    assert check_backend('numpy') == 'numpy'
+    assert check_backend() == ('numpy' if numba is None else 'numba')
+
+    with pytest.raises(ValueError):
+        check_backend('cuda')
+
+    monkeypatch.setattr(kernel, 'numba', None)
+    assert check_backend() == 'numpy'
+    with pytest.warns(UserWarning):
+        assert check_backend('numba') == 'numpy'
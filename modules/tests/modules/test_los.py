@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ...los import EmpiricalLOS, fit_empirical_los
+from ...patient import BasicPatientGenerator, CATEGORY_CODES, SOURCE_CODES
+
+
+def extract(path, n=3000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'source': rng.choice(['Emergency Department', 'Elective'], n),
+                       'category': 'Medical Emergency',
+                       'los': rng.choice([1.5, 2.2, 10.0], n, p=[0.5, 0.3, 0.2])})
+    df.loc[df['source'] == 'Elective', ['category', 'los']] = ['Elective', 4.0]
+    df.to_csv(path, index=False)
+    return df
+
+
+def test_samples_follow_the_extract(tmp_path):
+    df = extract(tmp_path / 'episodes.csv')
+    expected = df.loc[df['source'] == 'Emergency Department', 'los'].value_counts(normalize=True).sort_index()
+    table = fit_empirical_los(tmp_path / 'episodes.csv', chunksize=500)
+
+    medical = table.sample(np.full(20000, SOURCE_CODES['Emergency Department']),
+                           np.full(20000, CATEGORY_CODES['Medical Emergency']), np.random.default_rng(1))
+    values, counts = np.unique(medical, return_counts=True)
+    assert values.tolist() == [1, 2, 10]
+    np.testing.assert_allclose(counts / counts.sum(), expected, atol=0.01)
+
+    mixed = table.sample(np.array([SOURCE_CODES['Elective'], SOURCE_CODES['Emergency Department']] * 50),
+                         np.array([CATEGORY_CODES['Elective'], CATEGORY_CODES['Medical Emergency']] * 50))
+    assert (mixed[::2] == 4).all() and set(mixed[1::2]) <= {1, 2, 10}
+
+    with pytest.raises(ValueError):
+        table.sample(np.array([SOURCE_CODES['Non-ED Admission']]), np.array([CATEGORY_CODES['Elective']]))
+
+
+@pytest.mark.parametrize('los', [np.nan, -2.0])
+def test_missing_or_negative_los_is_rejected(tmp_path, los):
+    df = extract(tmp_path / 'episodes.csv')
+    df.loc[7, 'los'] = los
+    df.to_csv(tmp_path / 'episodes.csv', index=False)
+
+    with pytest.raises(ValueError):
+        fit_empirical_los(tmp_path / 'episodes.csv')
+
+
+def test_stays_under_an_hour_last_an_hour(tmp_path):
+    df = extract(tmp_path / 'episodes.csv')
+    elective = df['source'] == 'Elective'
+    df.loc[elective, 'los'] = np.resize([0.0, 0.4], elective.sum())
+    df.to_csv(tmp_path / 'episodes.csv', index=False)
+    table = fit_empirical_los(tmp_path / 'episodes.csv')
+
+    elective = table.sample(np.full(100, SOURCE_CODES['Elective']), np.full(100, CATEGORY_CODES['Elective']))
+    assert (elective == 1).all()
+
+
+def test_tables_are_cached_until_the_extract_changes(tmp_path):
+    path = tmp_path / 'episodes.csv'
+    df = extract(path)
+    first = fit_empirical_los(path, cache_dir=tmp_path / 'cache')
+    cached, = os.listdir(tmp_path / 'cache')
+
+    second = fit_empirical_los(path, cache_dir=tmp_path / 'cache')
+    assert np.array_equal(first.keys, second.keys) and np.array_equal(first.values, second.values)
+    assert os.listdir(tmp_path / 'cache') == [cached]
+
+    df.loc[0, 'los'] = 99
+    df.to_csv(path, index=False)
+    fit_empirical_los(path, cache_dir=tmp_path / 'cache')
+    assert len(os.listdir(tmp_path / 'cache')) == 2
+
+
+def test_parquet_extracts_match_csv(tmp_path):
+    pytest.importorskip('pyarrow')
+    extract(tmp_path / 'episodes.csv').to_parquet(tmp_path / 'episodes.parquet')
+
+    from_csv = fit_empirical_los(tmp_path / 'episodes.csv')
+    from_parquet = fit_empirical_los(tmp_path / 'episodes.parquet', chunksize=700)
+    assert np.array_equal(from_csv.keys, from_parquet.keys)
+
+
+def generator(counts):
+    return BasicPatientGenerator({'Emergency Department': 1},
+                                 {'Emergency Department': {'Medical Emergency': 0.5, 'Surgical Emergency': 0.5}},
+                                 None, rng=2, los_sampler=EmpiricalLOS.from_counts(counts))
+
+
+def test_patient_generator_draws_empirical_los():
+    counts = pd.Series([3, 1, 2], index=pd.MultiIndex.from_tuples(
+        [(SOURCE_CODES['Emergency Department'], CATEGORY_CODES['Medical Emergency'], 5),
+         (SOURCE_CODES['Emergency Department'], CATEGORY_CODES['Medical Emergency'], 48),
+         (SOURCE_CODES['Emergency Department'], CATEGORY_CODES['Surgical Emergency'], 7)]))
+    patients = generator(counts).batch_generator(1000, source_='Emergency Department')
+    medical = patients['category'] == CATEGORY_CODES['Medical Emergency']
+    assert set(patients['los'][medical]) == {5, 48}
+    assert set(patients['los'][~medical]) == {7}
+
+    with pytest.raises(ValueError):
+        generator(counts.iloc[:2]).batch_generator(10, source_='Emergency Department')
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from ...beds import BedStore
+from ...metrics import MetricRecorder, METRICS, count_categories
+
+
+def test_metric_recorder_frame_shares_memory():
+    recorder = MetricRecorder(runs=2, hours=3)
+    recorder.record(run=1, hour=2, values=range(len(METRICS)))
+    recorder.run(0)[0] = 7
+
+    df = recorder.to_frame()
+    assert df.shape == (6, len(METRICS))
+    assert list(df.columns) == list(METRICS)
+    assert np.shares_memory(df.to_numpy(), recorder.data)
+    assert df.iloc[5].tolist() == list(range(len(METRICS)))
+    assert df.iloc[0].tolist() == [7] * len(METRICS)
+
+
+def test_metric_recorder_rows_follow_from_their_position():
+    recorder = MetricRecorder(runs=2, hours=3, start_time=datetime(2024, 1, 1, 22))
+
+    assert recorder.run_ids().tolist() == [0, 0, 0, 1, 1, 1]
+    assert recorder.hour_offsets().tolist() == [0, 1, 2, 0, 1, 2]
+    assert recorder.datetimes()[2] == np.datetime64('2024-01-02T00:00')
+
+    aware = MetricRecorder(runs=1, hours=2, start_time=datetime(2024, 1, 1, 22, tzinfo=timezone.utc))
+    assert aware.datetimes()[1] == pd.Timestamp('2024-01-01 23:00', tz='UTC')
+
+
+def test_count_categories_matches_across_wards():
+    patients = [[1, 'Emergency Department', 'Medical Emergency', 3, 0],
+                [2, 'Elective', 'Elective', 3, 0],
+                [3, 'Emergency Department', 'Medical Emergency', 3, 0]]
+    store = BedStore()
+    for patient in patients:
+        store.append(patient)
+
+    expected = {'Elective': 1, 'Surgical Emergency': 0, 'Medical Emergency': 2}
+    assert count_categories(patients) == expected
+    assert count_categories(store) == expected
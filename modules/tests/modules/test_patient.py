@@ -1,5 +1,6 @@
+import numpy as np
 import pytest
-from ...patient import BasicPatientGenerator
+from ...patient import BasicPatientGenerator, PATIENT_DTYPE, SOURCE_CODES, CATEGORY_CODES
 
 
 @pytest.fixture
@@ -48,3 +49,24 @@ def test_patient_generator_output_with_source(sample_patient_generator):
 def test_patient_generator_raises_exception(sample_patient_generator):
     with pytest.raises(Exception):
         sample_patient_generator.patient_generator(5, warm=False)
+
+
+def test_patient_generator_is_reproducible_with_seed(sample_patient_generator):
+    first = sample_patient_generator
+    first.reseed(np.random.SeedSequence(11))
+    second = BasicPatientGenerator(first.source_probability, first.category_probability, first.los_distributions,
+                                   rng=np.random.SeedSequence(11))
+
+    assert ([patient[1:] for patient in first.patient_generator(20, warm=True)]
+            == [patient[1:] for patient in second.patient_generator(20, warm=True)])
+
+
+def test_batch_generator_output(sample_patient_generator):
+    patients = sample_patient_generator.batch_generator(50, warm=False, source_='Emergency Department')
+    assert patients.dtype == PATIENT_DTYPE
+    assert len(patients) == 50
+    assert np.array_equal(np.diff(patients['id']), np.ones(49))
+    assert np.all(patients['source'] == SOURCE_CODES['Emergency Department'])
+    assert np.all(patients['category'] != CATEGORY_CODES['Elective'])
+    assert np.all(patients['los'] >= 0)
+    assert np.all(patients['time'] == 0)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from ...placement import PlacementTable
+
+
+def place_one_at_a_time(table, categories, free):
+    free = list(free)
+    pools = []
+    for category in categories:
+        pool = next((pool for pool in table.rules[category] if free[pool] > 0), -1)
+        if pool >= 0:
+            free[pool] -= 1
+        pools.append(pool)
+    return pools
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_place_matches_one_at_a_time(seed):
+    rng = np.random.default_rng(seed)
+    table = PlacementTable(overflow=None)
+    categories = rng.integers(0, 3, size=200)
+    free = rng.integers(0, 60, size=4).tolist()
+
+    assert table.place(categories, free).tolist() == place_one_at_a_time(table, categories, free)
+
+
+def test_allocate_fills_pools_in_rule_order():
+    table = PlacementTable()
+    free = table.free_beds(beds=[10, 5, 3, 2], occupied=[9, 3, 3, 0])
+
+    # Medical emergency patients take the last medical bed, then surgical and escalation beds
+    assert table.allocate(2, 10, free) == [(0, 1), (1, 2), (3, 2)]
+    assert free == [0, 0, 0, 0]
+    assert table.free_beds(beds=[10, 5, 3, 2], occupied=[9, 3, 3, 0], warm=True)[3] > 10 ** 9
+
+    with pytest.raises(ValueError):
+        PlacementTable(rules={'Elective': ('Elective', 'day case')})
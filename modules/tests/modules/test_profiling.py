@@ -0,0 +1,52 @@
+from ...profiling import PHASES, Profiler
+
+
+def test_timed_phases_are_totalled_per_run():
+    profiler = Profiler()
+    double = profiler.timed(0, 'admit', lambda x: 2 * x)
+
+    assert double(3) == 6
+    assert double(4) == 8
+    profiler.end_hour(0, 0, {'admit': 5})
+
+    calls, seconds, patients = profiler.totals[(0, 'admit')]
+    assert (calls, patients) == (2, 5)
+    assert seconds >= 0
+
+
+def test_hooks_are_called_every_hour():
+    calls = []
+    profiler = Profiler(hooks=[lambda *args: calls.append(args)])
+    profiler.timed(1, 'discharge', lambda: None)()
+    profiler.end_hour(1, 7, {'discharge': 2})
+
+    (run, step, seconds, patients), = calls
+    assert (run, step, patients) == (1, 7, {'discharge': 2})
+    assert set(seconds) == set(PHASES)
+
+
+def test_merge_and_report():
+    profiler, other = Profiler(), Profiler()
+    profiler.timed(0, 'cancel', lambda: None)()
+    other.timed(1, 'cancel', lambda: None)()
+    other.timed(1, 'update_los', lambda: None)()
+    profiler.merge(other)
+
+    report = profiler.report()
+    assert report['Phase'].tolist() == ['update_los', 'cancel']
+    assert report['Calls'].tolist() == [1, 2]
+    assert report['Share'].sum() == 1
+
+    assert len(profiler.report(by_run=True)) == 3
+
+
+def test_merge_calls_the_hooks_with_the_hours_kept():
+    calls = []
+    profiler, worker = Profiler(hooks=[lambda *args: calls.append(args)]), Profiler(keep_hours=True)
+    worker.timed(3, 'admit', lambda: None)()
+    worker.end_hour(3, 0, {'admit': 1})
+    worker.end_hour(3, 1, {'admit': 0})
+    profiler.merge(worker)
+
+    assert [(run, step, patients) for run, step, _, patients in calls] == [(3, 0, {'admit': 1}), (3, 1, {'admit': 0})]
+    assert Profiler().hours is None
@@ -0,0 +1,33 @@
+import numpy as np
+
+from ...patient import PATIENT_DTYPE
+from ...queues import CategoryQueue
+
+
+def patients(*rows):
+    return np.array(list(rows), dtype=PATIENT_DTYPE)
+
+
+def test_queue_is_fifo_per_category():
+    queue = CategoryQueue()
+    queue.extend(patients((1, 0, 2, 5, 0), (2, 0, 1, 5, 0), (3, 0, 2, 5, 0)))
+    queue.tick()
+    queue.extend(patients((4, 0, 2, 5, 0)))
+
+    assert len(queue) == 4 and queue.count(2) == 3
+    taken = queue.take(2, 3)
+    assert taken['id'].tolist() == [1, 3, 4]
+    assert taken['time'].tolist() == [1, 1, 0]
+    assert queue.to_array()['id'].tolist() == [2]
+
+
+def test_queue_splits_chunks_and_clears():
+    queue = CategoryQueue(ages=False)
+    queue.extend(patients((1, 0, 0, 5, 0), (2, 0, 0, 5, 0), (3, 0, 0, 5, 0)))
+    queue.tick()
+
+    assert queue.take(0, 2)['id'].tolist() == [1, 2]
+    assert queue.take(0, 1)['time'].tolist() == [0]
+    queue.extend(patients((4, 0, 1, 5, 0)))
+    queue.clear()
+    assert len(queue) == 0
@@ -0,0 +1,27 @@
+import pytest
+
+from ...scenarios import bed_grid, expand_configurations
+
+DEFAULTS = {'n_elective_beds': 8, 'n_surgical_emergency_beds': 20, 'n_medical_emergency_beds': 40,
+            'n_escalation_beds': 5}
+
+
+def test_bed_grid_and_defaults():
+    grid = bed_grid(n_medical_emergency_beds=[35, 40], n_escalation_beds=range(3), n_elective_beds=10)
+
+    assert len(grid) == 6
+    assert grid[1] == {'n_medical_emergency_beds': 35, 'n_escalation_beds': 1, 'n_elective_beds': 10}
+    assert expand_configurations(grid, DEFAULTS)[1] == {**DEFAULTS, **grid[1]}
+    assert expand_configurations({'n_escalation_beds': [1, 2]}, DEFAULTS)[1]['n_escalation_beds'] == 2
+
+    with pytest.raises(ValueError):
+        expand_configurations([{'n_beds': 3}], DEFAULTS)
+
+
+def test_configurations_of_wards_by_name():
+    defaults = {'Ward A': 20, 'Virtual ward': 5}
+
+    assert expand_configurations({'Ward A': [10, 30]}, defaults) == [{'Ward A': 10, 'Virtual ward': 5},
+                                                                      {'Ward A': 30, 'Virtual ward': 5}]
+    with pytest.raises(ValueError):
+        expand_configurations({'n_escalation_beds': [1, 2]}, defaults)
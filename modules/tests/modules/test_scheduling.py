@@ -0,0 +1,30 @@
+from ...scheduling import DischargeCalendar, ScheduledWard
+
+
+def test_calendar_discharges_on_the_due_hour():
+    calendar = DischargeCalendar()
+    ward = ScheduledWard(calendar)
+    ward.append([100000, 'Emergency Department', 'Medical Emergency', 2, 0])
+    ward.append([100001, 'Elective', 'Elective', 1, 0])
+    ward.append([100002, 'Elective', 'Elective', 2, 0])
+
+    calendar.advance()
+    assert calendar.discharge() == 1
+    assert len(ward) == 2
+
+    calendar.advance()
+    assert calendar.discharge() == 2
+    assert len(ward) == 0
+    assert calendar.buckets == {}
+
+
+def test_calendar_keeps_patients_without_los():
+    calendar = DischargeCalendar()
+    ward = ScheduledWard(calendar)
+    ward.append([100000, 'Non-ED Admission', 'Surgical Emergency', 0, 0])
+
+    for _ in range(3):
+        calendar.advance()
+        assert calendar.discharge() == 0
+
+    assert ward.category_counts() == [0, 1, 0]
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from ...sinks import ArrowSink, ParquetSink, IPCSink, open_results, read_results
+
+
+@pytest.mark.parametrize('sink_class, format', [(ParquetSink, 'parquet'), (IPCSink, 'ipc')])
+def test_sink_round_trip(tmp_path, sink_class, format):
+    sink = sink_class(tmp_path)
+    for run in range(3):
+        sink.write_run(run, np.full((4, 2), run, dtype=np.int32), ['A', 'B'], datetime(2024, 1, 1))
+
+    df = read_results(tmp_path, format=format)
+    assert len(df) == 12
+    assert df['run'].tolist() == [0] * 4 + [1] * 4 + [2] * 4
+    assert df['Hour'].tolist() == [0, 1, 2, 3] * 3
+    assert df['DateTime'].iloc[5] == datetime(2024, 1, 1, 1)
+    assert (df['A'] == df['run']).all()
+
+    # only the runs asked for are read
+    assert read_results(tmp_path, format=format, runs=[1], columns=['B'])['B'].tolist() == [1] * 4
+    assert open_results(tmp_path, format=format).count_rows() == 12
+
+
+def test_sink_checks_format(tmp_path):
+    with pytest.raises(ValueError):
+        ArrowSink(tmp_path, format='csv')
+
+
+def test_sink_refuses_earlier_results(tmp_path):
+    ParquetSink(tmp_path).write_run(5, np.zeros((4, 2), dtype=np.int32), ['A', 'B'], datetime(2024, 1, 1))
+
+    with pytest.raises(FileExistsError):
+        ParquetSink(tmp_path)
+
+    sink = ParquetSink(tmp_path, overwrite=True)
+    sink.write_run(0, np.ones((4, 2), dtype=np.int32), ['A', 'B'], datetime(2024, 1, 1))
+    assert read_results(tmp_path)['run'].unique().tolist() == [0]
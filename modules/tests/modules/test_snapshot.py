@@ -0,0 +1,33 @@
+import numpy as np
+
+from ...patient import PATIENT_DTYPE
+from ...scheduling import DischargeCalendar, ScheduledWard
+from ...snapshot import Snapshot
+
+
+def patients(*rows):
+    return np.array(list(rows), dtype=PATIENT_DTYPE)
+
+
+def test_snapshot_round_trips_through_disk(tmp_path):
+    wards = [patients((100000, 0, 2, 5, 1), (100001, 1, 1, 0, 3)), patients(), patients((100002, 2, 0, 7, 0))]
+    queues = [patients((100003, 0, 2, 4, 2))]
+    snapshot = Snapshot.from_places(wards, queues, clock=12)
+    snapshot.save(tmp_path / 'warm.npz')
+    loaded = Snapshot.load(tmp_path / 'warm.npz')
+
+    assert (loaded.n_wards, loaded.n_queues, loaded.clock) == (3, 1, 12)
+    for place, ward in enumerate(wards):
+        assert np.array_equal(loaded.ward(place), ward)
+    assert np.array_equal(loaded.queue(0), queues[0])
+
+
+def test_scheduled_ward_keeps_category_and_los():
+    calendar = DischargeCalendar()
+    ward = ScheduledWard(calendar)
+    ward.extend(patients((100000, 0, 2, 3, 0), (100001, 0, 1, 0, 0), (100002, 2, 0, 1, 0)))
+    calendar.advance()
+    assert calendar.discharge() == 1
+
+    state = ward.to_array()
+    assert sorted(zip(state['category'].tolist(), state['los'].tolist())) == [(1, 0), (2, 2)]
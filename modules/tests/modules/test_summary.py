@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from ...summary import P2Quantile, RunningStatistics, RunningSummary, critical_value, stats
+
+
+def test_running_statistics_match_numpy():
+    values = np.random.default_rng(0).normal(size=(50, 4, 3))
+    statistics = RunningStatistics((4, 3))
+    for observation in values:
+        statistics.add(observation)
+
+    assert np.allclose(statistics.mean, values.mean(axis=0))
+    assert np.allclose(statistics.variance, values.var(axis=0, ddof=1))
+    assert np.allclose(statistics.half_width(0.95), critical_value(0.95, 50) * values.std(axis=0, ddof=1) / np.sqrt(50))
+
+
+def test_critical_value():
+    assert critical_value(0.95) == pytest.approx(1.959964)
+    if stats is None:
+        assert critical_value(0.95, 10) == pytest.approx(1.959964)
+    else:
+        # Student's t with 9 degrees of freedom
+        assert critical_value(0.95, 10) == pytest.approx(2.262157)
+        assert critical_value(0.95, 50) == pytest.approx(2.009575)
+
+
+@pytest.mark.parametrize('p', [0.05, 0.5, 0.95])
+def test_p2_quantile_tracks_the_sample_quantile(p):
+    values = np.random.default_rng(1).lognormal(3, 0.5, size=(4000, 2))
+    quantile = P2Quantile(p, shape=(2,))
+    for observation in values:
+        quantile.add(observation)
+
+    assert np.allclose(quantile.value, np.quantile(values, p, axis=0), rtol=0.05)
+
+
+def test_running_summary_frame():
+    summary = RunningSummary(hours=3, metrics=['A', 'B'])
+    for run in range(4):
+        summary.add_run(np.full((3, 2), run))
+
+    df = summary.to_frame()
+    assert len(df) == 6
+    assert df['Metric'].tolist() == ['A', 'B'] * 3
+    assert np.allclose(df['Mean'], 1.5)
+    assert np.allclose(df['P50'], 1.5)
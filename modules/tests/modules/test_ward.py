@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from ...metrics import METRICS
+from ...ward import Hospital, Ward
+
+
+def test_standard_hospital_metrics():
+    hospital = Hospital.standard(n_elective_beds=4, n_surgical_emergency_beds=5, n_medical_emergency_beds=6,
+                                 n_escalation_beds=2)
+    # Rows are medical, surgical, Elective and escalation wards, columns the CATEGORIES codes
+    occupancy = np.array([[1, 1, 4], [0, 3, 2], [2, 0, 0], [0, 0, 2]])
+
+    values = hospital.hourly_metrics(occupancy, admitted=3, discharged=1, waiting=7, cancelled=0)
+
+    assert hospital.metrics == METRICS
+    assert values.tolist() == [0, 0, 2, 2,  6, 5, 2, 2,  2, 1, 1,  2, 3, 1, 7, 0]
+
+
+def test_hospital_of_any_wards():
+    hospital = Hospital([Ward('Ward A', 10, 'Medical Emergency'), Ward('Ward B', 8, 'Medical Emergency'),
+                         Ward('Theatres', 6, 'Surgical Emergency'), Ward('Virtual ward', 20)])
+
+    assert hospital.metrics[:8] == ('Available Ward A', 'Available Ward B', 'Available Theatres',
+                                    'Available Virtual ward', 'Occupied Ward A', 'Occupied Ward B',
+                                    'Occupied Theatres', 'Occupied Virtual ward')
+    assert hospital.metrics[8:10] == ('Medical Outliers', 'Surgical Outliers')
+    assert hospital.placement.rules[2] == (0, 1, 3)
+
+    with pytest.raises(ValueError):
+        Hospital([Ward('Ward A', 10), Ward('Ward A', 5)])
+
+
+def test_categories_without_a_ward_go_to_the_wards_without_a_category():
+    hospital = Hospital([Ward('Ward A', 10, 'Medical Emergency'), Ward('Virtual ward', 20)])
+
+    # Rules are indexed by the CATEGORIES codes, Elective, Surgical Emergency and Medical Emergency
+    assert hospital.placement.rules == [(1,), (1,), (0, 1)]
+    assert hospital.placement.categories == [2, 0, 1]
+
+    with pytest.raises(ValueError):
+        Hospital([Ward('Ward A', 10, 'Medical Emergency'), Ward('Theatres', 6, 'Surgical Emergency')])
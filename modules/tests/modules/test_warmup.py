@@ -0,0 +1,19 @@
+import numpy as np
+
+from ...warmup import mser
+
+
+def test_mser_drops_the_transient():
+    rng = np.random.default_rng(0)
+    series = np.concatenate([np.linspace(0, 100, 60), 100 + rng.normal(0, 2, 440)])
+    transient = mser(series)
+
+    assert transient % 5 == 0
+    assert 40 <= transient <= 80
+
+
+def test_mser_keeps_a_stationary_series_and_short_series():
+    rng = np.random.default_rng(1)
+
+    assert mser(rng.normal(0, 1, 500)) < 100
+    assert mser([1, 2, 3]) == 0
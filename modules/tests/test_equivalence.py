@@ -0,0 +1,74 @@
+from datetime import datetime
+from functools import partial
+
+import pytest
+
+from ..equivalence import compare_engines, distribution_tests, exact_differences, simulate_engine
+from ..kernel import BACKENDS, numba
+from ..ward import Ward
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 5)
+
+# Settings every engine must reproduce the results of the list engine exactly with
+SCENARIOS = {
+    'standard': ({}, {}),
+    'congested': (dict(n_medical_emergency_beds=6, n_surgical_emergency_beds=3, n_escalation_beds=1), {}),
+    'poisson arrivals': (dict(arrival_mode='poisson'), {}),
+    'pregenerated': ({}, dict(pregenerate=True)),
+    'parallel': ({}, dict(n_jobs=2)),
+    'wards': (dict(wards=[Ward('Ward A', 20, 'Medical Emergency'), Ward('Ward B', 12, 'Medical Emergency'),
+                          Ward('Surgical', 10, 'Surgical Emergency'), Ward('Elective', 4, 'Elective'),
+                          Ward('Escalation', 3)]), {}),
+}
+
+
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+def test_engines_reproduce_the_list_engine(build_model, scenario):
+    model_settings, options = SCENARIOS[scenario]
+    expected, compared = compare_engines(partial(build_model, **model_settings), START, END, warmup_number=15, runs=4,
+                                         seed=7, **options)
+
+    assert expected['Patients Admitted per Hour'].sum() > 0
+    for engine, (results, differences) in compared.items():
+        assert differences == [], engine
+
+
+def test_exact_differences_finds_changed_columns(build_model):
+    results = simulate_engine(build_model, 'array', START, END, warmup_number=30, runs=2)
+    changed = results.copy()
+    changed['Escalation Beds Used'] += 1
+
+    assert exact_differences(results, results.copy()) == []
+    assert exact_differences(results, changed) == ['Escalation Beds Used']
+    assert len(exact_differences(results, changed.iloc[1:])) == len(results.columns)
+
+
+def test_pregenerated_arrivals_are_equivalent_in_distribution(build_model):
+    pytest.importorskip('scipy')
+
+    # Both start from the same warmed-up state, only the runs differ
+    hourly = simulate_engine(build_model, 'list', START, END, warmup_number=30, runs=30, seed=1, warmup_seed=0)
+    pregenerated = simulate_engine(build_model, 'calendar', START, END, warmup_number=30, runs=30, seed=2,
+                                   warmup_seed=0, pregenerate=True)
+
+    assert exact_differences(hourly, pregenerated)
+
+    tests = distribution_tests(hourly, pregenerated, alpha=0.001)
+    assert len(tests) == 2 * 5
+    assert tests['Equivalent'].all()
+
+
+@pytest.mark.parametrize('scenario', ['standard', 'congested', 'poisson arrivals', 'wards'])
+@pytest.mark.parametrize('n_jobs', [None, 2])
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_lockstep_runs_reproduce_the_list_engine(build_model, scenario, n_jobs, backend):
+    if backend == 'numba' and numba is None:
+        pytest.skip('numba is not installed')
+
+    model_settings, _ = SCENARIOS[scenario]
+    expected, compared = compare_engines(partial(build_model, **model_settings), START, END,
+                                         warmup_number=15, engines=('calendar',), runs=5, seed=7,
+                                         reference_options=dict(pregenerate=True, n_jobs=n_jobs), n_jobs=n_jobs,
+                                         lockstep=backend)
+
+    assert compared['calendar'][1] == []
@@ -0,0 +1,408 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from main import BedModel
+from ..profiling import PHASES, Profiler
+from ..ward import Ward
+
+
+def run_model(build_model, seed=42, warmup_number=50, runs=2, n_jobs=None, engine='list'):
+    hospital = build_model(engine=engine)
+    hospital.PG.reseed(seed)
+    hospital.warm_up_model(warmup_number=warmup_number)
+    hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1),
+                                       end_time=datetime(2024, 1, 4),
+                                       runs=runs,
+                                       n_jobs=n_jobs,
+                                       seed=seed)
+    return hospital
+
+
+def test_unknown_engine_raises(build_model):
+    with pytest.raises(ValueError):
+        build_model(engine='abacus')
+
+
+@pytest.mark.parametrize('engine', ['array', 'calendar'])
+def test_engine_results_match_list_engine(build_model, engine):
+    reference = run_model(build_model, engine='list')
+    candidate = run_model(build_model, engine=engine)
+
+    pd.testing.assert_frame_equal(reference.collect_results(), candidate.collect_results())
+
+
+def test_array_engine_beds_match_list_engine(build_model):
+    reference = run_model(build_model, engine='list')
+    candidate = run_model(build_model, engine='array')
+
+    # ids carry on counting in the shared generator, everything else about the beds should match
+    assert ([patient[1:] for patient in candidate.occupied_medical_emergency_beds.to_list()]
+            == [patient[1:] for patient in reference.occupied_medical_emergency_beds])
+
+
+def test_replications_are_reproducible_across_workers(build_model):
+    serial = run_model(build_model, engine='array', runs=3, n_jobs=1, seed=7)
+    parallel = run_model(build_model, engine='array', runs=3, n_jobs=2, seed=7)
+
+    serial_results = serial.collect_results()
+    pd.testing.assert_frame_equal(serial_results, parallel.collect_results())
+    assert list(serial_results['Run Name'].unique()) == ['Run_0', 'Run_1', 'Run_2']
+
+
+def test_seeded_runs_do_not_depend_on_global_random_state(patient_generator, build_model):
+    first = run_model(build_model, runs=2, n_jobs=1, seed=3)
+    patient_generator.reseed(3)
+    second = build_model()
+    second.warm_up_model(warmup_number=50)
+    np.random.seed(99)
+    second.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2,
+                                     n_jobs=1, seed=3)
+
+    pd.testing.assert_frame_equal(first.collect_results(), second.collect_results())
+
+
+def test_arrival_counts_follow_arrivals(patient_generator, build_model):
+    hospital = build_model()
+    counts = hospital.arrival_counts(hospital.arrival_rates(datetime(2024, 1, 1), datetime(2024, 1, 1, 23)))
+
+    generated = []
+    patient_generator.patient_generator = lambda n, source_: generated.append(n) or []
+    for hour in range(24):
+        generated.clear()
+        hospital.arrivals(hour=hour, weekday='Monday')
+        assert sum(generated) == counts[hour].sum()
+
+
+@pytest.mark.parametrize('engine', ['array', 'calendar'])
+def test_pregenerated_arrivals_match_across_engines(patient_generator, build_model, engine):
+    reference = build_model(engine='list')
+    candidate = build_model(engine=engine)
+    for hospital in [reference, candidate]:
+        patient_generator.reseed(8)
+        hospital.warm_up_model(warmup_number=50)
+        hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2,
+                                           seed=8, pregenerate=True)
+
+    pd.testing.assert_frame_equal(reference.collect_results(), candidate.collect_results())
+
+
+def test_stochastic_arrivals_vary_between_runs(patient_generator, build_model):
+    with pytest.raises(ValueError):
+        build_model(arrival_mode='negative_binomial')
+
+    hospital = build_model(arrival_mode='negative_binomial', arrival_dispersion=2)
+    rates = hospital.arrival_rates(datetime(2024, 1, 1), datetime(2024, 1, 7, 23))
+    patient_generator.reseed(4)
+    first, second = hospital.arrival_counts(rates), hospital.arrival_counts(rates)
+
+    assert first.shape == rates.shape
+    assert not np.array_equal(first, second)
+
+
+@pytest.mark.parametrize('n_jobs', [None, 1])
+def test_sink_receives_the_same_results(tmp_path, patient_generator, build_model, n_jobs):
+    pytest.importorskip('pyarrow')
+    from ..sinks import ParquetSink, read_results
+
+    in_memory = run_model(build_model, runs=2, n_jobs=n_jobs, seed=5).collect_results()
+
+    hospital = build_model()
+    patient_generator.reseed(5)
+    hospital.warm_up_model(warmup_number=50)
+    hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2,
+                                       n_jobs=n_jobs, seed=5, sink=ParquetSink(tmp_path))
+    streamed = read_results(tmp_path)
+
+    assert hospital.collect_results().empty
+    assert np.array_equal(streamed['DateTime'].to_numpy(), in_memory['DateTime'].to_numpy())
+    for column in ['Occupied medical emergency', 'Escalation Beds Used', 'Patients Discharged per Hour']:
+        assert streamed[column].tolist() == in_memory[column].tolist()
+
+
+def test_aggregate_matches_full_results(patient_generator, build_model):
+    full = run_model(build_model, runs=6, n_jobs=1, seed=2).collect_results()
+
+    hospital = build_model()
+    patient_generator.reseed(2)
+    hospital.warm_up_model(warmup_number=50)
+    summary = hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4),
+                                                 runs=6, n_jobs=1, seed=2, aggregate=True)
+
+    assert hospital.collect_results().empty
+    occupied = summary[summary['Metric'] == 'Occupied medical emergency'].reset_index(drop=True)
+    hourly = full.groupby(full.groupby('Run Name').cumcount())['Occupied medical emergency']
+    assert (occupied['Runs'] == 6).all()
+    assert np.allclose(occupied['Mean'], hourly.mean())
+    assert np.allclose(occupied['Std'], hourly.std())
+    assert (occupied['CI Lower'] <= occupied['Mean']).all()
+    assert (occupied['P5'] <= occupied['P95']).all()
+
+
+@pytest.mark.parametrize('n_jobs', [None, 2])
+def test_simulate_to_precision_uses_the_first_replications(patient_generator, build_model, n_jobs):
+    full = run_model(build_model, runs=8, n_jobs=1, seed=3).collect_results()
+
+    hospital = build_model()
+    with pytest.raises(ValueError):
+        hospital.simulate_to_precision(datetime(2024, 1, 1), datetime(2024, 1, 4), target='Beds')
+
+    patient_generator.reseed(3)
+    hospital.warm_up_model(warmup_number=50)
+    precision = hospital.simulate_to_precision(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4),
+                                               target='Occupied medical emergency', statistic='mean',
+                                               relative_half_width=0.5, min_runs=3, max_runs=8, n_jobs=n_jobs,
+                                               seed=3)
+    results = hospital.collect_results()
+
+    assert 3 <= precision['runs'] <= 8
+    assert precision['converged'] == (precision['half_width'] <= 0.5 * precision['mean'])
+    assert results['Run Name'].nunique() == precision['runs']
+    expected = full[full['Run Name'].isin(results['Run Name'].unique())].reset_index(drop=True)
+    expected['Run Name'] = expected['Run Name'].cat.remove_unused_categories()
+    pd.testing.assert_frame_equal(results, expected)
+
+
+@pytest.mark.parametrize('n_jobs', [None, 2])
+def test_scenarios_match_separate_models(patient_generator, build_model, n_jobs):
+    hospital = build_model()
+    patient_generator.reseed(6)
+    results = hospital.simulate_scenarios({'n_medical_emergency_beds': [35, 40], 'n_escalation_beds': [2, 5]},
+                                          start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4),
+                                          warmup_number=50, runs=2, n_jobs=n_jobs, seed=6)
+
+    assert results['Scenario'].nunique() == 4
+    assert hospital.collect_results().empty
+    scenario = results[results['Scenario'] == 1].reset_index(drop=True)
+    assert (scenario['n_medical_emergency_beds'] == 35).all() and (scenario['n_escalation_beds'] == 5).all()
+
+    separate = build_model(n_medical_emergency_beds=35)
+    patient_generator.reseed(6)
+    separate.warm_up_model(warmup_number=50)
+    separate.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2,
+                                       n_jobs=1, seed=6, pregenerate=True)
+    expected = separate.collect_results()
+
+    assert scenario['Run Name'].tolist() == expected['Run Name'].tolist()
+    assert np.array_equal(scenario['DateTime'].to_numpy(), expected['DateTime'].to_numpy())
+    pd.testing.assert_frame_equal(scenario[expected.columns[2:]], expected[expected.columns[2:]])
+
+
+def test_scenarios_of_a_model_built_from_wards(patient_generator, build_model):
+    wards = [Ward('Ward A', 20, 'Medical Emergency'), Ward('Surgical', 10, 'Surgical Emergency'), Ward('Virtual', 5)]
+    rules = {'Medical Emergency': ('Ward A', 'Virtual'), 'Surgical Emergency': ('Surgical', 'Ward A', 'Virtual'),
+             'Elective': ('Surgical', 'Virtual')}
+    hospital = build_model(wards=wards, placement_rules=rules)
+    patient_generator.reseed(6)
+    results = hospital.simulate_scenarios({'Ward A': [12, 30]}, start_time=datetime(2024, 1, 1),
+                                          end_time=datetime(2024, 1, 3), warmup_number=20, runs=2, seed=6)
+
+    scenario = results[results['Scenario'] == 0].reset_index(drop=True)
+    assert (scenario['Ward A'] == 12).all() and (scenario['Virtual'] == 5).all()
+
+    wards[0] = Ward('Ward A', 12, 'Medical Emergency')
+    separate = build_model(wards=wards, placement_rules=rules)
+    patient_generator.reseed(6)
+    separate.warm_up_model(warmup_number=20)
+    separate.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 3), runs=2,
+                                       n_jobs=1, seed=6, pregenerate=True)
+    expected = separate.collect_results()
+
+    pd.testing.assert_frame_equal(scenario[expected.columns[2:]], expected[expected.columns[2:]])
+
+    with pytest.raises(ValueError):
+        hospital.simulate_scenarios({'n_medical_emergency_beds': [30]}, start_time=datetime(2024, 1, 1),
+                                    end_time=datetime(2024, 1, 3), warmup_number=20, runs=1)
+
+
+@pytest.mark.parametrize('engine', ['list', 'array', 'calendar'])
+def test_snapshot_restores_the_warm_state(tmp_path, patient_generator, build_model, engine):
+    from ..snapshot import Snapshot
+
+    warm = build_model()
+    patient_generator.reseed(9)
+    warm.warm_up_model(warmup_number=60)
+    warm.snapshot().save(tmp_path / 'warm.npz')
+
+    hospital = build_model(engine=engine)
+    hospital.restore(Snapshot.load(tmp_path / 'warm.npz'))
+    reference = build_model(engine=engine)
+    patient_generator.reseed(9)
+    reference.warm_up_model(warmup_number=60)
+
+    for model in [hospital, reference]:
+        patient_generator.reseed(9)
+        model.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2)
+
+    pd.testing.assert_frame_equal(hospital.collect_results(), reference.collect_results())
+
+
+def test_snapshot_of_another_hospital_is_rejected(build_model):
+    from ..patient import PATIENT_DTYPE
+    from ..snapshot import Snapshot
+
+    warm = build_model(wards=[Ward('Ward A', 20, 'Medical Emergency'), Ward('Virtual', 5)])
+    warm.warm_up_model(warmup_number=10)
+    hospital = build_model()
+
+    with pytest.raises(ValueError):
+        hospital.restore(warm.snapshot())
+    with pytest.raises(ValueError):
+        hospital.restore(Snapshot.from_places([np.zeros(0, dtype=PATIENT_DTYPE)] * 4, []))
+
+
+def test_serial_runs_start_from_the_same_state(build_model):
+    serial = run_model(build_model, runs=3, n_jobs=None, seed=11)
+    replications = run_model(build_model, runs=3, n_jobs=1, seed=11)
+
+    pd.testing.assert_frame_equal(serial.collect_results(), replications.collect_results())
+
+
+def test_warm_up_to_steady_state(build_model):
+    hours = []
+    for _ in range(2):
+        hospital = build_model(engine='calendar')
+        hours.append(hospital.warm_up_to_steady_state(datetime(2024, 1, 1), max_hours=24 * 14, runs=2, seed=12))
+
+    assert hours[0] == hours[1]
+    assert hours[0] % 24 == 0 and hours[0] >= hospital.warm_up['transient']
+    assert len(hospital.occupied_medical_emergency_beds) > 0
+
+
+@pytest.mark.parametrize('engine', ['array', 'calendar'])
+def test_engines_match_with_queues(patient_generator, build_model, engine):
+    results = []
+    for model_engine in ['list', engine]:
+        hospital = build_model(engine=model_engine, n_medical_emergency_beds=6,
+                               n_surgical_emergency_beds=3, n_escalation_beds=1)
+        patient_generator.reseed(13)
+        hospital.warm_up_model(warmup_number=15)
+        hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2,
+                                           seed=13, pregenerate=True)
+        results.append(hospital.collect_results())
+
+    assert results[0]['Number of Trolley Waits (ED & Non ED)'].max() > 20
+    pd.testing.assert_frame_equal(results[0], results[1])
+
+
+def test_placement_rules_can_be_changed(patient_generator, build_model):
+    rules = {'Medical Emergency': ('medical emergency', 'escalation'),
+             'Surgical Emergency': ('surgical emergency', 'escalation'),
+             'Elective': ('Elective',)}
+    hospital = build_model(engine='calendar', placement_rules=rules,
+                           n_elective_beds=2, n_surgical_emergency_beds=3, n_medical_emergency_beds=6)
+    patient_generator.reseed(14)
+    hospital.warm_up_model(warmup_number=10)
+    hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=1)
+    results = hospital.collect_results()
+
+    assert (results[['Medical Outliers', 'Surgical Outliers', 'Elective Outliers']] == 0).all().all()
+    assert results['Number of Trolley Waits (ED & Non ED)'].max() > 0
+
+
+def test_standard_wards_can_be_given_as_wards(patient_generator, time_matrix, build_model):
+    from ..placement import PLACEMENT_RULES
+    from ..ward import Hospital
+
+    reference = run_model(build_model, seed=15)
+
+    wards = Hospital.standard(n_elective_beds=8, n_surgical_emergency_beds=20, n_medical_emergency_beds=40,
+                              n_escalation_beds=5).wards
+    hospital = build_model(wards=wards, placement_rules=PLACEMENT_RULES)
+    patient_generator.reseed(15)
+    hospital.warm_up_model(warmup_number=50)
+    hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2,
+                                       seed=15)
+
+    pd.testing.assert_frame_equal(reference.collect_results(), hospital.collect_results())
+    with pytest.raises(ValueError):
+        BedModel(n_elective_beds=8, time_matrix=time_matrix, PG=patient_generator)
+
+
+@pytest.mark.parametrize('engine', ['array', 'calendar'])
+def test_engines_match_for_any_wards(patient_generator, build_model, engine):
+    from ..ward import Ward
+
+    wards = [Ward('Ward A', 8, 'Medical Emergency'), Ward('Ward B', 6, 'Medical Emergency'),
+             Ward('Ward C', 5, 'Surgical Emergency'), Ward('Day unit', 3, 'Elective'), Ward('Virtual ward', 4)]
+    results = []
+    for model_engine in ['list', engine]:
+        hospital = build_model(wards=wards, engine=model_engine)
+        patient_generator.reseed(16)
+        hospital.warm_up_model(warmup_number=20)
+        hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2,
+                                           seed=16, pregenerate=True)
+        results.append(hospital.collect_results())
+
+    assert 'Occupied Ward B' in results[0] and 'Virtual ward Bed % Occ' in results[0]
+    assert results[0]['Occupied Ward B'].max() > 0
+    pd.testing.assert_frame_equal(results[0], results[1])
+
+
+@pytest.mark.parametrize('n_jobs', [None, 2])
+def test_profiling_does_not_change_results(patient_generator, build_model, n_jobs):
+    plain = run_model(build_model, engine='calendar', n_jobs=n_jobs)
+
+    # Hooks are called in this process, so they can be lambdas and see the caller's state
+    hours = []
+    profiler = Profiler(hooks=[lambda run, step, seconds, patients: hours.append((run, step))])
+    patient_generator.reseed(42)
+    profiled = build_model(engine='calendar')
+    profiled.warm_up_model(warmup_number=50)
+    profiled.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 4), runs=2,
+                                       n_jobs=n_jobs, seed=42, profiler=profiler)
+
+    pd.testing.assert_frame_equal(plain.collect_results(), profiled.collect_results())
+
+    report = profiler.report(by_run=True)
+    assert set(report['Run']) == {0, 1}
+    assert (report['Calls'] == 73).all()
+    assert report['Phase'].nunique() == len(PHASES)
+    assert hours == [(run, step) for run in range(2) for step in range(73)]
+
+
+def test_results_can_be_indexed_by_run_and_hour(build_model):
+    hospital = run_model(build_model, runs=3)
+    labelled = hospital.collect_results()
+    indexed = hospital.collect_results(datetimes=False)
+
+    assert labelled['Run Name'].dtype == 'category'
+    assert labelled['DateTime'].iloc[73] == pd.Timestamp('2024-01-01')
+    assert indexed.index.names == ['Run', 'Hour']
+    assert indexed.loc[(2, 72), 'Occupied medical emergency'] == labelled['Occupied medical emergency'].iloc[-1]
+    pd.testing.assert_frame_equal(indexed.reset_index(drop=True), labelled.drop(columns=['DateTime', 'Run Name']))
+
+    # A second simulation continues the run numbers, keeping the index and the run names unique
+    hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 2), runs=2)
+    labelled = hospital.collect_results()
+    indexed = hospital.collect_results(datetimes=False)
+    assert indexed.index.is_unique
+    assert indexed.index.get_level_values('Run').unique().tolist() == [0, 1, 2, 3, 4]
+    assert (labelled['Run Name'].astype(str) == 'Run_' + indexed.index.get_level_values('Run').astype(str)).all()
+
+
+def test_lockstep_runs_start_from_the_current_state(patient_generator, build_model):
+    results = []
+    for lockstep in [False, True]:
+        hospital = build_model(engine='array', n_medical_emergency_beds=6,
+                               n_surgical_emergency_beds=3, n_escalation_beds=1)
+        patient_generator.reseed(21)
+        hospital.warm_up_model(warmup_number=12)
+        hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 2), runs=1)
+        hospital.reset_results()
+
+        # Without a seed the runs take their patients from the generator's stream one after another
+        hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 2), end_time=datetime(2024, 1, 4), runs=3,
+                                           pregenerate=True, lockstep=lockstep)
+        results.append(hospital.collect_results())
+
+    assert results[0]['Number of Trolley Waits (ED & Non ED)'].iloc[0] > 0
+    pd.testing.assert_frame_equal(results[0], results[1])
+
+    with pytest.raises(ValueError):
+        hospital.simulate_inpatient_system(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 2), runs=1,
+                                           lockstep=True, profiler=Profiler())
+    # The failed call leaves no results behind
+    pd.testing.assert_frame_equal(hospital.collect_results(), results[1])
@@ -1,4 +1,4 @@
-import itertools
+import numpy as np
 
 
 class Unique:
@@ -6,7 +6,20 @@ class Unique:
     create a new id counting from 100,000
     """
     def __init__(self):
-        self.counter = itertools.count(100000)
+        # A plain int rather than itertools.count so that the counter can be pickled to worker processes
+        self.counter = 100000
 
     def next_counter(self):
-        return next(self.counter)
\ No newline at end of file
+        value = self.counter
+        self.counter += 1
+        return value
+
+    def next_block(self, n):
+        """
+        Take the next n ids in one go
+        :param n: the number of ids needed
+        :return: numpy array of ids
+        """
+        block = np.arange(self.counter, self.counter + n, dtype=np.int64)
+        self.counter += n
+        return block
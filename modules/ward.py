@@ -0,0 +1,126 @@
+import numpy as np
+
+from .metrics import ward_metrics
+from .patient import CATEGORIES, CATEGORY_CODES
+from .placement import PLACEMENT_RULES, POOLS, PlacementTable
+
+
+class Ward:
+    """
+    A pool of beds in the hospital, such as a specialty ward, step-down unit, virtual ward or the escalation beds
+    """
+
+    def __init__(self, name, beds, category=None, label=None):
+        """
+
+        :param name: the name of the ward, used in the names of its metrics and in the placement rules
+        :param beds: the number of beds
+        :param category: the category of patient the ward is for, patients of other categories in it are outliers.
+            None for wards such as escalation that take any patient when the others are full
+        :param label: the name used for the occupancy rate column of the ward, defaults to the name
+        """
+        self.name = name
+        self.beds = beds
+        self.category = category
+        self.label = name if label is None else label
+
+    def __repr__(self):
+        return f"Ward({self.name!r}, beds={self.beds}, category={self.category!r})"
+
+
+class Hospital:
+    """
+    A hospital made of any number of wards, with the placement rules and hourly metrics worked out from its wards
+
+    The patients in the wards are counted into a single (wards x categories) occupancy array each hour, so the
+    metrics are a handful of array operations whatever the number of wards.
+    """
+
+    def __init__(self, wards, rules=None):
+        """
+
+        :param wards: list of Wards
+        :param rules: dictionary of category: the names of the wards the category is placed in, in order of
+            preference. Defaults to each category's own wards followed by the wards without a category, for every
+            category
+        """
+        self.wards = tuple(wards)
+        self.names = tuple(ward.name for ward in self.wards)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"ward names must be unique, not {self.names}")
+
+        self.beds = np.array([ward.beds for ward in self.wards], dtype=np.int64)
+        self.metrics = ward_metrics(self.names, [ward.category for ward in self.wards])
+
+        # Wards without a category take any patient when the others are full, as the escalation beds do
+        self.overflow = np.array([ward.category is None for ward in self.wards])
+
+        # The outliers of each category with a home ward are its patients in wards for another category
+        categories = list(dict.fromkeys(ward.category for ward in self.wards if ward.category is not None))
+        self.outlier_categories = np.array([CATEGORY_CODES[category] for category in categories], dtype=np.int64)
+        self.outlier_wards = np.array([[ward.category is not None and ward.category != category
+                                        for category in categories] for ward in self.wards])
+
+        if rules is None:
+            # Categories with their own wards are admitted first, in the order of their wards
+            rules = {category: tuple([ward.name for ward in self.wards if ward.category == category]
+                                     + [ward.name for ward in self.wards if ward.category is None])
+                     for category in categories + [category for category in CATEGORIES if category not in categories]}
+            unplaced = [category for category, rule in rules.items() if not rule]
+            if unplaced:
+                raise ValueError(f"there are no wards for the categories {unplaced}, add a ward for them or a ward "
+                                 f"without a category")
+
+        overflow = [ward.name for ward in self.wards if ward.category is None]
+        self.placement = PlacementTable(pools=self.names, rules=rules, overflow=overflow[0] if overflow else None)
+
+    @classmethod
+    def standard(cls, n_elective_beds, n_surgical_emergency_beds, n_medical_emergency_beds, n_escalation_beds,
+                 rules=None):
+        """
+        The medical emergency, surgical emergency, Elective and escalation wards BedModel has always modelled
+        :param n_elective_beds:
+        :param n_surgical_emergency_beds:
+        :param n_medical_emergency_beds:
+        :param n_escalation_beds:
+        :param rules: the placement rules, defaults to modules.placement.PLACEMENT_RULES
+        :return: Hospital
+        """
+        medical, surgical, elective, escalation = POOLS
+        return cls([Ward(medical, n_medical_emergency_beds, 'Medical Emergency', label='Medical'),
+                    Ward(surgical, n_surgical_emergency_beds, 'Surgical Emergency', label='Surgical'),
+                    Ward(elective, n_elective_beds, 'Elective', label='Elective'),
+                    Ward(escalation, n_escalation_beds, label='Escalation')],
+                   rules=PLACEMENT_RULES if rules is None else rules)
+
+    def index(self, name):
+        """
+        The position of a ward
+        :param name: the name of the ward
+        :return: int
+        """
+        return self.names.index(name)
+
+    def hourly_metrics(self, occupancy, admitted, discharged, waiting, cancelled):
+        """
+        The metrics recorded at the end of each hour, for a single run or for many runs at once
+        :param occupancy: (wards x categories) array of the patients in each ward by category, or a (runs x wards x
+            categories) array with the other arguments given per run
+        :param admitted: the number of patients admitted in the hour
+        :param discharged: the number of patients discharged in the hour
+        :param waiting: the number of patients waiting for a bed (trolley waits)
+        :param cancelled: the number of Elective patients cancelled in the hour
+        :return: numpy array of metrics in the order of self.metrics, with a row per run for many runs
+        """
+        occupied = occupancy.sum(axis=-1)
+        available = self.beds - occupied
+        # A full escalation ward is recorded as having every bed available. This is deliberate: it is how the
+        # original model counted them, and every engine is checked against those results
+        np.copyto(available, self.beds, where=self.overflow & (available == 0))
+
+        outliers = (occupancy[..., self.outlier_categories] * self.outlier_wards).sum(axis=-2)
+        totals = [occupied[..., self.overflow].sum(axis=-1), admitted, discharged, waiting, cancelled]
+        if occupancy.ndim > 2:
+            totals = np.stack(np.broadcast_arrays(*totals), axis=-1)
+
+        return np.concatenate([available, occupied, outliers, totals], axis=-1)
@@ -0,0 +1,33 @@
+import numpy as np
+
+
+def mser(values, batch_size=5, max_fraction=0.5):
+    """
+    The MSER truncation point of a series, the length of the initial transient to drop for the rest of the series
+    to be closest to steady state. With the default batch_size this is MSER-5
+
+    The series is split into batches of batch_size observations and the truncation minimises the squared
+    standard error of the mean of the batch means that are kept. Only truncations that keep at least
+    (1 - max_fraction) of the series are considered, hitting this limit means the series is too short to have
+    reached steady state.
+
+    :param values: the series, e.g. the total number of occupied beds each hour
+    :param batch_size: the number of observations averaged into each batch
+    :param max_fraction: the largest fraction of the series that can be dropped
+    :return: the number of observations to drop, a multiple of batch_size
+    """
+    values = np.asarray(values, dtype=float)
+    n_batches = len(values) // batch_size
+    if n_batches < 2:
+        return 0
+
+    batches = values[:n_batches * batch_size].reshape(n_batches, batch_size).mean(axis=1)
+
+    # Running sums from the end of the series give the statistic of every truncation point in one pass
+    kept = np.arange(1, n_batches + 1)
+    sums = np.cumsum(batches[::-1])
+    squares = np.cumsum(batches[::-1] ** 2)
+    statistic = ((squares - sums ** 2 / kept) / kept ** 2)[::-1]
+
+    limit = int(n_batches * max_fraction)
+    return int(np.argmin(statistic[:limit + 1])) * batch_size